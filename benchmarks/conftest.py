@@ -0,0 +1,31 @@
+"""Shared fixtures of the benchmarks.
+
+The dataset size is set with the ONT_CHOPPER_BENCH_READS and
+ONT_CHOPPER_BENCH_MEDIAN_LENGTH environment variables.
+"""
+import os
+
+import pytest
+from loguru import logger
+
+from .synthetic import ReadProfile
+from .synthetic import write_fastq
+
+
+BENCH_READS = int(os.environ.get("ONT_CHOPPER_BENCH_READS", 1000))
+BENCH_MEDIAN_LENGTH = int(os.environ.get("ONT_CHOPPER_BENCH_MEDIAN_LENGTH", 1000))
+
+
+@pytest.fixture(scope="session")
+def bench_fastq(tmp_path_factory) -> str:
+    """Synthetic direct-RNA reads shared by every benchmark."""
+    path = tmp_path_factory.mktemp("bench") / "reads.fastq"
+    profile = ReadProfile(median_length=BENCH_MEDIAN_LENGTH)
+    return write_fastq(str(path), BENCH_READS, profile)
+
+
+@pytest.fixture(autouse=True)
+def quiet_logger():
+    """Keep logging out of the measurements."""
+    logger.remove()
+    yield
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Synthetic nanopore direct-RNA reads with embedded adapter valleys."""
+import argparse
+from dataclasses import dataclass
+from typing import Iterator
+from typing import Tuple
+
+import numpy as np
+
+
+@dataclass
+class ReadProfile:
+    """Shape of the synthetic reads.
+
+    Lengths follow a log-normal distribution around median_length. Bases are
+    called with a normal quality of mean_quality, a share adapter_rate of the
+    reads carries 1 to max_adapters chimeric adapters, each a stretch of
+    adapter_length bases with quality within adapter_quality, and every read
+    ends in a poly(A) tail.
+    """
+
+    median_length: int = 1000
+    length_sigma: float = 0.8
+    min_length: int = 100
+    max_length: int = 200_000
+    mean_quality: float = 12.0
+    quality_sd: float = 4.0
+    adapter_rate: float = 0.3
+    max_adapters: int = 3
+    adapter_length: Tuple[int, int] = (40, 90)
+    adapter_quality: Tuple[int, int] = (1, 6)
+    polya_length: Tuple[int, int] = (10, 60)
+
+
+BASES = np.frombuffer(b"ACGU", dtype=np.uint8)
+
+
+def synthetic_read(
+    rng: np.random.Generator, length: int, profile: ReadProfile
+) -> Tuple[bytes, bytes]:
+    """Sequence and quality of a single read of the given length."""
+    seq = BASES[rng.integers(0, 4, length)]
+    polya = min(length, int(rng.integers(*profile.polya_length, endpoint=True)))
+    seq[length - polya :] = ord("A")
+    score = rng.normal(profile.mean_quality, profile.quality_sd, length)
+    score = np.clip(np.rint(score), 1, 50).astype(np.uint8)
+    if rng.random() < profile.adapter_rate:
+        for _ in range(int(rng.integers(1, profile.max_adapters, endpoint=True))):
+            size = int(rng.integers(*profile.adapter_length, endpoint=True))
+            if size >= length:
+                continue
+            start = int(rng.integers(0, length - size))
+            score[start : start + size] = rng.integers(
+                *profile.adapter_quality, size, endpoint=True
+            )
+    return seq.tobytes(), (score + 33).tobytes()
+
+
+def synthetic_reads(
+    reads: int, profile: ReadProfile = ReadProfile(), seed: int = 0
+) -> Iterator[Tuple[bytes, bytes, bytes]]:
+    """Yield reads (title, seq, quality) drawn reproducibly from profile."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.lognormal(np.log(profile.median_length), profile.length_sigma, reads)
+    lengths = np.clip(lengths, profile.min_length, profile.max_length).astype(int)
+    for i, length in enumerate(lengths):
+        seq, quality = synthetic_read(rng, int(length), profile)
+        yield b"read%d runid=synthetic ch=%d" % (i, i % 512), seq, quality
+
+
+def write_fastq(
+    path: str, reads: int, profile: ReadProfile = ReadProfile(), seed: int = 0
+) -> str:
+    """Write reads synthetic reads to path."""
+    with open(path, "wb") as handle:
+        for title, seq, quality in synthetic_reads(reads, profile, seed):
+            handle.write(b"@%s\n%s\n+\n%s\n" % (title, seq, quality))
+    return path
+
+
+def main() -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", help="FASTQ file to write")
+    parser.add_argument("-n", "--reads", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--median-length", type=int, default=1000)
+    parser.add_argument("--length-sigma", type=float, default=0.8)
+    parser.add_argument("--adapter-rate", type=float, default=0.3)
+    options = parser.parse_args()
+    profile = ReadProfile(
+        median_length=options.median_length,
+        length_sigma=options.length_sigma,
+        adapter_rate=options.adapter_rate,
+    )
+    write_fastq(options.output, options.reads, profile, options.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""End-to-end throughput and memory of fastq_io by worker count."""
+import json
+import multiprocessing
+import subprocess  # noqa: S404
+import sys
+
+import pytest
+
+from ont_chopper.algorithm.fastq_handler import fastq_io
+
+
+PEAK_RSS_SCRIPT = """
+import json, resource, sys
+from loguru import logger
+from ont_chopper.algorithm.fastq_handler import fastq_io
+logger.remove()
+fastq_io(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+print(json.dumps({
+    "main": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+}))
+"""
+
+
+def peak_rss(in_fastq: str, out_fastq: str, workers: int) -> dict:
+    """Peak RSS in KiB of the main process and of its largest child.
+
+    The run happens in a fresh interpreter so neither pytest nor earlier
+    benchmarks count towards it.
+    """
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", PEAK_RSS_SCRIPT, in_fastq, out_fastq, str(workers)],
+        capture_output=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+@pytest.mark.parametrize("workers", [1, 4, 16])
+def test_fastq_io(benchmark, bench_fastq: str, tmp_path, workers: int) -> None:
+    """Chop the synthetic dataset on workers workers."""
+    out = str(tmp_path / "out.fastq")
+    metrics_file = tmp_path / "metrics.json"
+    benchmark.pedantic(
+        fastq_io,
+        args=(bench_fastq, out, workers),
+        kwargs={"metrics_file": str(metrics_file)},
+        rounds=3,
+        iterations=1,
+    )
+    if benchmark.stats is None:
+        # --benchmark-disable runs it once as a plain test, without timings
+        return
+    metrics = json.loads(metrics_file.read_text())
+    worker_seconds = metrics["stages"]["valley_finding"] + metrics["stages"][
+        "extension"
+    ]
+    benchmark.extra_info.update(
+        {
+            "workers": workers,
+            "effective_workers": metrics["workers"]["count"],
+            "cpu_count": multiprocessing.cpu_count(),
+            "reads": metrics["reads"],
+            "reads_per_second": metrics["reads"] / benchmark.stats.stats.median,
+            "valley_finder_seconds_per_read": worker_seconds / metrics["reads"],
+            "worker_utilisation": metrics["workers"]["utilisation"],
+            "peak_rss_kib": peak_rss(bench_fastq, out, workers),
+        }
+    )
@@ -0,0 +1,21 @@
+"""Per-read latency of valley_finder."""
+import numpy as np
+import pytest
+
+from ont_chopper.algorithm.score_handler import valley_finder
+from ont_chopper.utils.fastq_reader import phred_scores
+
+from .synthetic import ReadProfile
+from .synthetic import synthetic_read
+
+
+@pytest.mark.parametrize("length", [500, 2000, 10000, 50000])
+def test_valley_finder(benchmark, length: int) -> None:
+    """A single read carrying adapters, by read length."""
+    rng = np.random.default_rng(length)
+    profile = ReadProfile(adapter_rate=1.0, max_adapters=max(1, length // 2000))
+    _, quality = synthetic_read(rng, length, profile)
+    score = phred_scores(quality)
+    benchmark.extra_info["read_length"] = length
+    positions = benchmark(valley_finder, score)
+    benchmark.extra_info["adapters"] = len(positions)
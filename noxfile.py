@@ -182,6 +182,20 @@ def coverage(session: Session) -> None:
     session.run("coverage", *args)
 
 
+@session(python=python_versions[0])
+def benchmarks(session: Session) -> None:
+    """Run the benchmarks and save the results under the current commit."""
+    session.install(".")
+    session.install("pytest", "pytest-benchmark")
+    session.run(
+        "pytest",
+        "benchmarks",
+        "--benchmark-storage=.benchmarks",
+        "--benchmark-autosave",
+        *session.posargs,
+    )
+
+
 @session(python=python_versions[0])
 def typeguard(session: Session) -> None:
     """Runtime type checking using Typeguard."""
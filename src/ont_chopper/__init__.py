@@ -1,5 +1,3 @@
 """Ont_Chopper."""
 __version__ = "0.0.1"
 __PACKAGE_NAME__ = "ont_chopper"
-
-from rich.traceback import install
@@ -2,8 +2,9 @@
 """Main function for ont chopper."""
 import sys
 
+from .cli.arg import parse_apply_args
 from .cli.arg import parse_args
-from .cli.cli import cli
+from .cli.arg import parse_sweep_args
 
 
 def main():
@@ -13,10 +14,27 @@ def main():
             "Sorry, this code need Python 3.8 or higher. Please update. Aborting..."
         )
 
-    parser = parse_args()
-    options = parser.parse_args()
+    command = sys.argv[1] if sys.argv[1:2] in (["sweep"], ["apply"]) else None
+    if command == "sweep":
+        options = parse_sweep_args().parse_args(sys.argv[2:])
+    elif command == "apply":
+        options = parse_apply_args().parse_args(sys.argv[2:])
+    else:
+        parser = parse_args()
+        options = parser.parse_args()
+        if (
+            options.input is None
+            and options.shard is None
+            and not options.merge
+            and options.watch is None
+        ):
+            parser.error("the following arguments are required: -i/--input")
 
-    cli(options)
+    # the chopping code, with numpy, is only imported once the arguments are
+    # parsed, so --help and argument errors stay fast
+    from .cli import cli
+
+    {"sweep": cli.sweep_cli, "apply": cli.apply_cli, None: cli.cli}[command](options)
 
 
 if __name__ == "__main__":
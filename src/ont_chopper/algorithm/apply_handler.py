@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Cut reads at the coordinates of a --coords-only table."""
+import time
+from typing import Dict
+from typing import List
+from typing import Union
+
+from loguru import logger
+
+from .fastq_handler import segment_records
+from ..utils.compression import open_input
+from ..utils.compression import open_output
+from ..utils.coords import read_coords
+from ..utils.coords import read_id
+from ..utils.fastq_reader import read_fastq
+
+
+def apply_coords(
+    in_fastq: Union[str, List[str]],
+    coords_file: str,
+    out_fastq: str,
+    compression: str = "auto",
+    compress_threads: int = 1,
+    buffer_size: int = 8 * 1024 * 1024,
+) -> Dict[str, int]:
+    """Write the reads of in_fastq cut at the coordinates of coords_file.
+
+    The table and the input, or the inputs one after the other, are read
+    side by side in a single streaming pass: reads listed in the table are
+    replaced by their segments and the others are copied whole, exactly as
+    fastq_io would have written them in order. The table must therefore
+    follow the input order. Returns the numbers of reads, reads chopped and
+    segments written.
+    """
+    inputs = [in_fastq] if isinstance(in_fastq, str) else list(in_fastq)
+    counts = {"reads": 0, "reads_chopped": 0, "segments": 0}
+    tic = time.perf_counter()
+    with open_input(coords_file) as coords_handle, open_output(
+        out_fastq, compression, compress_threads
+    ) as out_handle:
+        table = read_coords(coords_handle)
+        pending = next(table, None)
+        chunks = []
+        buffered = 0
+        for path in inputs:
+            with open_input(path) as in_handle:
+                for title, seq, quality in read_fastq(in_handle):
+                    segments = None
+                    if pending is not None and pending[0] == read_id(title):
+                        segments = pending[1]
+                        pending = next(table, None)
+                        counts["reads_chopped"] += 1
+                        counts["segments"] += len(segments)
+                    counts["reads"] += 1
+                    record = segment_records(b"@" + title, seq, quality, segments)
+                    chunks.append(record)
+                    buffered += len(record)
+                    if buffered >= buffer_size:
+                        out_handle.write(b"".join(chunks))
+                        chunks = []
+                        buffered = 0
+        out_handle.write(b"".join(chunks))
+    if pending is not None:
+        raise ValueError(
+            f"read {pending[0].decode()} of {coords_file} is missing from the "
+            "input or out of order"
+        )
+    logger.info(
+        f"applied {coords_file}: {counts['reads']} reads, "
+        f"{counts['reads_chopped']} chopped into {counts['segments']} segments "
+        f"in {time.perf_counter() - tic:.1f}s"
+    )
+    return counts
@@ -3,81 +3,563 @@
 # =============================
 import sys
 import re
+import io
 import os
-from Bio import SeqIO
+import heapq
+from .fastq_writer import CHECKPOINT_INTERVAL
+from .fastq_writer import FLUSH_INTERVAL
+from .fastq_writer import WRITE_BUFFER_SIZE
+from .fastq_writer import read_checkpoint
+from .fastq_writer import writer
+from .score_handler import EXTREMA_BLOCK
+from .score_handler import can_have_adapter
+from .score_handler import find_extrema
 from .score_handler import valley_finder
+from ..utils.autotune import AutoTuner
+from ..utils.autotune import InflightWindow
+from ..utils.compression import open_input
+from ..utils.compression import open_output
+from ..utils.compression import output_compression
+from ..utils.coords import coords_format
+from ..utils.coords import coords_header
+from ..utils.coords import format_coords
+from ..utils.cpus import available_cpus
+from ..utils.extrema_cache import CACHE_ENTRIES
+from ..utils.extrema_cache import open_cache
+from ..utils.extrema_cache import quality_hash
+from ..utils.fastq_reader import phred_scores
+from ..utils.fastq_reader import read_fastq
+from ..utils.fastq_reader import read_fastq_offsets
+from ..utils.fastq_splitter import byte_ranges
+from ..utils.fastq_splitter import concatenate_parts
+from ..utils.fastq_splitter import read_fastq_range
+from ..utils.input_files import per_input_outputs
+from ..utils.metrics import Metrics
+from ..utils.metrics import TimedReader
+from ..utils.metrics import batch_stats
+from ..utils.metrics import merge_batch_stats
 import multiprocessing
+import queue
+import threading
+import time
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from array import array
+from functools import partial
+from typing import List
+from typing import Optional
+from typing import Union
 from loguru import logger
 
 
-def adapter_finder(
-    record,
+def read_adapters(adapter_positions, minimum_adapter_length):
+    """The adapter_positions of valley_finder longer than minimum_adapter_length."""
+    return [
+        (valley_start, valley_end)
+        for valley_start, valley_end in adapter_positions
+        if valley_end - valley_start > minimum_adapter_length
+    ]
+
+
+def read_segments(adapters, read_length, minimum_seq_length):
+    """(start, end) segments of a read once its read_adapters are cut out.
+
+    Segments are the stretches between the adapters longer than
+    minimum_seq_length. Returns None when there is no adapter and the read
+    is kept whole.
+    """
+    if not adapters:
+        return None
+    position_list = array("l", [0])
+    for valley_start, valley_end in adapters:
+        position_list.append(valley_start)
+        position_list.append(valley_end)
+    position_list.append(read_length - 1)
+    return [
+        (segment_start, segment_end)
+        for segment_start, segment_end in zip(position_list[0::2], position_list[1::2])
+        if segment_end - segment_start > minimum_seq_length
+    ]
+
+
+def segment_records(seq_info, seq, quality, segments):
+    """FASTQ records of the read_segments of a read, all bytes."""
+    if segments is None:
+        return b"%s\n%s\n+\n%s\n" % (seq_info, seq, quality)
+    return b"".join(
+        b"@%d:%d|%s\n%s\n+\n%s\n"
+        % (
+            segment_start,
+            segment_end,
+            seq_info,
+            seq[segment_start:segment_end],
+            quality[segment_start:segment_end],
+        )
+        for segment_start, segment_end in segments
+    )
+
+
+def read_chopper(
+    seq_info,
+    seq,
+    quality,
     score_cutoff,
     minimum_adapter_length,
     minimum_seq_length,
     minperc,
     window,
-    queue,
+    engine="native",
+    stats=None,
+    extrema=None,
+    coords=None,
+    extrema_block=EXTREMA_BLOCK,
 ):
-    score = record.letter_annotations["phred_quality"]
-    seq_info, seq, _, quality, _ = record.format("fastq").split("\n")
+    """Chop a single read, given as its FASTQ header line, sequence and quality.
+
+    All three are bytes and so is the returned FASTQ chunk. stats, a
+    batch_stats dict, collects the stage timings and valley counts. Reads
+    that cannot hold an adapter long enough, see can_have_adapter, skip the
+    valley detection and are kept whole. extrema are the cached
+    find_extrema of the read, if known. With coords, a table
+    format, the coordinate rows of the read are returned instead of FASTQ,
+    see format_coords. extrema_block bounds the memory of the valley
+    detection, see caerus_extrema.
+    """
+    score = phred_scores(quality)
     read_length = len(seq)
-    if " " in seq_info:
-        _seq_id, description = seq_info.split(" ", 1)
+    logger.opt(lazy=True).trace(
+        "seq_id={}", lambda: seq_info.split(b" ", 1)[0].lstrip(b"@").decode()
+    )
+    tic = time.perf_counter()
+    if can_have_adapter(score, score_cutoff, minimum_adapter_length):
+        if stats is not None:
+            stats["prefilter"] += time.perf_counter() - tic
+        adapter_positions = valley_finder(
+            score,
+            score_cutoff,
+            minperc,
+            window,
+            engine,
+            stats,
+            extrema,
+            block=extrema_block,
+        )
     else:
-        _seq_id = seq_info
-
-    seq_id = _seq_id.lstrip("@")
-    logger.info(f"{seq_id=}")
-    adapter_positions = valley_finder(score, score_cutoff, minperc, window)
-
-    if adapter_positions:
-        position_list = array("l", [0])
-        for valley_start, valley_end in adapter_positions:
-            if valley_end - valley_start > minimum_adapter_length:
-                position_list.append(valley_start)
-                position_list.append(valley_end)
-                logger.info(
-                    f"adapter_start: {valley_start}, adapter_end: {valley_end}"
-                )
-        position_list.append(read_length - 1)
-
-        if len(position_list) == 2:
-            output_record = f"{seq_info}\n{seq}\n+\n{quality}\n"
-        else:
-            output_record = ''
-            for segment_start, segment_end in zip(position_list[0::2], position_list[1::2]):
-                if segment_end - segment_start > minimum_seq_length:
-                    output_record += (
-                        f"@{segment_start}:{segment_end}|{seq_info}\n"
-                        f"{seq[segment_start:segment_end]}\n+\n"
-                        f"{quality[segment_start:segment_end]}\n"
-                    )
-        del position_list
+        adapter_positions = []
+        if stats is not None:
+            stats["prefilter"] += time.perf_counter() - tic
+            stats["reads_prefiltered"] += 1
+    tic = time.perf_counter()
+    adapters = read_adapters(adapter_positions, minimum_adapter_length)
+    for adapter_start, adapter_end in adapters:
+        logger.trace("adapter_start: {}, adapter_end: {}", adapter_start, adapter_end)
+    segments = read_segments(adapters, read_length, minimum_seq_length)
+    if coords:
+        output_record = format_coords(seq_info[1:], segments, adapters, coords)
     else:
-        output_record = f"{seq_info}\n{seq}\n+\n{quality}\n"
+        output_record = segment_records(seq_info, seq, quality, segments)
 
-    if output_record:
-        queue.put(output_record)
+    if stats is not None:
+        stats["serialisation"] += time.perf_counter() - tic
+        stats["reads"] += 1
+        stats["valleys"][len(adapter_positions)] += 1
+        if adapter_positions:
+            stats["reads_with_adapters"] += 1
     return output_record
 
 
-def listener(queue, out_filename):
-    """listens for messages on the q, writes to file."""
+def adapter_finder(
+    batch,
+    score_cutoff,
+    minimum_adapter_length,
+    minimum_seq_length,
+    minperc,
+    window,
+    engine="native",
+    cache_file=None,
+    cache_entries=CACHE_ENTRIES,
+    coords=None,
+    extrema_block=EXTREMA_BLOCK,
+):
+    """Chop a batch of (title, seq, quality) reads into one FASTQ buffer.
+
+    Returns the buffer and the batch_stats of the batch. With cache_file,
+    the valley detection of the batch is looked up in and added to that
+    ExtremaCache of at most cache_entries entries. With coords, the buffer
+    holds coordinate rows in that table format instead, see read_chopper,
+    which extrema_block is passed on to.
+    """
+    stats = batch_stats()
+    tic = time.perf_counter()
+    if cache_file:
+        extrema = cached_extrema(
+            batch,
+            score_cutoff,
+            minimum_adapter_length,
+            minperc,
+            window,
+            engine,
+            cache_file,
+            cache_entries,
+            stats,
+            extrema_block,
+        )
+    else:
+        extrema = [None] * len(batch)
+    output_buffer = b"".join(
+        read_chopper(
+            b"@" + title,
+            seq,
+            quality,
+            score_cutoff,
+            minimum_adapter_length,
+            minimum_seq_length,
+            minperc,
+            window,
+            engine,
+            stats,
+            read_extrema,
+            coords,
+            extrema_block,
+        )
+        for (title, seq, quality), read_extrema in zip(batch, extrema)
+    )
+    stats["bases"] = sum(len(seq) for _, seq, _ in batch)
+    stats["busy_seconds"] = time.perf_counter() - tic
+    return output_buffer, stats
+
+
+def cached_extrema(
+    batch,
+    score_cutoff,
+    minimum_adapter_length,
+    minperc,
+    window,
+    engine,
+    cache_file,
+    cache_entries,
+    stats,
+    extrema_block=EXTREMA_BLOCK,
+):
+    """find_extrema of every read of batch, from the cache where possible.
+
+    The reads missing from the cache are detected here and stored. Reads
+    too short for valley_finder, or that read_chopper skips because they
+    cannot hold an adapter, get None. The hits and misses, and the detection
+    time, are added to stats.
+    """
+    cache = open_cache(cache_file, cache_entries)
+    hashes = [
+        quality_hash(quality)
+        if len(quality) >= window * 2
+        and can_have_adapter(
+            phred_scores(quality), score_cutoff, minimum_adapter_length
+        )
+        else None
+        for _, _, quality in batch
+    ]
+    tic = time.perf_counter()
+    known = cache.get_many(
+        [digest for digest in hashes if digest is not None], minperc, window, engine
+    )
+    found = {}
+    for (_, _, quality), digest in zip(batch, hashes):
+        if digest is not None and digest not in known and digest not in found:
+            found[digest] = find_extrema(
+                phred_scores(quality), minperc, window, engine, extrema_block
+            )
+    cache.put_many(found, minperc, window, engine)
+    stats["valley_finding"] += time.perf_counter() - tic
+    stats["cache_hits"] = sum(digest in known for digest in hashes)
+    stats["cache_misses"] = len(found)
+    known.update(found)
+    return [None if digest is None else known[digest] for digest in hashes]
+
+
+def batched(records, batch_size):
+    """Yield lists of at most batch_size records."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def balanced_batches(reads, batches):
+    """Share reads out into at most batches batches of about equal bases.
 
-    with open(out_filename, "w") as f:
+    The cost of a read is taken to be its length. Reads are handed out
+    longest first to the batch with the fewest bases so far, and the
+    batches come back largest first, so the longest work starts first.
+    """
+    heap = [(0, k) for k in range(batches)]
+    groups = [[] for _ in range(batches)]
+    for read in sorted(reads, key=lambda read: len(read[1]), reverse=True):
+        bases, k = heapq.heappop(heap)
+        groups[k].append(read)
+        heapq.heappush(heap, (bases + len(read[1]), k))
+    totals = {k: bases for bases, k in heap}
+    return [
+        groups[k] for k in sorted(totals, key=totals.get, reverse=True) if groups[k]
+    ]
+
+
+REGROUP_WINDOW = 4
+
+
+def length_balanced(tasks, window=REGROUP_WINDOW):
+    """Regroup the batches of fastq_tasks tasks window at a time.
+
+    The reads of every window batches of one input are shared out again by
+    balanced_batches, so the batches carry about the same number of bases
+    and a cluster of ultra-long reads is spread over several workers, each
+    starting with them. window is small and fixed, so regrouping holds only
+    a few batches back from the pool whatever the in-flight depth. Reads
+    leave their input order and the batches lose their end offset, but
+    never mix inputs. Whole-file tasks are passed on as they come.
+    """
+    pending = []
+    pending_index = None
+    for input_index, batch, offset in tasks:
+        if pending and input_index != pending_index:
+            yield from _regrouped(pending_index, pending)
+            pending = []
+        if batch is None:
+            yield input_index, batch, offset
+            continue
+        pending.append(batch)
+        pending_index = input_index
+        if len(pending) == window:
+            yield from _regrouped(pending_index, pending)
+            pending = []
+    if pending:
+        yield from _regrouped(pending_index, pending)
+
+
+def _regrouped(input_index, pending):
+    reads = [read for batch in pending for read in batch]
+    for batch in balanced_batches(reads, len(pending)):
+        yield input_index, batch, None
+
+
+def fastq_batches(in_fastq, batch_size, metrics=None, start=0):
+    """Yield lists of at most batch_size (title, seq, quality) tuples.
+
+    Each list comes with the offset just past its last read in the
+    (decompressed) input. Reading starts at offset start, a record boundary.
+    batch_size may be a callable giving the size of the next batch, such as
+    an AutoTuner.
+    With metrics, the time and bytes spent reading the input are recorded.
+    """
+    size = batch_size() if callable(batch_size) else batch_size
+    batch = []
+    with open_input(in_fastq) as handle:
+        if start:
+            handle.seek(start)
+        source = handle if metrics is None else TimedReader(handle, metrics)
+        for record, offset in read_fastq_offsets(source):
+            batch.append(record)
+            if len(batch) >= size:
+                yield batch, start + offset
+                batch = []
+                size = batch_size() if callable(batch_size) else batch_size
+    if batch:
+        yield batch, start + offset
+
+
+def fastq_tasks(inputs, batch_size, file_task_size=0, metrics=None, start=0):
+    """Yield (input index, batch, end offset) tasks covering inputs.
+
+    Files of at most file_task_size bytes on disk are left whole to a worker,
+    see file_chopper, and come with None as batch and offset; larger files
+    are read here and cut into batches, see fastq_batches. The first input
+    is read from offset start on.
+    """
+    for input_index, in_fastq in enumerate(inputs):
+        if os.path.getsize(in_fastq) <= file_task_size:
+            yield input_index, None, None
+        else:
+            for batch, offset in fastq_batches(
+                in_fastq, batch_size, metrics, start if input_index == 0 else 0
+            ):
+                yield input_index, batch, offset
+
+
+def file_chopper(
+    in_fastq,
+    score_cutoff,
+    minimum_adapter_length,
+    minimum_seq_length,
+    minperc,
+    window,
+    engine="native",
+    cache_file=None,
+    cache_entries=CACHE_ENTRIES,
+    coords=None,
+    extrema_block=EXTREMA_BLOCK,
+):
+    """Read and chop a whole, small, FASTQ file in a worker.
+
+    Returns the FASTQ buffer and the batch_stats like adapter_finder, with
+    the read and parse times and the input bytes.
+    """
+    tic = time.perf_counter()
+    with open_input(in_fastq) as handle:
+        data = handle.read()
+    toc = time.perf_counter()
+    reads = list(read_fastq(io.BytesIO(data)))
+    parsed = time.perf_counter()
+    output_buffer, stats = adapter_finder(
+        reads,
+        score_cutoff,
+        minimum_adapter_length,
+        minimum_seq_length,
+        minperc,
+        window,
+        engine,
+        cache_file,
+        cache_entries,
+        coords,
+        extrema_block,
+    )
+    stats["read"] = toc - tic
+    stats["parse"] = parsed - toc
+    stats["input_bytes"] = len(data)
+    stats["busy_seconds"] = time.perf_counter() - tic
+    return output_buffer, stats
+
+
+def range_chopper(
+    in_fastq,
+    start,
+    end,
+    part_fastq,
+    compression,
+    score_cutoff,
+    minimum_adapter_length,
+    minimum_seq_length,
+    minperc,
+    window,
+    engine="native",
+    batch_size=100,
+    cache_file=None,
+    cache_entries=CACHE_ENTRIES,
+    extrema_block=EXTREMA_BLOCK,
+):
+    """Chop the records in bytes [start, end) of in_fastq into part_fastq.
+
+    The range is memory-mapped and read by the worker itself. Returns the
+    batch_stats of the whole range, with its parse and write times.
+    """
+    stats = batch_stats()
+    stats["parse"] = 0.0
+    stats["write"] = 0.0
+    tic = time.perf_counter()
+    batches = batched(read_fastq_range(in_fastq, start, end), batch_size)
+    with open_output(part_fastq, compression) as handle:
         while True:
-            contents = queue.get()
-            if contents is None:
+            toc = time.perf_counter()
+            batch = next(batches, None)
+            stats["parse"] += time.perf_counter() - toc
+            if batch is None:
                 break
-            f.write(contents)
-            f.flush()
+            output_buffer, chop_stats = adapter_finder(
+                batch,
+                score_cutoff,
+                minimum_adapter_length,
+                minimum_seq_length,
+                minperc,
+                window,
+                engine,
+                cache_file,
+                cache_entries,
+                extrema_block=extrema_block,
+            )
+            merge_batch_stats(stats, chop_stats)
+            toc = time.perf_counter()
+            handle.write(output_buffer)
+            stats["write"] += time.perf_counter() - toc
+    stats["busy_seconds"] = time.perf_counter() - tic
+    return stats
+
+
+FILE_TASK_SIZE = 8 * 1024 * 1024
+PREFETCH_DEPTH = 16
+_END = object()
+
+
+class _Failure:
+    """An exception raised by the tasks of read_ahead."""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def read_ahead(tasks, depth, metrics=None):
+    """Yield the items of tasks, produced up to depth items ahead by a thread.
+
+    Reading, decompressing and parsing the input happen in the background,
+    overlapping with the submission of the previous batches, so a slow
+    disk only holds up the workers once depth batches are used up. An
+    exception raised by tasks is raised again here. A depth of 0 iterates
+    tasks in the calling thread. With metrics, the time spent producing
+    the items is added to the "parse" stage.
+    """
+
+    def _produce():
+        tic = time.perf_counter()
+        item = next(tasks, _END)
+        if metrics is not None:
+            metrics.stages["parse"] += time.perf_counter() - tic
+        return item
+
+    if depth <= 0:
+        while True:
+            item = _produce()
+            if item is _END:
+                return
+            yield item
+
+    items = queue.Queue(depth)
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run():
+        try:
+            while True:
+                item = _produce()
+                if not _put(item) or item is _END:
+                    return
+        except BaseException as exc:
+            _put(_Failure(exc))
+
+    thread = threading.Thread(target=_run, name="ont_chopper-read-ahead", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        thread.join()
 
 
 def fastq_io(
-    in_fastq: str,
+    in_fastq: Union[str, List[str]],
     out_fastq: str,
     threads_num: int,
     minimum_seq_length: int = 150,
@@ -85,46 +567,484 @@ def fastq_io(
     score_cutoff: int = 20,
     minperc: int = 10,
     window: int = 50,
+    max_inflight: int = 0,
+    batch_size: int = 100,
+    engine: str = "native",
+    compression: str = "auto",
+    compress_threads: int = 0,
+    ordered: bool = False,
+    write_buffer_size: int = WRITE_BUFFER_SIZE,
+    flush_interval: float = FLUSH_INTERVAL,
+    metrics_file: Optional[str] = None,
+    per_input: bool = False,
+    file_task_size: Optional[int] = None,
+    checkpoint_interval: float = 0,
+    resume: bool = False,
+    cache_file: Optional[str] = None,
+    cache_entries: int = CACHE_ENTRIES,
+    coords_only: bool = False,
+    schedule: str = "length",
+    prefetch: int = PREFETCH_DEPTH,
+    autotune: bool = False,
+    extrema_block: int = EXTREMA_BLOCK,
 ) -> str:
-    """ """
-    cpu_number = multiprocessing.cpu_count()
-    reads_number = 0
-    found_adapter_number = 0
+    """Chop adapters out of every read of in_fastq and write them to out_fastq.
+
+    Reads are streamed from the input in batches of batch_size and handed to
+    the worker pool through a bounded window of at most max_inflight
+    outstanding batches, so memory stays flat regardless of the input size.
+    A max_inflight of 0 picks a window of eight batches per worker. Each
+    batch comes back as a single FASTQ buffer which the main process passes
+    on, numbered, to a dedicated writer process over a pipe; see writer for
+    write_buffer_size and flush_interval. engine selects the valley
+    detection backend, see valley_finder.
+
+    By default batches are written as soon as they are done, so the read
+    order depends on the scheduling. With ordered the output follows the
+    input order and is byte-identical for any threads_num. The writer then
+    holds at most max_inflight finished batches back while an earlier one is
+    still running, and a slow batch stalls new submissions once the window
+    is full, which costs some throughput on very uneven reads.
+
+    gzip/BGZF input is detected from its magic bytes. The output is
+    compressed according to compression ("auto" follows the extension of
+    out_fastq) on compress_threads threads, 0 for one per worker.
+
+    in_fastq may be a list of files, all chopped by the same pool. Files of
+    at most file_task_size bytes are read and chopped whole by a worker, so
+    many small files are decompressed and parsed in parallel; larger ones are
+    streamed in batches as above. file_task_size defaults to FILE_TASK_SIZE
+    for several inputs and 0 for one. The reads of every input go to
+    out_fastq or, with per_input, to a file of the same name in the
+    out_fastq directory; per-input outputs imply ordered.
+
+    With a checkpoint_interval in seconds, a single input is chopped in
+    order and every so often out_fastq.checkpoint records the input offset
+    and output size reached with all earlier batches on disk. resume
+    truncates out_fastq to the last checkpoint and carries on from its input
+    offset, or starts over without one; it turns on checkpoints too. The
+    checkpoint is removed once the run completes.
+
+    With cache_file, the raw valley detection of every read is kept in that
+    SQLite file, see ExtremaCache, and reused by later runs with the same
+    minperc, window and engine, whatever their cutoff and length limits.
+    Only the cache_entries most recently used reads are kept. extrema_block
+    bounds the memory the valley detection takes per read, see
+    caerus_extrema.
+
+    With coords_only, a table of the segment and adapter coordinates of the
+    reads is written instead of FASTQ, in input order; see the coords module
+    for its format, binary for a .bin out_fastq and TSV otherwise. Per-input
+    tables are named after the inputs with a .tsv extension added.
+    apply_coords slices the input with it later on.
+
+    With the "length" schedule, unordered batches are regrouped
+    REGROUP_WINDOW at a time into batches of about equal bases, longest
+    reads first, see length_balanced; the pool hands every batch to the next
+    idle worker. Ordered runs, and the "input" schedule, keep the input order.
+
+    The input is read and cut into batches by a background thread up to
+    prefetch batches ahead of the submissions, see read_ahead; 0 reads it
+    in between submissions. The "starved" stage of the metrics counts the
+    worker seconds left idle while the next batch was not ready yet.
+
+    threads_num is capped by available_cpus, which follows the CPU affinity
+    and cgroup quota of the process. With autotune, batch_size and
+    max_inflight are only where an AutoTuner starts: it adjusts them during
+    the run from the time batches take and wait in the queue, never beyond
+    max_inflight.
+
+    Per-stage timings, throughput, the distribution of valleys per read and
+    the worker utilisation are logged at the end and, given metrics_file,
+    written there as JSON.
+    """
+    metrics = Metrics()
+    inputs = [in_fastq] if isinstance(in_fastq, str) else list(in_fastq)
+    outputs = out_fastq
+    if per_input:
+        outputs = per_input_outputs(inputs, out_fastq)
+        if coords_only:
+            outputs = [f"{path}.tsv" for path in outputs]
+        ordered = True
+    coords = None
+    if coords_only:
+        coords = coords_format(out_fastq if not per_input else outputs[0])
+        ordered = True
+    if file_task_size is None:
+        file_task_size = FILE_TASK_SIZE if len(inputs) > 1 else 0
+    checkpoint_file = None
+    checkpoint_info = None
+    start = 0
+    if checkpoint_interval > 0 or resume:
+        if len(inputs) > 1 or per_input:
+            raise ValueError("checkpoints need a single input and output")
+        ordered = True
+        file_task_size = 0
+        checkpoint_interval = checkpoint_interval or CHECKPOINT_INTERVAL
+        checkpoint_file = f"{out_fastq}.checkpoint"
+        checkpoint_info = _checkpoint_info(inputs[0], out_fastq)
+        checkpoint = read_checkpoint(checkpoint_file) if resume else None
+        if checkpoint:
+            if {key: checkpoint.get(key) for key in checkpoint_info} != checkpoint_info:
+                raise ValueError(f"{checkpoint_file} belongs to another input or output")
+            # truncate would pad a missing or shorter output with NUL bytes
+            if not os.path.isfile(out_fastq) or (
+                os.path.getsize(out_fastq) < checkpoint["output_size"]
+            ):
+                raise ValueError(
+                    f"{out_fastq} is missing or shorter than {checkpoint_file} "
+                    "records, cannot resume"
+                )
+            os.truncate(out_fastq, checkpoint["output_size"])
+            start = checkpoint["input_offset"]
+            logger.info(
+                f"resuming at input byte {start}, "
+                f"output byte {checkpoint['output_size']}"
+            )
+    cpu_number = available_cpus()
     effective_threads_num = min(threads_num, cpu_number)
-    logger.info(f"{cpu_number=}, {effective_threads_num=}")
+    if max_inflight <= 0:
+        max_inflight = effective_threads_num * 8
+    if compress_threads <= 0:
+        compress_threads = effective_threads_num
+    tuner = None
+    if autotune:
+        tuner = AutoTuner(effective_threads_num, batch_size, max_inflight)
+    logger.info(
+        f"{cpu_number=}, {effective_threads_num=}, {max_inflight=}, "
+        f"{batch_size=}, {engine=}, {ordered=}, {schedule=}, {autotune=}, "
+        f"inputs={len(inputs)}"
+    )
 
-    if os.path.exists(out_fastq):
-        os.remove(out_fastq)
+    connection, writer_connection = multiprocessing.Pipe()
+    writer_process = multiprocessing.Process(
+        target=writer,
+        args=(
+            writer_connection,
+            outputs,
+            compression,
+            compress_threads,
+            ordered,
+            write_buffer_size,
+            flush_interval,
+        ),
+        kwargs={
+            "checkpoint_file": checkpoint_file,
+            "checkpoint_interval": checkpoint_interval,
+            "checkpoint_info": checkpoint_info,
+            "append": start > 0,
+            "header": coords_header(coords) if coords else b"",
+        },
+        name="ont_chopper-writer",
+    )
+    writer_process.start()
+    writer_connection.close()
 
-    manager = multiprocessing.Manager()
-    queue = manager.Queue()
     pool = multiprocessing.Pool(effective_threads_num)
 
-    watcher = pool.apply_async(listener, (queue, out_fastq))
+    # backpressure: a slot is taken per submitted batch and given back by the
+    # pool's result handler thread once the batch is handed to the writer.
+    # In ordered mode a slot is only given back once the batch can be written
+    # in input order, so the writer never holds more than max_inflight batches
+    # waiting for an earlier one.
+    inflight = InflightWindow(max_inflight)
+    errors = []
+    completed = set()
+    next_in_order = 0
 
-    jobs = []
-    for record in SeqIO.parse(in_fastq, "fastq"):
-        job = pool.apply_async(
-            adapter_finder,
-            (
-                record,
-                score_cutoff,
-                minimum_adapter_length,
-                minimum_seq_length,
-                minperc,
-                window,
-                queue,
-            ),
-        )
-        jobs.append(job)
-        reads_number += 1
-    # collect results from the workers through the pool result queue
-    for job in jobs:
-        job.get()
-    # now we are done, kill the listener
-    queue.put(None)
+    # batches submitted but not done yet, to tell the workers left idle while
+    # the main process waits for the next batch: those idle when the wait
+    # starts and those freed during it, at the times they are freed
+    running = 0
+    running_lock = threading.Lock()
+    waiting = False
+    freed = []
+
+    def _release(batch_index):
+        nonlocal next_in_order, running
+        with running_lock:
+            running -= 1
+            if waiting and running < effective_threads_num:
+                freed.append(time.perf_counter())
+        if not ordered:
+            inflight.release()
+            return
+        completed.add(batch_index)
+        while next_in_order in completed:
+            completed.remove(next_in_order)
+            next_in_order += 1
+            inflight.release()
+
+    def _done(batch_index, input_index, end_offset, submitted, result):
+        output_buffer, stats = result
+        try:
+            metrics.add_batch(stats, submitted)
+            if tuner is not None and tuner.record(stats, submitted):
+                inflight.resize(tuner.inflight)
+                logger.debug(
+                    f"autotune: batch_size={tuner.batch_size}, "
+                    f"max_inflight={tuner.inflight}"
+                )
+            if per_input:
+                connection.send((batch_index, output_buffer, input_index))
+            elif checkpoint_file:
+                connection.send((batch_index, output_buffer, 0, end_offset))
+            else:
+                connection.send((batch_index, output_buffer))
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            _release(batch_index)
+
+    def _failed(batch_index, exc):
+        errors.append(exc)
+        _release(batch_index)
+
+    if schedule not in ("length", "input"):
+        raise ValueError(f"unknown schedule: {schedule!r}")
+    # timed apart from the worker stages merged into metrics meanwhile
+    reading = Metrics()
+    tasks = fastq_tasks(
+        inputs, batch_size if tuner is None else tuner, file_task_size, reading, start
+    )
+    if schedule == "length" and not ordered:
+        tasks = length_balanced(tasks)
+    tasks = read_ahead(tasks, prefetch, reading)
+    batch_index = 0
+    try:
+        while True:
+            with running_lock:
+                waiting = True
+                idle = max(0, effective_threads_num - running)
+            tic = time.perf_counter()
+            input_index, batch, end_offset = next(tasks, (None, None, None))
+            toc = time.perf_counter()
+            with running_lock:
+                waiting = False
+                metrics.stages["starved"] += idle * (toc - tic) + sum(
+                    toc - freed_at for freed_at in freed
+                )
+                freed.clear()
+            if input_index is None:
+                break
+            if batch is None:
+                task, source = file_chopper, inputs[input_index]
+            else:
+                task, source = adapter_finder, batch
+            inflight.acquire()
+            metrics.stages["backpressure_wait"] += time.perf_counter() - toc
+            if errors:
+                inflight.release()
+                break
+            with running_lock:
+                running += 1
+            pool.apply_async(
+                task,
+                (
+                    source,
+                    score_cutoff,
+                    minimum_adapter_length,
+                    minimum_seq_length,
+                    minperc,
+                    window,
+                    engine,
+                    cache_file,
+                    cache_entries,
+                    coords,
+                    extrema_block,
+                ),
+                callback=partial(
+                    _done, batch_index, input_index, end_offset, time.time()
+                ),
+                error_callback=partial(_failed, batch_index),
+            )
+            batch_index += 1
+    except BaseException:
+        _abort(pool, connection, writer_process)
+        raise
+    finally:
+        tasks.close()
+    # wait for every outstanding batch to give its slot back
+    inflight.drain()
+    # the parse time measured by read_ahead includes its reads from the input
+    read_seconds = reading.stages["read"]
+    metrics.stages["read"] += read_seconds
+    metrics.stages["parse"] += reading.stages["parse"] - read_seconds
+    metrics.input_bytes += reading.input_bytes
     pool.close()
     pool.join()
 
-    logger.info(f"total reads number: {reads_number}")
+    write_stats = None
+    try:
+        connection.send(None)
+        write_stats = connection.recv()
+    except (EOFError, OSError):
+        pass
+    connection.close()
+    writer_process.join()
+
+    if errors:
+        raise errors[0]
+    if writer_process.exitcode != 0 or write_stats is None:
+        raise RuntimeError(
+            f"writer process failed with exit code {writer_process.exitcode}"
+        )
+
+    logger.info(
+        f"wrote {write_stats['bytes_written']} bytes in "
+        f"{write_stats['flushes']} flushes, "
+        f"{write_stats['bytes_per_second'] / 1e6:.1f} MB/s overall, "
+        f"{write_stats['write_bytes_per_second'] / 1e6:.1f} MB/s while writing"
+    )
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    metrics.finish(write_stats)
+    if tuner is not None:
+        metrics.autotune = tuner.summary()
+    report_metrics(metrics, effective_threads_num, metrics_file)
+    logger.info(f"total reads number: {metrics.reads}")
     return out_fastq
+
+
+WRITER_TIMEOUT = 30
+
+
+def _abort(pool, connection, writer_process, timeout=WRITER_TIMEOUT):
+    """Stop the workers and the writer of a run whose main loop failed.
+
+    The writer is asked to flush what it has and stop, and is terminated
+    if it does not within timeout seconds, so the caller can raise instead
+    of waiting on a non-daemon process forever.
+    """
+    pool.terminate()
+    pool.join()
+    try:
+        connection.send(None)
+        if connection.poll(timeout):
+            connection.recv()
+    except (EOFError, OSError):
+        pass
+    connection.close()
+    writer_process.join(timeout)
+    if writer_process.is_alive():
+        writer_process.terminate()
+        writer_process.join()
+
+
+def _checkpoint_info(in_fastq, out_fastq):
+    """What a checkpoint must match to be resumed from."""
+    stat = os.stat(in_fastq)
+    return {
+        "input": os.path.abspath(in_fastq),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "output": os.path.abspath(out_fastq),
+    }
+
+
+def sharded_fastq_io(
+    in_fastq: str,
+    out_fastq: str,
+    threads_num: int,
+    minimum_seq_length: int = 150,
+    minimum_adapter_length: int = 30,
+    score_cutoff: int = 20,
+    minperc: int = 10,
+    window: int = 50,
+    batch_size: int = 100,
+    engine: str = "native",
+    compression: str = "auto",
+    metrics_file: Optional[str] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+    cache_file: Optional[str] = None,
+    cache_entries: int = CACHE_ENTRIES,
+    extrema_block: int = EXTREMA_BLOCK,
+) -> str:
+    """Chop in_fastq like fastq_io, each worker reading its own byte range.
+
+    The plain FASTQ input is cut at record boundaries into one byte range per
+    worker, see byte_ranges. Every worker memory-maps its range, chops it and
+    writes a part file next to out_fastq; the parts are concatenated once all
+    are done, so the output follows the input order. The main process never
+    parses a read and the input is not copied. Read and parse times are
+    spent by the workers and both count as parse in the metrics. See
+    fastq_io for cache_file and extrema_block.
+    """
+    metrics = Metrics()
+    cpu_number = available_cpus()
+    effective_threads_num = min(threads_num, cpu_number)
+    ranges = byte_ranges(in_fastq, effective_threads_num, start, end)
+    compression = output_compression(out_fastq, compression)
+    part_files = [f"{out_fastq}.part{i}" for i in range(len(ranges))]
+    logger.info(
+        f"{cpu_number=}, {effective_threads_num=}, byte ranges={len(ranges)}, "
+        f"{batch_size=}, {engine=}"
+    )
+
+    submitted = time.time()
+    try:
+        with multiprocessing.Pool(effective_threads_num) as pool:
+            results = [
+                pool.apply_async(
+                    range_chopper,
+                    (
+                        in_fastq,
+                        range_start,
+                        range_end,
+                        part_file,
+                        compression,
+                        score_cutoff,
+                        minimum_adapter_length,
+                        minimum_seq_length,
+                        minperc,
+                        window,
+                        engine,
+                        batch_size,
+                        cache_file,
+                        cache_entries,
+                        extrema_block,
+                    ),
+                )
+                for (range_start, range_end), part_file in zip(ranges, part_files)
+            ]
+            range_stats = [result.get() for result in results]
+    except BaseException:
+        for part_file in part_files:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+        raise
+
+    for stats in range_stats:
+        metrics.add_batch(stats, submitted)
+    metrics.input_bytes = sum(right - left for left, right in ranges)
+    tic = time.perf_counter()
+    output_bytes = concatenate_parts(part_files, out_fastq, compression)
+    metrics.finish(
+        {
+            "bytes_written": output_bytes,
+            "parts": len(part_files),
+            "write_seconds": time.perf_counter() - tic,
+        }
+    )
+    report_metrics(metrics, effective_threads_num, metrics_file)
+    logger.info(f"total reads number: {metrics.reads}")
+    return out_fastq
+
+
+def report_metrics(metrics, workers, metrics_file=None):
+    """Log a summary of metrics and write them to metrics_file if given."""
+    summary = metrics.to_dict(workers)
+    logger.info(
+        f"{summary['reads_per_second']:.0f} reads/s, "
+        f"{summary['input_bytes_per_second'] / 1e6:.1f} MB/s input, "
+        f"{summary['reads_with_adapters']} reads with adapters, "
+        f"worker utilisation {summary['workers']['utilisation']:.0%}, "
+        f"starved {summary['workers']['starved_share']:.0%}"
+    )
+    logger.debug(
+        "stage seconds: "
+        + ", ".join(f"{k}={v:.3f}" for k, v in summary["stages"].items())
+    )
+    if metrics_file:
+        metrics.write(metrics_file, workers)
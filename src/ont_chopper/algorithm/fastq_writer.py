@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Dedicated output writer process."""
+import json
+import os
+import time
+from multiprocessing.connection import Connection
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+from ..utils.compression import open_output
+
+
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+FLUSH_INTERVAL = 5.0
+CHECKPOINT_INTERVAL = 60.0
+
+
+def writer(
+    connection: Connection,
+    out_fastq: Union[str, List[str]],
+    compression: str = "auto",
+    compress_threads: int = 1,
+    ordered: bool = False,
+    buffer_size: int = WRITE_BUFFER_SIZE,
+    flush_interval: float = FLUSH_INTERVAL,
+    checkpoint_file: Optional[str] = None,
+    checkpoint_interval: float = CHECKPOINT_INTERVAL,
+    checkpoint_info: Optional[Dict[str, Any]] = None,
+    append: bool = False,
+    header: bytes = b"",
+) -> None:
+    """Receive numbered batches on connection and write them to out_fastq.
+
+    Every message is a (sequence number, FASTQ bytes) tuple and None ends
+    the stream. Batches are gathered in memory and written once buffer_size
+    bytes are pending or flush_interval seconds have passed since the last
+    flush. With ordered, batches are written in sequence number order,
+    starting from 0, instead of in arrival order. When the stream ends the
+    write statistics are sent back on the connection.
+
+    out_fastq may also be a list of paths, one per input file. Messages then
+    carry the index of their output as a third item and ordered is required:
+    the outputs are written one after the other, each is closed as soon as a
+    batch of the next one comes up.
+
+    With checkpoint_file, messages carry the input offset just past their
+    batch as a fourth item and, at most every checkpoint_interval seconds
+    after a flush, the output is synced to disk and checkpoint_info is
+    written to checkpoint_file with the output size and the input offset
+    reached with every earlier batch written. This needs ordered. append
+    continues an existing output, see write_checkpoint for resuming.
+
+    Every new output starts with header.
+    """
+    outputs = [out_fastq] if isinstance(out_fastq, str) else out_fastq
+    if len(outputs) > 1 and not ordered:
+        raise ValueError("several outputs need ordered batches")
+    if checkpoint_file and (len(outputs) > 1 or not ordered):
+        raise ValueError("checkpoints need ordered batches and a single output")
+    pending = {}
+    next_seq = 0
+    chunks = []
+    buffered = 0
+    bytes_written = 0
+    batches_written = 0
+    flushes = 0
+    write_seconds = 0.0
+    started = time.perf_counter()
+    last_flush = started
+
+    handle = None
+    current = -1
+    input_offset = None
+    checkpoints = 0
+    last_checkpoint = started
+
+    def _checkpoint():
+        nonlocal checkpoints, last_checkpoint
+        os.fsync(handle.fileno())
+        write_checkpoint(
+            checkpoint_file,
+            {
+                **(checkpoint_info or {}),
+                "input_offset": input_offset,
+                "output_size": handle.tell(),
+            },
+        )
+        checkpoints += 1
+        last_checkpoint = time.perf_counter()
+
+    def _flush():
+        nonlocal chunks, buffered, bytes_written, flushes
+        nonlocal write_seconds, last_flush
+        tic = time.perf_counter()
+        if chunks:
+            handle.write(b"".join(chunks))
+            bytes_written += buffered
+            chunks = []
+            buffered = 0
+        handle.flush()
+        flushes += 1
+        last_flush = time.perf_counter()
+        if (
+            checkpoint_file
+            and input_offset is not None
+            and last_flush - last_checkpoint >= checkpoint_interval
+        ):
+            _checkpoint()
+        write_seconds += time.perf_counter() - tic
+
+    def _switch(output):
+        nonlocal handle, current, bytes_written
+        if handle is not None:
+            _flush()
+            handle.close()
+        # outputs without any batch in between still get created, empty
+        for skipped in range(current + 1, output):
+            with open_output(outputs[skipped], compression, compress_threads) as empty:
+                empty.write(header)
+            bytes_written += len(header)
+        handle = open_output(
+            outputs[output], compression, compress_threads, append=append
+        )
+        if not append:
+            handle.write(header)
+            bytes_written += len(header)
+        current = output
+
+    def _append(output, data, offset=None):
+        nonlocal buffered, batches_written, input_offset
+        if output != current:
+            _switch(output)
+        if offset is not None:
+            input_offset = offset
+        chunks.append(data)
+        buffered += len(data)
+        batches_written += 1
+
+    try:
+        _switch(0)
+        while True:
+            if not connection.poll(flush_interval):
+                if chunks:
+                    _flush()
+                continue
+            message = connection.recv()
+            if message is None:
+                break
+            seq, data, *extra = message
+            output = extra[0] if extra else 0
+            offset = extra[1] if len(extra) > 1 else None
+            if ordered:
+                pending[seq] = (output, data, offset)
+                while next_seq in pending:
+                    _append(*pending.pop(next_seq))
+                    next_seq += 1
+            else:
+                _append(output, data, offset)
+            if (
+                buffered >= buffer_size
+                or time.perf_counter() - last_flush >= flush_interval
+            ):
+                _flush()
+        if pending:
+            raise RuntimeError(
+                f"output stream ended with {len(pending)} batches missing before "
+                f"batch {min(pending)}"
+            )
+        if current != len(outputs) - 1:
+            _switch(len(outputs) - 1)
+        else:
+            _flush()
+    finally:
+        if handle is not None:
+            handle.close()
+
+    elapsed = time.perf_counter() - started
+    connection.send(
+        {
+            "bytes_written": bytes_written,
+            "batches_written": batches_written,
+            "flushes": flushes,
+            "checkpoints": checkpoints,
+            "write_seconds": write_seconds,
+            "elapsed_seconds": elapsed,
+            "bytes_per_second": bytes_written / elapsed if elapsed else 0.0,
+            "write_bytes_per_second": (
+                bytes_written / write_seconds if write_seconds else 0.0
+            ),
+        }
+    )
+    connection.close()
+
+
+def write_checkpoint(checkpoint_file: str, checkpoint: Dict[str, Any]) -> None:
+    """Atomically replace checkpoint_file with checkpoint as JSON."""
+    partial_file = f"{checkpoint_file}.partial"
+    with open(partial_file, "w") as handle:
+        json.dump(checkpoint, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(partial_file, checkpoint_file)
+
+
+def read_checkpoint(checkpoint_file: str) -> Optional[Dict[str, Any]]:
+    """Checkpoint in checkpoint_file, None when there is none."""
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file) as handle:
+        return json.load(handle)
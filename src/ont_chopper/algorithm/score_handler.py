@@ -1,103 +1,399 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from findpeaks import findpeaks
+import time
+import warnings
+
+import numpy as np
+from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Tuple
 from typing import Union
 
 
-def find_numbers_less_and_greater(numbers, target) -> Tuple:
-    """the first number that is less than and the first number that
-        is greater than a target number in a list of numbers
-    :param numbers: a list of numbers
-    :param target: the target number
-    :type numbers: list
-    :type target: int
-    :rtype: tuple
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and (inclusive) stop indices of the runs of True in mask."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[0::2], edges[1::2] - 1
+
+
+def low_score_runs(
+    phred_quality_score: Union[List[int], np.ndarray], score_cutoff: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Run-length encode the stretches of bases scoring at most score_cutoff.
+
+    :rtype: tuple of (run starts, run ends), ends exclusive
+    """
+    starts, stops = _runs(np.asarray(phred_quality_score) <= score_cutoff)
+    return starts, stops + 1
+
+
+def can_have_adapter(
+    phred_quality_score: Union[List[int], np.ndarray],
+    score_cutoff: int,
+    minimum_adapter_length: int,
+) -> bool:
+    """Whether a read may hold an adapter longer than minimum_adapter_length.
+
+    valley_extension never grows an adapter beyond the run of bases scoring
+    at most score_cutoff around its valley, plus the base before it, so an
+    adapter longer than minimum_adapter_length needs such a run of at least
+    minimum_adapter_length bases. Reads without one can skip valley_finder.
     """
+    starts, ends = low_score_runs(phred_quality_score, score_cutoff)
+    return len(starts) > 0 and int((ends - starts).max()) >= minimum_adapter_length
 
-    less_than_target = None
-    greater_than_target = None
 
-    for num in numbers:
-        if num < target:
-            if less_than_target is None or num > less_than_target:
-                less_than_target = num
-        elif num > target:
-            if greater_than_target is None or num < greater_than_target:
-                greater_than_target = num
+def find_numbers_less_and_greater(
+    numbers: np.ndarray, targets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """the last number that is less than and the first number that
+        is greater than each target, in a sorted array of numbers
+    :param numbers: a sorted array of numbers
+    :param targets: the target numbers
+    :type numbers: np.ndarray
+    :type targets: np.ndarray
+    :rtype: tuple of arrays, -1 where no such number exists
+    """
+    numbers = np.asarray(numbers)
+    targets = np.asarray(targets)
+    if len(numbers) == 0:
+        missing = np.full(targets.shape, -1)
+        return missing, missing.copy()
 
+    below = np.searchsorted(numbers, targets, side="left") - 1
+    above = np.searchsorted(numbers, targets, side="right")
+    less_than_target = np.where(below >= 0, numbers[np.maximum(below, 0)], -1)
+    greater_than_target = np.where(
+        above < len(numbers), numbers[np.minimum(above, len(numbers) - 1)], -1
+    )
     return less_than_target, greater_than_target
 
 
 def valley_extension(
-    tgt_index, phred_quality_score, peak_candidates_indices, score_cutoff
+    tgt_indices,
+    phred_quality_score,
+    peak_candidates_indices,
+    score_cutoff,
+    score_runs=None,
 ):
-    """ Obtain valley zone that satisfy score cutoff.
+    """ Obtain valley zones that satisfy score cutoff.
+
+    Every valley is extended over the run of bases scoring at most
+    score_cutoff that contains it, without crossing the neighbouring peaks.
+    score_runs are the low_score_runs of the read and are computed when not
+    given. Returns the (start, end) arrays of the zones; like the original
+    base-by-base walk, start is one before the first low scoring base.
     """
-    read_length = len(phred_quality_score)
+    score = np.asarray(phred_quality_score)
+    read_length = len(score)
+    tgt_indices = np.asarray(tgt_indices, dtype=np.intp)
+    if score_runs is None:
+        score_runs = low_score_runs(score, score_cutoff)
+    run_starts, run_ends = score_runs
+    if len(run_starts) == 0:
+        return tgt_indices.copy(), tgt_indices.copy()
 
     lower_bound, upper_bound = find_numbers_less_and_greater(
-        peak_candidates_indices, tgt_index
+        peak_candidates_indices, tgt_indices
     )
+    upper_bound = np.where(upper_bound < 0, read_length - 1, upper_bound)
+    lower_bound = np.where(lower_bound < 0, 0, lower_bound)
 
-    if upper_bound is None:
-        upper_bound = read_length - 1
+    run = np.maximum(np.searchsorted(run_starts, tgt_indices, side="right") - 1, 0)
+    low = score[tgt_indices] <= score_cutoff
+    tgt_start = np.where(
+        low, np.maximum(run_starts[run], lower_bound) - 1, tgt_indices
+    )
+    tgt_end = np.where(low, np.minimum(run_ends[run], upper_bound + 1), tgt_indices)
+    return tgt_start, tgt_end
 
-    if lower_bound is None:
-        lower_bound = 0
 
-    # extend in the right direction
-    tgt_end = tgt_index
-    for _idx in range(tgt_index, upper_bound + 1):
-        if phred_quality_score[_idx] <= score_cutoff:
-            tgt_end += 1
-        else:
-            break
+def _position_runs(positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and (inclusive) stop of the runs of consecutive sorted positions."""
+    breaks = np.flatnonzero(np.diff(positions) != 1)
+    return (
+        np.concatenate((positions[:1], positions[breaks + 1])),
+        np.concatenate((positions[breaks], positions[-1:])),
+    )
 
-    # extend in the left direction
-    tgt_start = tgt_index
-    for _idx in range(tgt_index, lower_bound - 1, -1):
-        if phred_quality_score[_idx] <= score_cutoff:
-            tgt_start -= 1
-        else:
-            break
 
-    return (tgt_start, tgt_end)
+def _merge_runs(
+    starts: np.ndarray, stops: np.ndarray, gap: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge consecutive runs that are separated by at most gap positions."""
+    if len(starts) < 2:
+        return starts, stops
+    keep = (starts[1:] - stops[:-1]) > gap
+    return (
+        np.concatenate((starts[:1], starts[1:][keep])),
+        np.concatenate((stops[:-1][keep], stops[-1:])),
+    )
 
 
-def valley_finder(
-    phred_quality_score: List[int],
-    score_cutoff: int = 20,
+EXTREMA_BLOCK = 16384
+
+
+def _hot(
+    x: np.ndarray, spans: np.ndarray, lo: int, hi: int, minperc: int
+) -> np.ndarray:
+    """Columns lo to hi (exclusive) of the caerus_extrema hot matrix.
+
+    hot[c, i] is the percentage change from base i to base i + spans[c] - 1,
+    NaN where it is not above minperc.
+    """
+    read_length = len(x)
+    hot = np.full((len(spans), hi - lo), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for c, span in enumerate(spans):
+            size = min(hi, read_length - span + 1) - lo
+            if size > 0:
+                head = x[lo : lo + size]
+                hot[c, :size] = (x[lo + span - 1 : lo + span - 1 + size] - head) / head * 100
+        hot[np.isinf(hot)] = np.nan
+        hot[~(hot > minperc)] = np.nan
+    return hot
+
+
+class _HotRows:
+    """Rows of the transposed hot matrix, computed a block at a time."""
+
+    def __init__(self, x: np.ndarray, spans: np.ndarray, minperc: int, block: int):
+        self.x = x
+        self.spans = spans
+        self.minperc = minperc
+        self.block = block
+        self.start = self.stop = 0
+        self.rows = None
+
+    def __call__(self, start: int, stop: int) -> np.ndarray:
+        """Rows start to stop (exclusive), at most block of them.
+
+        They come from the held block when it has them, otherwise the block
+        starting at start is computed and held instead.
+        """
+        stop = min(stop, len(self.x))
+        if stop - start > self.block:
+            raise ValueError(f"{stop - start} rows asked, blocks hold {self.block}")
+        if self.rows is None or start < self.start or stop > self.stop:
+            self.start, self.stop = start, min(len(self.x), start + self.block)
+            self.rows = _hot(self.x, self.spans, self.start, self.stop, self.minperc).T
+        return self.rows[start - self.start : stop - self.start]
+
+    def nanmean(self, start: int, stop: int) -> float:
+        """Mean of the non-NaN values of rows start to stop (exclusive).
+
+        Up to block rows this is np.nanmean of the rows. Longer stretches
+        are summed and counted a block at a time, which may round the last
+        bits differently.
+        """
+        stop = min(stop, len(self.x))
+        if stop - start <= self.block:
+            return np.nanmean(self(start, stop))
+        total = 0.0
+        count = 0
+        for lo in range(start, stop, self.block):
+            rows = self(lo, min(lo + self.block, stop))
+            total += np.nansum(rows)
+            count += np.count_nonzero(~np.isnan(rows))
+        return total / count if count else np.nan
+
+
+def caerus_extrema(
+    phred_quality_score: Union[List[int], np.ndarray],
     minperc: int = 10,
     window: int = 50,
-) -> List[Tuple[int, int]]:
-    """Identify valley in phred_quality_score."""
+    nlargest: int = 10,
+    threshold: float = 0.25,
+    gap: int = 10,
+    block: int = EXTREMA_BLOCK,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """NumPy port of the caerus valley/peak detection used by findpeaks.
 
-    adapter_positions = []
-    if len(phred_quality_score) < window * 2:
-        return adapter_positions
+    Mirrors caerus 0.1.x with the parameters findpeaks passes to it: for
+    every position the percentage change over each span of 2 to window - 1
+    bases is computed, positions where more than threshold of the spans rise
+    by over minperc percent form start regions, and the top nlargest spans
+    of every start region give its stop regions. Regions closer than gap
+    bases are merged. The minimum of each start region is a valley and the
+    maximum over its stop regions is the matching peak.
+
+    The percentage changes take 8 * (window - 2) bytes per base, so they are
+    computed block bases at a time: once to find the start regions and again
+    for each region and the window after it. No more than block bases of
+    them are held at once, whatever the read. Every value is the same as in
+    a single pass over the read, and so are the results, except that the
+    mean change of a stop region longer than block is summed block by
+    block, see _HotRows.nanmean.
+
+    :param phred_quality_score: per base phred scores
+    :param minperc: minimum percentage rise for a span to count
+    :param window: window size
+    :param block: bases of percentage changes held at once
+    :rtype: tuple of (valley indices, peak indices), one pair per region
+    """
+    x = np.asarray(phred_quality_score, dtype=np.float64)
+    read_length = len(x)
+    spans = np.arange(2, min(window, read_length))
+    empty = np.empty(0, dtype=np.intp)
+    if len(spans) == 0:
+        return empty, empty
+
+    # the last block is kept for the regions, so reads of up to block bases
+    # compute the changes once
+    hot_rows = _HotRows(x, spans, minperc, block)
+    rising = np.concatenate(
+        [
+            np.count_nonzero(hot_rows(lo, lo + block) > 0, axis=1)
+            for lo in range(0, read_length, block)
+        ]
+    )
+    # the last positions only have the shorter spans available
+    available = np.minimum(len(spans), read_length - np.arange(read_length))
+    starts, stops = _runs(rising / available > threshold)
+    if len(starts) == 0:
+        return empty, empty
+    starts, stops = _merge_runs(starts, stops, gap)
+
+    # caerus keeps this matrix column-major; sharing the layout keeps the
+    # nanmean sums, and therefore the stop region ordering, identical
+    valleys = np.empty(len(starts), dtype=np.intp)
+    peaks = np.empty(len(starts), dtype=np.intp)
+    for k, (start, stop) in enumerate(zip(starts, stops)):
+        valleys[k] = start + np.argmin(x[start : stop + 1])
+
+        ends = []
+        for lo in range(start, stop + 1, block):
+            rows = hot_rows(lo, min(lo + block, stop + 1))
+            top = np.argsort(-rows, axis=1, kind="stable")[:, :nlargest]
+            picked = np.take_along_axis(rows, top, axis=1)
+            offsets = top + spans[0] + np.arange(lo, lo + len(rows))[:, None]
+            ends.append(offsets[~np.isnan(picked)])
+        ends = np.unique(np.concatenate(ends))
+        end_starts, end_stops = _merge_runs(*_position_runs(ends), gap)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            means = np.array(
+                [
+                    hot_rows.nanmean(end_start, end_stop + 1)
+                    if end_start < read_length
+                    else np.nan
+                    for end_start, end_stop in zip(end_starts, end_stops)
+                ]
+            )
+        peak = -1
+        for r in np.argsort(means)[::-1]:
+            lo = min(end_starts[r], read_length - 1)
+            hi = min(end_stops[r] + 1, read_length)
+            candidate = lo + int(np.argmax(x[lo:hi]))
+            if peak < 0 or x[candidate] > x[peak]:
+                peak = candidate
+        peaks[k] = peak
+
+    return valleys, peaks
+
+
+def findpeaks_extrema(
+    phred_quality_score: Union[List[int], np.ndarray],
+    minperc: int = 10,
+    window: int = 50,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Valley and peak indices from findpeaks' caerus method.
+
+    findpeaks is optional and imported here, as it pulls in pandas, scipy
+    and matplotlib.
+    """
+    try:
+        from findpeaks import findpeaks
+    except ImportError:
+        raise ImportError(
+            "the findpeaks engine needs findpeaks: pip install 'ont_chopper[findpeaks]'"
+        ) from None
 
     fp = findpeaks(
         method="caerus", params_caerus={"minperc": minperc, "window": window}, verbose=0
     )
-    result = fp.fit(phred_quality_score)
+    result = fp.fit(list(phred_quality_score))
     data = result["df"]
 
     del fp
     del result
 
-    valley_positions = list(
-        data[(data["valley"] == True) & (data["y"] <= score_cutoff)]["x"]
-    )
-    peak_positions = list(
-        data[(data["peak"] == True) & (data["y"] > score_cutoff)]["x"]
+    return (
+        data.loc[data["valley"], "x"].to_numpy(),
+        data.loc[data["peak"], "x"].to_numpy(),
     )
 
-    for tgt_index in valley_positions:
-        position_tuple = valley_extension(
-            tgt_index, phred_quality_score, peak_positions, score_cutoff
+
+def find_extrema(
+    phred_quality_score: List[int],
+    minperc: int = 10,
+    window: int = 50,
+    engine: str = "native",
+    block: int = EXTREMA_BLOCK,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw valley and peak indices of phred_quality_score found by engine.
+
+    They only depend on the quality string, minperc, window and engine, not
+    on the score cutoff, see ExtremaCache. block bounds the memory of the
+    native engine, see caerus_extrema.
+    """
+    if engine == "findpeaks":
+        return findpeaks_extrema(phred_quality_score, minperc, window)
+    if engine == "native":
+        return caerus_extrema(phred_quality_score, minperc, window, block=block)
+    raise ValueError(f"unknown valley detection engine: {engine!r}")
+
+
+def valley_finder(
+    phred_quality_score: List[int],
+    score_cutoff: int = 20,
+    minperc: int = 10,
+    window: int = 50,
+    engine: str = "native",
+    timings: Optional[Dict[str, float]] = None,
+    extrema: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    block: int = EXTREMA_BLOCK,
+) -> List[Tuple[int, int]]:
+    """Identify valley in phred_quality_score.
+
+    When timings is given, the seconds spent detecting and extending the
+    valleys are added to its "valley_finding" and "extension" entries.
+    extrema, the find_extrema result of a previous run, skips the detection.
+    block is passed on to find_extrema.
+    """
+
+    adapter_positions = []
+    if len(phred_quality_score) < window * 2:
+        return adapter_positions
+
+    tic = time.perf_counter()
+    if extrema is None:
+        valleys, peaks = find_extrema(
+            phred_quality_score, minperc, window, engine, block
         )
-        if not position_tuple in adapter_positions:
+    else:
+        valleys, peaks = extrema
+
+    toc = time.perf_counter()
+
+    score = np.asarray(phred_quality_score)
+    valleys = np.unique(valleys)
+    peaks = np.unique(peaks)
+    valley_positions = valleys[score[valleys] <= score_cutoff]
+    peak_positions = peaks[score[peaks] > score_cutoff]
+
+    tgt_start, tgt_end = valley_extension(
+        valley_positions, score, peak_positions, score_cutoff
+    )
+    seen = set()
+    for position_tuple in zip(tgt_start.tolist(), tgt_end.tolist()):
+        if position_tuple not in seen:
+            seen.add(position_tuple)
             adapter_positions.append(position_tuple)
+    if timings is not None:
+        timings["valley_finding"] += toc - tic
+        timings["extension"] += time.perf_counter() - toc
     return adapter_positions
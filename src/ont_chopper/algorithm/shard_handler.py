@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Plan, run and merge shards of one FASTQ processed on several nodes."""
+import json
+import os
+import time
+from typing import Optional
+
+from loguru import logger
+
+from .fastq_handler import sharded_fastq_io
+from .score_handler import EXTREMA_BLOCK
+from ..utils.extrema_cache import CACHE_ENTRIES
+from ..utils.compression import output_compression
+from ..utils.fastq_splitter import concatenate_parts
+from ..utils.fastq_splitter import read_manifest
+from ..utils.fastq_splitter import shard_path
+from ..utils.fastq_splitter import shard_plan
+from ..utils.fastq_splitter import write_manifest
+from ..utils.metrics import merge_metrics
+
+
+def plan_shards(in_fastq: str, shards: int, manifest_file: str) -> str:
+    """Write the manifest cutting in_fastq into shards shards."""
+    manifest = shard_plan(in_fastq, shards)
+    write_manifest(manifest, manifest_file)
+    logger.info(
+        f"planned {shards} shards of {manifest['input_bytes']} bytes, "
+        f"{sum(shard['records'] for shard in manifest['shards'])} reads "
+        f"in {manifest_file}"
+    )
+    return manifest_file
+
+
+def _shard_metrics_path(part_fastq: str) -> str:
+    return f"{part_fastq}.metrics.json"
+
+
+def run_shard(
+    manifest_file: str,
+    shard: int,
+    shards: int,
+    out_fastq: str,
+    threads_num: int,
+    minimum_seq_length: int = 150,
+    minimum_adapter_length: int = 30,
+    score_cutoff: int = 20,
+    minperc: int = 10,
+    window: int = 50,
+    batch_size: int = 100,
+    engine: str = "native",
+    compression: str = "auto",
+    in_fastq: Optional[str] = None,
+    cache_file: Optional[str] = None,
+    cache_entries: int = CACHE_ENTRIES,
+    extrema_block: int = EXTREMA_BLOCK,
+) -> str:
+    """Chop shard shard (1-based) out of shards of the manifest.
+
+    The shard is written with its metrics next to out_fastq, see shard_path,
+    for merge_shards to pick up. in_fastq overrides the input path of the
+    manifest, for nodes mounting it elsewhere; it must be the same file.
+    See fastq_io for cache_file and extrema_block.
+    """
+    manifest = read_manifest(manifest_file)
+    if len(manifest["shards"]) != shards:
+        raise ValueError(
+            f"{manifest_file} plans {len(manifest['shards'])} shards, not {shards}"
+        )
+    if not 1 <= shard <= shards:
+        raise ValueError(f"shard {shard} out of range 1-{shards}")
+    in_fastq = in_fastq or manifest["input"]
+    if os.path.getsize(in_fastq) != manifest["input_bytes"]:
+        raise ValueError(f"{in_fastq} is not the input planned in {manifest_file}")
+
+    entry = manifest["shards"][shard - 1]
+    part_fastq = shard_path(out_fastq, shard, shards)
+    logger.info(
+        f"shard {shard}/{shards}: bytes {entry['start']}-{entry['end']}, "
+        f"{entry['records']} reads"
+    )
+    sharded_fastq_io(
+        in_fastq,
+        part_fastq,
+        threads_num,
+        minimum_seq_length,
+        minimum_adapter_length,
+        score_cutoff,
+        minperc,
+        window,
+        batch_size=batch_size,
+        engine=engine,
+        compression=output_compression(out_fastq, compression),
+        metrics_file=_shard_metrics_path(part_fastq),
+        start=entry["start"],
+        end=entry["end"],
+        cache_file=cache_file,
+        cache_entries=cache_entries,
+        extrema_block=extrema_block,
+    )
+    return part_fastq
+
+
+def merge_shards(
+    manifest_file: str,
+    out_fastq: str,
+    compression: str = "auto",
+    metrics_file: Optional[str] = None,
+) -> str:
+    """Concatenate the shard outputs of the manifest into out_fastq.
+
+    Every shard must be done and must account for the reads planned for it.
+    The shard outputs and metrics are removed and the combined metrics are
+    written to metrics_file if given.
+    """
+    manifest = read_manifest(manifest_file)
+    shards = len(manifest["shards"])
+    part_files = [shard_path(out_fastq, k, shards) for k in range(1, shards + 1)]
+    missing = [
+        path
+        for part_file in part_files
+        for path in (part_file, _shard_metrics_path(part_file))
+        if not os.path.exists(path)
+    ]
+    if missing:
+        raise FileNotFoundError(f"unfinished shards, missing {', '.join(missing)}")
+
+    shard_metrics = []
+    for entry, part_file in zip(manifest["shards"], part_files):
+        with open(_shard_metrics_path(part_file)) as handle:
+            metrics = json.load(handle)
+        if metrics["reads"] != entry["records"]:
+            raise ValueError(
+                f"shard {entry['shard']} chopped {metrics['reads']} reads, "
+                f"{entry['records']} planned"
+            )
+        shard_metrics.append(metrics)
+
+    tic = time.perf_counter()
+    output_bytes = concatenate_parts(part_files, out_fastq, compression)
+    merged = merge_metrics(
+        shard_metrics,
+        {"bytes_written": output_bytes, "write_seconds": time.perf_counter() - tic},
+    )
+    for part_file in part_files:
+        os.remove(_shard_metrics_path(part_file))
+    if metrics_file:
+        with open(metrics_file, "w") as handle:
+            json.dump(merged, handle, indent=2)
+            handle.write("\n")
+    logger.info(
+        f"merged {shards} shards, {merged['reads']} reads, "
+        f"{merged['reads_per_second']:.0f} reads/s"
+    )
+    return out_fastq
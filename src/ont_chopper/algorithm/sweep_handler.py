@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Evaluate a grid of chopping parameters in a single pass over the input."""
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from collections import deque
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+from loguru import logger
+
+from .fastq_handler import fastq_tasks
+from .fastq_handler import read_adapters
+from .fastq_handler import read_segments
+from .fastq_handler import segment_records
+from .score_handler import can_have_adapter
+from .score_handler import find_extrema
+from .score_handler import valley_finder
+from ..utils.compression import open_output
+from ..utils.cpus import available_cpus
+from ..utils.fastq_reader import phred_scores
+from ..utils.metrics import Metrics
+from ..utils.metrics import batch_stats
+
+
+# lower edges of the segment length histogram bins
+LENGTH_BINS = (0, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+
+class SweepParams(NamedTuple):
+    """One combination of the chopping parameters."""
+
+    score_cutoff: int
+    minperc: int
+    window: int
+    minimum_adapter_length: int
+    minimum_seq_length: int
+
+    @property
+    def name(self) -> str:
+        """Short name of the combination, used for its output file."""
+        return (
+            f"score{self.score_cutoff}_minperc{self.minperc}_window{self.window}_"
+            f"adapter{self.minimum_adapter_length}_seq{self.minimum_seq_length}"
+        )
+
+
+def parameter_grid(
+    score_cutoffs, minpercs, windows, minimum_adapter_lengths, minimum_seq_lengths
+) -> List[SweepParams]:
+    """Every combination of the given parameter values."""
+    return [
+        SweepParams(*values)
+        for values in itertools.product(
+            score_cutoffs,
+            minpercs,
+            windows,
+            minimum_adapter_lengths,
+            minimum_seq_lengths,
+        )
+    ]
+
+
+def length_bin(length: int) -> int:
+    """Lower edge of the LENGTH_BINS bin of length."""
+    for edge in reversed(LENGTH_BINS):
+        if length >= edge:
+            return edge
+    return 0
+
+
+def combination_stats() -> Dict[str, Any]:
+    """Fresh statistics of a combination over a batch."""
+    return {
+        "reads": 0,
+        "reads_chopped": 0,
+        "reads_dropped": 0,
+        "reads_prefiltered": 0,
+        "segments": 0,
+        "output_bases": 0,
+        "lengths": Counter(),
+        "seconds": 0.0,
+    }
+
+
+def sweep_batch(batch, grid, engine="native", with_output=False):
+    """Chop a batch of (title, seq, quality) reads with every combination of grid.
+
+    The phred scores of a read are computed once, its valley detection once
+    per (minperc, window) and its adapters once per (score cutoff, minperc,
+    window); only the segmentation is done per combination. The detection
+    is skipped for the combinations where the read cannot hold an adapter,
+    see can_have_adapter, and altogether when that holds for all of them.
+    The seconds of a combination are those a run with it alone would spend,
+    the shared steps included. Returns the batch_stats of the batch, the
+    combination_stats of every combination and, with with_output, their
+    FASTQ buffers.
+    """
+    stats = batch_stats()
+    results = [combination_stats() for _ in grid]
+    buffers = [[] for _ in grid] if with_output else None
+    tic = time.perf_counter()
+    for title, seq, quality in batch:
+        toc = time.perf_counter()
+        score = phred_scores(quality)
+        scoring = time.perf_counter() - toc
+        extrema = {}
+        adapters = {}
+        prefiltered = {}
+        for k, params in enumerate(grid):
+            detection = (params.minperc, params.window)
+            cutoff = (params.score_cutoff, *detection)
+            candidate = (params.score_cutoff, params.minimum_adapter_length)
+            if candidate not in prefiltered:
+                toc = time.perf_counter()
+                prefiltered[candidate] = (
+                    not can_have_adapter(score, *candidate),
+                    time.perf_counter() - toc,
+                )
+                stats["prefilter"] += prefiltered[candidate][1]
+            skipped, prefilter_seconds = prefiltered[candidate]
+            if skipped:
+                positions, detection_seconds, cutoff_seconds = [], 0.0, 0.0
+            else:
+                if detection not in extrema:
+                    toc = time.perf_counter()
+                    found = None
+                    if len(score) >= params.window * 2:
+                        found = find_extrema(score, *detection, engine)
+                    extrema[detection] = found, time.perf_counter() - toc
+                    stats["valley_finding"] += extrema[detection][1]
+                found, detection_seconds = extrema[detection]
+                if cutoff not in adapters:
+                    toc = time.perf_counter()
+                    positions = valley_finder(
+                        score, params.score_cutoff, *detection, engine, extrema=found
+                    )
+                    adapters[cutoff] = positions, time.perf_counter() - toc
+                    stats["extension"] += adapters[cutoff][1]
+                positions, cutoff_seconds = adapters[cutoff]
+
+            toc = time.perf_counter()
+            segments = read_segments(
+                read_adapters(positions, params.minimum_adapter_length),
+                len(seq),
+                params.minimum_seq_length,
+            )
+            result = results[k]
+            result["reads"] += 1
+            result["reads_prefiltered"] += skipped
+            if segments is None:
+                result["output_bases"] += len(seq)
+                result["lengths"][length_bin(len(seq))] += 1
+            else:
+                result["reads_chopped"] += 1
+                result["reads_dropped"] += not segments
+                result["segments"] += len(segments)
+                for segment_start, segment_end in segments:
+                    result["output_bases"] += segment_end - segment_start
+                    result["lengths"][length_bin(segment_end - segment_start)] += 1
+            if with_output:
+                buffers[k].append(
+                    segment_records(b"@" + title, seq, quality, segments)
+                )
+            segmenting = time.perf_counter() - toc
+            stats["serialisation"] += segmenting
+            result["seconds"] += (
+                scoring
+                + prefilter_seconds
+                + detection_seconds
+                + cutoff_seconds
+                + segmenting
+            )
+        stats["reads"] += 1
+    stats["busy_seconds"] = time.perf_counter() - tic
+    if with_output:
+        buffers = [b"".join(buffer) for buffer in buffers]
+    return stats, results, buffers
+
+
+def _summary(params: SweepParams, result: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON serialisable report of a combination."""
+    seconds = result["seconds"]
+    return {
+        **params._asdict(),
+        "reads": result["reads"],
+        "reads_chopped": result["reads_chopped"],
+        "reads_dropped": result["reads_dropped"],
+        "reads_prefiltered": result["reads_prefiltered"],
+        "segments": result["segments"],
+        "output_bases": result["output_bases"],
+        "segment_length_histogram": {
+            str(edge): result["lengths"][edge]
+            for edge in LENGTH_BINS
+            if result["lengths"][edge]
+        },
+        "seconds": seconds,
+        "reads_per_second": result["reads"] / seconds if seconds else 0.0,
+    }
+
+
+def sweep(
+    in_fastq,
+    grid: List[SweepParams],
+    threads_num: int,
+    engine: str = "native",
+    batch_size: int = 100,
+    max_inflight: int = 0,
+    out_dir: Optional[str] = None,
+    compression: str = "none",
+    report_file: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Chop in_fastq with every combination of grid, reading it only once.
+
+    Batches are streamed to the workers like fastq_io does, at most
+    max_inflight at a time (0 for eight per worker), and every worker runs
+    sweep_batch on its batch. Per combination, the reads chopped and dropped,
+    the segments, a histogram of the output lengths over LENGTH_BINS and the
+    throughput of a run with that combination alone are reported, along with
+    the run metrics. With out_dir, the output of every combination is
+    written there, in input order, as <SweepParams.name>.fastq. The report is
+    returned and written to report_file as JSON if given.
+    """
+    inputs = [in_fastq] if isinstance(in_fastq, str) else list(in_fastq)
+    metrics = Metrics()
+    cpu_number = available_cpus()
+    effective_threads_num = min(threads_num, cpu_number)
+    if max_inflight <= 0:
+        max_inflight = effective_threads_num * 8
+    logger.info(
+        f"sweeping {len(grid)} combinations, {effective_threads_num=}, "
+        f"{batch_size=}, {engine=}"
+    )
+
+    handles = []
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        suffix = {"none": "", "gzip": ".gz", "bgzf": ".bgz"}[compression]
+        handles = [
+            open_output(
+                os.path.join(out_dir, f"{params.name}.fastq{suffix}"), compression
+            )
+            for params in grid
+        ]
+    totals = [combination_stats() for _ in grid]
+
+    def _collect(pending):
+        submitted, result = pending.popleft()
+        stats, results, buffers = result.get()
+        metrics.add_batch(stats, submitted)
+        for total, batch_result in zip(totals, results):
+            for key, value in batch_result.items():
+                total[key] += value
+        if buffers:
+            tic = time.perf_counter()
+            for handle, buffer in zip(handles, buffers):
+                handle.write(buffer)
+            metrics.stages["write"] += time.perf_counter() - tic
+
+    try:
+        with multiprocessing.Pool(effective_threads_num) as pool:
+            pending = deque()
+            tasks = fastq_tasks(inputs, batch_size, metrics=metrics)
+            while True:
+                tic = time.perf_counter()
+                input_index, batch, _ = next(tasks, (None, None, None))
+                metrics.stages["parse"] += time.perf_counter() - tic
+                if input_index is None:
+                    break
+                if batch is None:
+                    # an empty input
+                    continue
+                if len(pending) >= max_inflight:
+                    tic = time.perf_counter()
+                    _collect(pending)
+                    metrics.stages["backpressure_wait"] += time.perf_counter() - tic
+                pending.append(
+                    (
+                        time.time(),
+                        pool.apply_async(
+                            sweep_batch, (batch, grid, engine, bool(handles))
+                        ),
+                    )
+                )
+            metrics.stages["parse"] -= metrics.stages["read"]
+            while pending:
+                _collect(pending)
+    finally:
+        for handle in handles:
+            handle.close()
+    metrics.finish()
+
+    report = {
+        "run": metrics.to_dict(effective_threads_num),
+        "combinations": [
+            _summary(params, total) for params, total in zip(grid, totals)
+        ],
+    }
+    for combination in report["combinations"]:
+        logger.info(
+            f"score={combination['score_cutoff']} "
+            f"minperc={combination['minperc']} window={combination['window']} "
+            f"min_adapter={combination['minimum_adapter_length']} "
+            f"min_seq={combination['minimum_seq_length']}: "
+            f"{combination['reads_chopped']} reads chopped, "
+            f"{combination['segments']} segments, "
+            f"{combination['reads_per_second']:.0f} reads/s"
+        )
+    logger.info(
+        f"{metrics.reads} reads swept in {report['run']['wall_seconds']:.1f}s"
+    )
+    if report_file:
+        with open(report_file, "w") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+    return report
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Incremental chopping of the FASTQ chunks of a live sequencing run."""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from functools import partial
+from typing import Dict
+from typing import Optional
+
+from loguru import logger
+
+from .fastq_handler import file_chopper
+from .fastq_handler import report_metrics
+from .score_handler import EXTREMA_BLOCK
+from ..utils.compression import open_output
+from ..utils.compression import output_compression
+from ..utils.cpus import available_cpus
+from ..utils.extrema_cache import CACHE_ENTRIES
+from ..utils.input_files import directory_fastqs
+from ..utils.metrics import Metrics
+
+
+STATE_FILE = ".ont_chopper_watch.jsonl"
+
+
+def load_state(state_file: str) -> Dict[str, dict]:
+    """Completed inputs recorded in state_file, by input path."""
+    done = {}
+    if os.path.exists(state_file):
+        with open(state_file) as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    done[entry["input"]] = entry
+    return done
+
+
+def record_state(state_file: str, entry: dict) -> None:
+    """Append a completed input to state_file."""
+    with open(state_file, "a") as handle:
+        handle.write(json.dumps(entry) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def chunk_chopper(
+    in_fastq,
+    out_fastq,
+    compression,
+    score_cutoff,
+    minimum_adapter_length,
+    minimum_seq_length,
+    minperc,
+    window,
+    engine="native",
+    cache_file=None,
+    cache_entries=CACHE_ENTRIES,
+    extrema_block=EXTREMA_BLOCK,
+):
+    """Chop in_fastq into out_fastq in a worker, see file_chopper.
+
+    The output shows up under its name only once complete. Returns the
+    batch_stats of the file.
+    """
+    output_buffer, stats = file_chopper(
+        in_fastq,
+        score_cutoff,
+        minimum_adapter_length,
+        minimum_seq_length,
+        minperc,
+        window,
+        engine,
+        cache_file,
+        cache_entries,
+        extrema_block=extrema_block,
+    )
+    tic = time.perf_counter()
+    partial_fastq = f"{out_fastq}.partial"
+    # the .partial suffix would hide the extension "auto" goes by
+    compression = output_compression(out_fastq, compression)
+    with open_output(partial_fastq, compression) as handle:
+        handle.write(output_buffer)
+    os.replace(partial_fastq, out_fastq)
+    stats["write"] = time.perf_counter() - tic
+    return stats
+
+
+def watch(
+    in_dir: str,
+    out_dir: str,
+    threads_num: int,
+    minimum_seq_length: int = 150,
+    minimum_adapter_length: int = 30,
+    score_cutoff: int = 20,
+    minperc: int = 10,
+    window: int = 50,
+    engine: str = "native",
+    compression: str = "auto",
+    poll_interval: float = 5.0,
+    idle_timeout: Optional[float] = None,
+    state_file: Optional[str] = None,
+    metrics_file: Optional[str] = None,
+    cache_file: Optional[str] = None,
+    cache_entries: int = CACHE_ENTRIES,
+    extrema_block: int = EXTREMA_BLOCK,
+) -> str:
+    """Chop the FASTQ files showing up in in_dir into out_dir as they come.
+
+    in_dir is polled every poll_interval seconds. A file is taken once its
+    size and modification time are unchanged over a poll, then chopped whole
+    by a worker of a pool kept for the whole run into the same relative
+    path under out_dir. Completed files are appended to state_file, by
+    default in out_dir, and skipped when watching again, so a restart
+    resumes where the last run stopped. The run ends on Ctrl-C or after
+    idle_timeout seconds without any file to do. Besides the usual metrics,
+    the latency of every chunk from first sight to output is reported.
+    See fastq_io for cache_file and extrema_block.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state_file = state_file or os.path.join(out_dir, STATE_FILE)
+    done = load_state(state_file)
+    metrics = Metrics()
+    effective_threads_num = min(threads_num, available_cpus())
+    logger.info(
+        f"watching {in_dir} every {poll_interval}s, {len(done)} files already done"
+    )
+
+    lock = threading.Lock()
+    pending = set()
+    errors = []
+    seen = {}
+
+    def _done(path, entry, first_seen, submitted, stats):
+        finished = time.time()
+        with lock:
+            metrics.add_batch(stats, submitted)
+            metrics.add_chunk(finished - first_seen, finished - submitted)
+            try:
+                record_state(state_file, entry)
+            except Exception as exc:
+                errors.append(exc)
+            done[path] = entry
+            pending.discard(path)
+        logger.info(f"chopped {path} in {finished - first_seen:.1f}s")
+
+    def _failed(path, exc):
+        with lock:
+            errors.append(exc)
+            pending.discard(path)
+
+    # outputs written inside the watched directory are not inputs
+    out_prefix = os.path.join(os.path.abspath(out_dir), "")
+    pool = multiprocessing.Pool(effective_threads_num)
+    last_activity = time.perf_counter()
+    try:
+        while not errors:
+            listed = set()
+            for path in directory_fastqs(in_dir):
+                if os.path.abspath(path).startswith(out_prefix):
+                    continue
+                with lock:
+                    if path in done or path in pending:
+                        continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # deleted or renamed since listed, a new name shows up anew
+                    continue
+                listed.add(path)
+                key = (stat.st_size, stat.st_mtime_ns)
+                previous_key, first_seen = seen.get(path, (None, time.time()))
+                seen[path] = (key, first_seen)
+                if key != previous_key:
+                    continue
+                # unchanged since the last poll, the file is complete
+                out_fastq = os.path.join(out_dir, os.path.relpath(path, in_dir))
+                os.makedirs(os.path.dirname(out_fastq), exist_ok=True)
+                entry = {"input": path, "size": stat.st_size, "output": out_fastq}
+                with lock:
+                    pending.add(path)
+                pool.apply_async(
+                    chunk_chopper,
+                    (
+                        path,
+                        out_fastq,
+                        compression,
+                        score_cutoff,
+                        minimum_adapter_length,
+                        minimum_seq_length,
+                        minperc,
+                        window,
+                        engine,
+                        cache_file,
+                        cache_entries,
+                        extrema_block,
+                    ),
+                    callback=partial(_done, path, entry, first_seen, time.time()),
+                    error_callback=partial(_failed, path),
+                )
+                del seen[path]
+            for path in set(seen) - listed:
+                del seen[path]
+            with lock:
+                busy = bool(pending) or bool(seen)
+            if busy:
+                last_activity = time.perf_counter()
+            elif (
+                idle_timeout is not None
+                and time.perf_counter() - last_activity >= idle_timeout
+            ):
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        logger.info("watch interrupted, unfinished files are redone on restart")
+        pool.terminate()
+    else:
+        pool.close()
+    pool.join()
+
+    if errors:
+        raise errors[0]
+    metrics.finish()
+    report_metrics(metrics, effective_threads_num, metrics_file)
+    return out_dir
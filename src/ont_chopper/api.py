@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""In-memory Python API of the chopper.
+
+The functions here work on reads already in memory and return coordinates
+instead of FASTQ. They neither log nor touch the filesystem, so they can be
+embedded in other pipelines and benchmarked on their own::
+
+    from ont_chopper.api import ChopParams, chop_batch
+
+    for read in chop_batch(headers, seqs, quals, ChopParams(score_cutoff=15)):
+        for start, end in read.segments:
+            ...
+"""
+from dataclasses import dataclass
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+from .algorithm.fastq_handler import read_adapters
+from .algorithm.fastq_handler import read_segments
+from .algorithm.score_handler import EXTREMA_BLOCK
+from .algorithm.score_handler import can_have_adapter
+from .algorithm.score_handler import valley_finder
+from .utils.fastq_reader import phred_scores
+
+
+Quality = Union[bytes, str, np.ndarray]
+
+
+@dataclass(frozen=True)
+class ChopParams:
+    """Chopping parameters, with the command line defaults.
+
+    extrema_block bounds the memory of the valley detection on very long
+    reads without changing its results, see caerus_extrema.
+    """
+
+    score_cutoff: int = 20
+    minimum_adapter_length: int = 30
+    minimum_seq_length: int = 150
+    minperc: int = 10
+    window: int = 50
+    engine: str = "native"
+    extrema_block: int = EXTREMA_BLOCK
+
+
+class ChoppedRead(NamedTuple):
+    """Where a read is cut.
+
+    segments are the (start, end) coordinates, end exclusive, of the parts
+    of the read that are kept: [(0, read length)] for a read without
+    adapters and [] for a read with no part long enough. adapters are the
+    (start, end) coordinates of the adapters cut out.
+    """
+
+    header: object
+    segments: List[Tuple[int, int]]
+    adapters: List[Tuple[int, int]]
+
+
+def _scores(quality: Quality) -> np.ndarray:
+    """Phred scores of a quality string, or the scores themselves."""
+    if isinstance(quality, np.ndarray):
+        return quality
+    if isinstance(quality, str):
+        quality = quality.encode("ascii")
+    return phred_scores(quality)
+
+
+def chop_read(
+    header, seq, quality: Quality, params: Optional[ChopParams] = None
+) -> ChoppedRead:
+    """Chop a single read, see chop_batch."""
+    params = params or ChopParams()
+    read_length = len(seq)
+    score = _scores(quality)
+    adapter_positions = []
+    if can_have_adapter(score, params.score_cutoff, params.minimum_adapter_length):
+        adapter_positions = valley_finder(
+            score,
+            params.score_cutoff,
+            params.minperc,
+            params.window,
+            params.engine,
+            block=params.extrema_block,
+        )
+    adapters = read_adapters(adapter_positions, params.minimum_adapter_length)
+    segments = read_segments(adapters, read_length, params.minimum_seq_length)
+    if segments is None:
+        segments = [(0, read_length)]
+    return ChoppedRead(header, segments, adapters)
+
+
+def chop_batch(
+    headers: Sequence,
+    seqs: Sequence,
+    quals: Sequence[Quality],
+    params: Optional[ChopParams] = None,
+) -> List[ChoppedRead]:
+    """Chop a batch of reads held in memory.
+
+    headers are passed through untouched and may be anything. seqs are
+    only used for their length, so bytes, str or NumPy arrays all do. quals
+    are Sanger encoded quality strings as bytes or str, or NumPy arrays of
+    phred scores. The coordinates are those of the FASTQ written by
+    fastq_io for the same params.
+    """
+    if not len(headers) == len(seqs) == len(quals):
+        raise ValueError("headers, seqs and quals differ in length")
+    return [
+        chop_read(header, seq, quality, params)
+        for header, seq, quality in zip(headers, seqs, quals)
+    ]
+
+
+def chop_stream(
+    reads: Iterable[Tuple[object, object, Quality]],
+    params: Optional[ChopParams] = None,
+) -> Iterator[ChoppedRead]:
+    """Lazily chop an iterable of (header, seq, quality) reads, see chop_batch."""
+    for header, seq, quality in reads:
+        yield chop_read(header, seq, quality, params)
@@ -5,8 +5,10 @@ import argparse
 import textwrap
 from dataclasses import dataclass
 from typing import Any
+from typing import List
 from typing import Optional
 from typing import Tuple
+from typing import Union
 
 from ont_chopper import __version__
 
@@ -15,13 +17,41 @@ from ont_chopper import __version__
 class DefaultOptions:
     """Cli default options."""
 
-    input: str
+    input: List[str]
     score: int = 20
-    thread: int = 1
+    thread: Union[int, str] = 1
     minimum_seq_length: int = 150
     minimum_adapter_length: int = 30
     minperc: int = 10
     window: int = 50
+    max_inflight: int = 0
+    batch_size: int = 100
+    schedule: str = "length"
+    prefetch: int = 16
+    autotune: bool = False
+    engine: str = "native"
+    cache: Optional[str] = None
+    cache_entries: int = 1_000_000
+    extrema_block: int = 16384
+    compression: str = "auto"
+    compress_threads: int = 0
+    ordered: bool = False
+    per_input: bool = False
+    coords_only: bool = False
+    checkpoint_interval: float = 0
+    resume: bool = False
+    byte_ranges: bool = False
+    write_buffer: int = 8
+    flush_interval: float = 5.0
+    metrics: Optional[str] = None
+    plan: Optional[int] = None
+    shard: Optional[Tuple[int, int]] = None
+    merge: bool = False
+    manifest: str = "shards.json"
+    watch: Optional[str] = None
+    poll_interval: float = 5.0
+    watch_timeout: Optional[float] = None
+    state_file: Optional[str] = None
     log: str = "info"
     output: str = "result.fastq"
 
@@ -57,6 +87,42 @@ class RichHelpFormatter(argparse.HelpFormatter):
         super().__init__(*args, max_help_position=42, **kwargs)  # type: ignore
 
 
+def shard_spec(value: str) -> Tuple[int, int]:
+    """Parse a k/N shard specification."""
+    try:
+        shard, shards = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected k/N, got {value!r}") from None
+    if not 1 <= shard <= shards:
+        raise argparse.ArgumentTypeError(f"shard {shard} out of range 1-{shards}")
+    return shard, shards
+
+
+def int_list(value: str) -> List[int]:
+    """Parse a comma separated list of integers."""
+    try:
+        return [int(part) for part in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected comma separated integers, got {value!r}"
+        ) from None
+
+
+def thread_count(value: str) -> Union[int, str]:
+    """Parse a positive number of threads, or auto."""
+    if value == "auto":
+        return value
+    try:
+        threads = int(value)
+    except ValueError:
+        threads = 0
+    if threads < 1:
+        raise argparse.ArgumentTypeError(
+            f"expected a positive integer or auto, got {value!r}"
+        )
+    return threads
+
+
 def parse_args() -> argparse.ArgumentParser:
     """Parse command line arguments."""
     parser = RichArgParser(
@@ -73,8 +139,9 @@ def parse_args() -> argparse.ArgumentParser:
         "--input",
         action="store",
         dest="input",
-        help="Input FASTQ file",
-        required=True,
+        nargs="+",
+        help="Input FASTQ files, directories or glob patterns, optionally gzip/BGZF "
+        "compressed; with --shard it defaults to the planned input",
     )
     parser.add_argument(
         "-s",
@@ -90,8 +157,9 @@ def parse_args() -> argparse.ArgumentParser:
         "--thread",
         action="store",
         dest="thread",
-        help="thread number (default: %(default)s)",
-        type=int,
+        help="thread number, auto for the CPUs allowed by the CPU affinity and cgroup "
+        "quota of the job (default: %(default)s)",
+        type=thread_count,
         default=DefaultOptions.thread,
     )
     parser.add_argument(
@@ -116,6 +184,81 @@ def parse_args() -> argparse.ArgumentParser:
         help="Output adapter removed FASTQ file. (default: %(default)s)",
         default=DefaultOptions.output,
     )
+    parser.add_argument(
+        "--per-input",
+        action="store_true",
+        dest="per_input",
+        help="write one output per input file, with the same name, into the --output directory",
+    )
+    parser.add_argument(
+        "--coords-only",
+        action="store_true",
+        dest="coords_only",
+        help="write a table of the segment and adapter coordinates instead of FASTQ, binary "
+        "for a .bin --output and TSV otherwise; implies --ordered, see ont_chopper apply",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store",
+        dest="compression",
+        choices=["auto", "none", "gzip", "bgzf"],
+        help="output compression, auto follows the extension: .gz for gzip, .bgz for BGZF (default: %(default)s)",
+        default=DefaultOptions.compression,
+    )
+    parser.add_argument(
+        "--compress-threads",
+        action="store",
+        dest="compress_threads",
+        type=int,
+        help="threads compressing the output, 0 for the thread number (default: %(default)s)",
+        default=DefaultOptions.compress_threads,
+    )
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        dest="ordered",
+        help="write reads in input order, identical for any thread number; the writer "
+        "then holds back up to --max-inflight batches",
+    )
+    parser.add_argument(
+        "--byte-ranges",
+        action="store_true",
+        dest="byte_ranges",
+        help="let every worker memory-map and chop its own byte range of a plain FASTQ input, "
+        "writing part files that are concatenated in input order at the end",
+    )
+    parser.add_argument(
+        "--write-buffer",
+        action="store",
+        dest="write_buffer",
+        type=int,
+        help="MiB of output gathered by the writer before it flushes (default: %(default)s)",
+        default=DefaultOptions.write_buffer,
+    )
+    parser.add_argument(
+        "--flush-interval",
+        action="store",
+        dest="flush_interval",
+        type=float,
+        help="maximum seconds between two output flushes (default: %(default)s)",
+        default=DefaultOptions.flush_interval,
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        action="store",
+        dest="checkpoint_interval",
+        type=float,
+        help="seconds between checkpoints in <output>.checkpoint, 0 for none; implies --ordered "
+        "(default: %(default)s)",
+        default=DefaultOptions.checkpoint_interval,
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        help="truncate the output to its last checkpoint and carry on from there; "
+        "starts over without one and takes checkpoints either way",
+    )
     parser.add_argument(
         "--minperc",
         action="store",
@@ -132,6 +275,150 @@ def parse_args() -> argparse.ArgumentParser:
         help="window size (default: %(default)s)",
         default=DefaultOptions.window,
     )
+    parser.add_argument(
+        "--engine",
+        action="store",
+        dest="engine",
+        choices=["native", "findpeaks"],
+        help="valley detection engine, native is a NumPy port of findpeaks' caerus method (default: %(default)s)",
+        default=DefaultOptions.engine,
+    )
+    parser.add_argument(
+        "--cache",
+        action="store",
+        dest="cache",
+        metavar="SQLITE",
+        help="keep the valley detection of every read in this file and reuse it in runs "
+        "that only change --score, --min-adapter-len or --min-seq-len",
+        default=DefaultOptions.cache,
+    )
+    parser.add_argument(
+        "--cache-entries",
+        action="store",
+        dest="cache_entries",
+        type=int,
+        help="reads kept in the --cache, least recently used first out (default: %(default)s)",
+        default=DefaultOptions.cache_entries,
+    )
+    parser.add_argument(
+        "--extrema-block",
+        action="store",
+        dest="extrema_block",
+        type=int,
+        help="bases of a read the valley detection works on at once, bounding its memory "
+        "to about 8 x (window - 2) bytes per base of it (default: %(default)s)",
+        default=DefaultOptions.extrema_block,
+    )
+    parser.add_argument(
+        "--max-inflight",
+        action="store",
+        dest="max_inflight",
+        type=int,
+        help="maximum number of batches queued for the workers at once, 0 for 8 x thread (default: %(default)s)",
+        default=DefaultOptions.max_inflight,
+    )
+    parser.add_argument(
+        "--batch-size",
+        action="store",
+        dest="batch_size",
+        type=int,
+        help="number of reads sent to a worker per task (default: %(default)s)",
+        default=DefaultOptions.batch_size,
+    )
+    parser.add_argument(
+        "--schedule",
+        action="store",
+        dest="schedule",
+        choices=["length", "input"],
+        help="length regroups the reads of every 4 batches of an input into batches of "
+        "about equal bases, longest first; input keeps the input order, as --ordered "
+        "does (default: %(default)s)",
+        default=DefaultOptions.schedule,
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store",
+        dest="prefetch",
+        type=int,
+        help="number of batches read and parsed ahead by a background thread, 0 to read "
+        "them in between submissions (default: %(default)s)",
+        default=DefaultOptions.prefetch,
+    )
+    parser.add_argument(
+        "--autotune",
+        action="store_true",
+        dest="autotune",
+        help="adjust --batch-size and the in-flight depth, up to --max-inflight, during the "
+        "run from the measured batch times and queue occupancy",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store",
+        dest="metrics",
+        metavar="JSON",
+        help="write per-stage timings, throughput and worker utilisation to this JSON file",
+        default=DefaultOptions.metrics,
+    )
+    sharding = parser.add_mutually_exclusive_group()
+    sharding.add_argument(
+        "--plan",
+        action="store",
+        dest="plan",
+        type=int,
+        metavar="N",
+        help="write a --manifest cutting the plain FASTQ input into N shards and exit",
+    )
+    sharding.add_argument(
+        "--shard",
+        action="store",
+        dest="shard",
+        type=shard_spec,
+        metavar="K/N",
+        help="chop shard K (1-based) of the N in --manifest into <output>.shardKofN",
+    )
+    sharding.add_argument(
+        "--merge",
+        action="store_true",
+        dest="merge",
+        help="concatenate the shard outputs of --manifest into the output and merge their metrics",
+    )
+    parser.add_argument(
+        "--manifest",
+        action="store",
+        dest="manifest",
+        help="shard manifest of --plan, --shard and --merge (default: %(default)s)",
+        default=DefaultOptions.manifest,
+    )
+    parser.add_argument(
+        "--watch",
+        action="store",
+        dest="watch",
+        metavar="DIR",
+        help="chop the FASTQ files of a live run as they appear in DIR into the --output directory",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        action="store",
+        dest="poll_interval",
+        type=float,
+        help="seconds between two looks at the --watch directory (default: %(default)s)",
+        default=DefaultOptions.poll_interval,
+    )
+    parser.add_argument(
+        "--watch-timeout",
+        action="store",
+        dest="watch_timeout",
+        type=float,
+        help="stop watching after this many seconds without new files, default never",
+        default=DefaultOptions.watch_timeout,
+    )
+    parser.add_argument(
+        "--state-file",
+        action="store",
+        dest="state_file",
+        help="record of the files done by --watch, to resume from; default in the --output directory",
+        default=DefaultOptions.state_file,
+    )
     parser.add_argument(
         "--log-level",
         action="store",
@@ -146,3 +433,183 @@ def parse_args() -> argparse.ArgumentParser:
     )
 
     return parser
+
+
+def parse_sweep_args() -> argparse.ArgumentParser:
+    """Parse the command line arguments of the sweep subcommand."""
+    parser = RichArgParser(
+        prog="ont_chopper sweep",
+        description="[red]ont_chopper sweep[/] :rocket: "
+        "evaluate every combination of a parameter grid in one pass over the input",
+        formatter_class=RichHelpFormatter,
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        action="store",
+        dest="input",
+        nargs="+",
+        required=True,
+        help="Input FASTQ files, directories or glob patterns, optionally gzip/BGZF compressed",
+    )
+    parser.add_argument(
+        "-s",
+        "--score",
+        dest="score",
+        type=int_list,
+        metavar="LIST",
+        help="comma separated maximum phred scores of adapter sequence (default: %(default)s)",
+        default=[DefaultOptions.score],
+    )
+    parser.add_argument(
+        "--minperc",
+        dest="minperc",
+        type=int_list,
+        metavar="LIST",
+        help="comma separated minimum percentage differences of peaks and valleys "
+        "(default: %(default)s)",
+        default=[DefaultOptions.minperc],
+    )
+    parser.add_argument(
+        "--window",
+        dest="window",
+        type=int_list,
+        metavar="LIST",
+        help="comma separated window sizes (default: %(default)s)",
+        default=[DefaultOptions.window],
+    )
+    parser.add_argument(
+        "--min-adapter-len",
+        dest="minimum_adapter_length",
+        type=int_list,
+        metavar="LIST",
+        help="comma separated minimum adapter lengths (default: %(default)s)",
+        default=[DefaultOptions.minimum_adapter_length],
+    )
+    parser.add_argument(
+        "--min-seq-len",
+        dest="minimum_seq_length",
+        type=int_list,
+        metavar="LIST",
+        help="comma separated minimum FASTQ sequence lengths after chopping "
+        "(default: %(default)s)",
+        default=[DefaultOptions.minimum_seq_length],
+    )
+    parser.add_argument(
+        "-t",
+        "--thread",
+        dest="thread",
+        type=thread_count,
+        help="thread number, or auto (default: %(default)s)",
+        default=DefaultOptions.thread,
+    )
+    parser.add_argument(
+        "--engine",
+        dest="engine",
+        choices=["native", "findpeaks"],
+        help="valley detection engine (default: %(default)s)",
+        default=DefaultOptions.engine,
+    )
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        type=int,
+        help="number of reads sent to a worker per task (default: %(default)s)",
+        default=DefaultOptions.batch_size,
+    )
+    parser.add_argument(
+        "--max-inflight",
+        dest="max_inflight",
+        type=int,
+        help="maximum number of batches queued for the workers at once, 0 for 8 x thread "
+        "(default: %(default)s)",
+        default=DefaultOptions.max_inflight,
+    )
+    parser.add_argument(
+        "--output-dir",
+        dest="output_dir",
+        metavar="DIR",
+        help="also write the output of every combination into DIR, named after its parameters",
+    )
+    parser.add_argument(
+        "--compress",
+        dest="compression",
+        choices=["none", "gzip", "bgzf"],
+        help="compression of the --output-dir files (default: %(default)s)",
+        default="none",
+    )
+    parser.add_argument(
+        "--report",
+        dest="report",
+        metavar="JSON",
+        help="write the per-combination report to this JSON file (default: %(default)s)",
+        default="sweep.json",
+    )
+    parser.add_argument(
+        "--log-level",
+        dest="log",
+        choices=["info", "debug", "trace"],
+        default=DefaultOptions.log,
+        help="set log level (default: %(default)s)",
+    )
+    return parser
+
+
+def parse_apply_args() -> argparse.ArgumentParser:
+    """Parse the command line arguments of the apply subcommand."""
+    parser = RichArgParser(
+        prog="ont_chopper apply",
+        description="[red]ont_chopper apply[/] :rocket: "
+        "cut the input reads at the coordinates of a --coords-only table",
+        formatter_class=RichHelpFormatter,
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        action="store",
+        dest="input",
+        nargs="+",
+        required=True,
+        help="Input FASTQ files, directories or glob patterns the table was made from, "
+        "in the same order",
+    )
+    parser.add_argument(
+        "-c",
+        "--coords",
+        action="store",
+        dest="coords",
+        required=True,
+        help="coordinates table written by --coords-only",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        action="store",
+        dest="output",
+        help="Output adapter removed FASTQ file. (default: %(default)s)",
+        default=DefaultOptions.output,
+    )
+    parser.add_argument(
+        "--compress",
+        action="store",
+        dest="compression",
+        choices=["auto", "none", "gzip", "bgzf"],
+        help="output compression, auto follows the extension (default: %(default)s)",
+        default=DefaultOptions.compression,
+    )
+    parser.add_argument(
+        "--compress-threads",
+        action="store",
+        dest="compress_threads",
+        type=int,
+        help="threads compressing the output (default: %(default)s)",
+        default=1,
+    )
+    parser.add_argument(
+        "--log-level",
+        dest="log",
+        choices=["info", "debug", "trace"],
+        default=DefaultOptions.log,
+        help="set log level (default: %(default)s)",
+    )
+    return parser
@@ -12,17 +12,27 @@ from typing import Union
 
 from loguru import logger
 
+from ..algorithm.apply_handler import apply_coords
 from ..algorithm.fastq_handler import fastq_io
+from ..algorithm.fastq_handler import sharded_fastq_io
+from ..algorithm.shard_handler import merge_shards
+from ..algorithm.shard_handler import plan_shards
+from ..algorithm.shard_handler import run_shard
+from ..algorithm.sweep_handler import parameter_grid
+from ..algorithm.sweep_handler import sweep
+from ..algorithm.watch_handler import watch
+from ..utils.compression import is_gzipped
+from ..utils.cpus import available_cpus
+from ..utils.input_files import expand_inputs
 from .arg import DefaultOptions
 
 
-def cli(options: Union[argparse.Namespace, DefaultOptions]):
-    """Cli function."""
-    # add logger
+def _add_logger(level: str):
+    """Log to stdout from level on."""
     logger.remove()
     logger.add(
         sys.stdout,
-        level=options.log.upper(),
+        level=level.upper(),
         format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
         "<level>{level: <8}</level> | "
         "<cyan>{line}</cyan> - <level>{message}</level>",
@@ -31,5 +41,158 @@ def cli(options: Union[argparse.Namespace, DefaultOptions]):
         backtrace=False,
         diagnose=True,
     )
-    fastq_io(options.input, options.output, options.thread, options.minimum_seq_length, options.minimum_adapter_length, options.score, options.minperc, options.window)
 
+
+def _threads(thread: Union[int, str]) -> int:
+    """Number of workers for a --thread value."""
+    if thread == "auto":
+        threads = available_cpus()
+        logger.info(f"--thread auto: {threads} CPUs available")
+        return threads
+    return thread
+
+
+def cli(options: Union[argparse.Namespace, DefaultOptions]):
+    """Cli function."""
+    _add_logger(options.log)
+    if options.coords_only and (
+        options.watch or options.shard or options.merge or options.byte_ranges
+    ):
+        raise SystemExit("--coords-only only works with the default streaming mode")
+    if options.watch:
+        watch(
+            options.watch,
+            options.output,
+            _threads(options.thread),
+            options.minimum_seq_length,
+            options.minimum_adapter_length,
+            options.score,
+            options.minperc,
+            options.window,
+            engine=options.engine,
+            compression=options.compression,
+            cache_file=options.cache,
+            cache_entries=options.cache_entries,
+            extrema_block=options.extrema_block,
+            poll_interval=options.poll_interval,
+            idle_timeout=options.watch_timeout,
+            state_file=options.state_file,
+            metrics_file=options.metrics,
+        )
+        return
+    inputs = expand_inputs(options.input) if options.input else []
+    single_input = inputs[0] if len(inputs) == 1 else None
+    if (options.plan or options.byte_ranges) and single_input is None:
+        raise SystemExit("--plan and --byte-ranges take a single input file")
+    if options.plan:
+        plan_shards(single_input, options.plan, options.manifest)
+        return
+    if options.shard:
+        run_shard(
+            options.manifest,
+            *options.shard,
+            options.output,
+            _threads(options.thread),
+            options.minimum_seq_length,
+            options.minimum_adapter_length,
+            options.score,
+            options.minperc,
+            options.window,
+            batch_size=options.batch_size,
+            engine=options.engine,
+            compression=options.compression,
+            cache_file=options.cache,
+            cache_entries=options.cache_entries,
+            extrema_block=options.extrema_block,
+            in_fastq=single_input,
+        )
+        return
+    if options.merge:
+        merge_shards(
+            options.manifest, options.output, options.compression, options.metrics
+        )
+        return
+    if options.byte_ranges and is_gzipped(single_input):
+        logger.warning("--byte-ranges needs an uncompressed input, streaming instead")
+    elif options.byte_ranges:
+        sharded_fastq_io(
+            single_input,
+            options.output,
+            _threads(options.thread),
+            options.minimum_seq_length,
+            options.minimum_adapter_length,
+            options.score,
+            options.minperc,
+            options.window,
+            batch_size=options.batch_size,
+            engine=options.engine,
+            compression=options.compression,
+            cache_file=options.cache,
+            cache_entries=options.cache_entries,
+            extrema_block=options.extrema_block,
+            metrics_file=options.metrics,
+        )
+        return
+    fastq_io(
+        inputs,
+        options.output,
+        _threads(options.thread),
+        options.minimum_seq_length,
+        options.minimum_adapter_length,
+        options.score,
+        options.minperc,
+        options.window,
+        max_inflight=options.max_inflight,
+        batch_size=options.batch_size,
+        engine=options.engine,
+        compression=options.compression,
+        cache_file=options.cache,
+        cache_entries=options.cache_entries,
+        extrema_block=options.extrema_block,
+        compress_threads=options.compress_threads,
+        ordered=options.ordered,
+        write_buffer_size=options.write_buffer * 1024 * 1024,
+        flush_interval=options.flush_interval,
+        metrics_file=options.metrics,
+        per_input=options.per_input,
+        checkpoint_interval=options.checkpoint_interval,
+        resume=options.resume,
+        coords_only=options.coords_only,
+        schedule=options.schedule,
+        prefetch=options.prefetch,
+        autotune=options.autotune,
+    )
+
+
+def sweep_cli(options: argparse.Namespace):
+    """Cli function of the sweep subcommand."""
+    _add_logger(options.log)
+    sweep(
+        expand_inputs(options.input),
+        parameter_grid(
+            options.score,
+            options.minperc,
+            options.window,
+            options.minimum_adapter_length,
+            options.minimum_seq_length,
+        ),
+        _threads(options.thread),
+        engine=options.engine,
+        batch_size=options.batch_size,
+        max_inflight=options.max_inflight,
+        out_dir=options.output_dir,
+        compression=options.compression,
+        report_file=options.report,
+    )
+
+
+def apply_cli(options: argparse.Namespace):
+    """Cli function of the apply subcommand."""
+    _add_logger(options.log)
+    apply_coords(
+        expand_inputs(options.input),
+        options.coords,
+        options.output,
+        options.compression,
+        options.compress_threads,
+    )
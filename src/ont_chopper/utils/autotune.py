@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Adaptive batch size and in-flight depth of a chopping run."""
+import threading
+from typing import Any
+from typing import Dict
+
+
+TARGET_BATCH_SECONDS = 1.0
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 10000
+
+
+class InflightWindow:
+    """Semaphore bounding the batches in flight, resizable while in use."""
+
+    def __init__(self, slots: int):
+        """Start with slots free slots."""
+        self.slots = slots
+        self._taken = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Take a slot, waiting until fewer than slots are taken."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._taken < self.slots)
+            self._taken += 1
+
+    def release(self) -> None:
+        """Give a slot back."""
+        with self._condition:
+            self._taken -= 1
+            self._condition.notify_all()
+
+    def resize(self, slots: int) -> None:
+        """Change the number of slots; taken slots beyond it drain as released."""
+        with self._condition:
+            self.slots = slots
+            self._condition.notify_all()
+
+    def drain(self) -> None:
+        """Wait until every slot is given back."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._taken == 0)
+
+
+class AutoTuner:
+    """Tune the batch size and in-flight depth of a run from its batches.
+
+    After every round of workers finished batches, the batch size is set so
+    a batch takes a worker about target_seconds at the measured seconds per
+    read: long enough to amortise the cost of handing it over, short enough
+    to share the reads evenly. It changes by at most a factor of 2 per round,
+    within MIN_BATCH_SIZE and MAX_BATCH_SIZE.
+
+    The queue occupancy, the mean time batches waited for a worker over the
+    mean time a worker spent on one, is about the number of batches queued
+    per worker. Below 1 a worker may find the queue empty, so the in-flight
+    depth doubles, up to max_inflight. Above 3 batches only wait in memory
+    (and, for ordered runs, in the writer), so it shrinks by workers, down
+    to two batches per worker.
+
+    record is meant to be called from a single thread, the pool's result
+    handler; batch_size and inflight may be read from any thread.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        max_inflight: int,
+        target_seconds: float = TARGET_BATCH_SECONDS,
+    ):
+        """Start from batch_size and max_inflight."""
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_inflight = max_inflight
+        self.min_inflight = min(max_inflight, 2 * workers)
+        self.inflight = max_inflight
+        self.target_seconds = target_seconds
+        self.rounds = 0
+        self._range = {
+            "batch_size": [batch_size, batch_size],
+            "inflight": [max_inflight, max_inflight],
+        }
+        self._reset()
+
+    def _reset(self) -> None:
+        self._batches = 0
+        self._reads = 0
+        self._busy = 0.0
+        self._queue_wait = 0.0
+
+    def __call__(self) -> int:
+        """Current batch size, for fastq_batches."""
+        return self.batch_size
+
+    def record(self, stats: Dict[str, Any], submitted: float) -> bool:
+        """Account a finished batch_stats batch; whether the settings changed."""
+        if not stats["reads"]:
+            return False
+        self._batches += 1
+        self._reads += stats["reads"]
+        self._busy += stats["busy_seconds"]
+        self._queue_wait += max(0.0, stats["started"] - submitted)
+        if self._batches < self.workers:
+            return False
+        batch_size, inflight = self.batch_size, self.inflight
+        if self._busy > 0:
+            wanted = self.target_seconds * self._reads / self._busy
+            wanted = min(max(wanted, batch_size / 2), batch_size * 2)
+            self.batch_size = int(min(max(wanted, MIN_BATCH_SIZE), MAX_BATCH_SIZE))
+            occupancy = self._queue_wait / self._busy
+            if occupancy < 1:
+                self.inflight = min(self.max_inflight, inflight * 2)
+            elif occupancy > 3:
+                self.inflight = max(self.min_inflight, inflight - self.workers)
+        self.rounds += 1
+        for key in self._range:
+            value = getattr(self, key)
+            low, high = self._range[key]
+            self._range[key] = [min(low, value), max(high, value)]
+        self._reset()
+        return (batch_size, inflight) != (self.batch_size, self.inflight)
+
+    def summary(self) -> Dict[str, Any]:
+        """Final settings and their range over the run."""
+        return {
+            "rounds": self.rounds,
+            **{
+                key: {"final": getattr(self, key), "min": low, "max": high}
+                for key, (low, high) in self._range.items()
+            },
+        }
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Transparent gzip/BGZF input and multi-threaded compressed output."""
+import gzip
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+COMPRESSIONS = ("auto", "none", "gzip", "bgzf")
+
+# BGZF blocks hold at most 64 KiB of compressed data, htslib fills them with
+# 0xff00 bytes of input so the compressed block always fits
+BGZF_BLOCK_SIZE = 0xFF00
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+# independent gzip members, large enough to keep the ratio of a single stream
+GZIP_BLOCK_SIZE = 1024 * 1024
+
+
+def is_gzipped(path: str) -> bool:
+    """Whether the file at path starts with the gzip magic bytes."""
+    with open(path, "rb") as handle:
+        return handle.read(2) == GZIP_MAGIC
+
+
+def open_input(path: str) -> BinaryIO:
+    """Open a plain, gzip or BGZF file for binary reading.
+
+    Compression is detected from the magic bytes, not the file name.
+    """
+    if is_gzipped(path):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def output_compression(path: str, compression: str = "auto") -> str:
+    """Resolve compression "auto" from the output file extension."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression: {compression!r}")
+    if compression != "auto":
+        return compression
+    if path.endswith((".bgz", ".bgzf")):
+        return "bgzf"
+    if path.endswith(".gz"):
+        return "gzip"
+    return "none"
+
+
+def open_output(
+    path: str,
+    compression: str = "auto",
+    threads: int = 1,
+    level: int = 6,
+    append: bool = False,
+) -> BinaryIO:
+    """Open path for binary writing, compressed with gzip or BGZF if asked.
+
+    Compressed output is cut into independent blocks that are deflated by
+    threads threads; zlib releases the GIL so they run in parallel. gzip
+    output is a valid multi-member gzip file, BGZF output is readable by
+    htslib and any gzip reader. With append, writing continues at the end of
+    path, which must then end on a block boundary (and, for BGZF, before the
+    end of file marker).
+    """
+    compression = output_compression(path, compression)
+    if compression == "none":
+        return open(path, "ab" if append else "wb")
+    return BlockCompressedWriter(path, compression == "bgzf", threads, level, append)
+
+
+def _bgzf_block(data: bytes, level: int) -> bytes:
+    """Compress data into a single BGZF block."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = struct.pack(
+        "<BBBBIBBHBBHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata) + 25
+    )
+    trailer = struct.pack("<II", zlib.crc32(data), len(data))
+    return header + cdata + trailer
+
+
+def _gzip_member(data: bytes, level: int) -> bytes:
+    """Compress data into a self-contained gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class BlockCompressedWriter:
+    """Binary file writer compressing fixed-size blocks on a thread pool."""
+
+    def __init__(
+        self,
+        path: str,
+        bgzf: bool = False,
+        threads: int = 1,
+        level: int = 6,
+        append: bool = False,
+    ):
+        """Open path, bgzf selects BGZF blocks instead of gzip members."""
+        self._handle = open(path, "ab" if append else "wb")
+        self._bgzf = bgzf
+        self._block_size = BGZF_BLOCK_SIZE if bgzf else GZIP_BLOCK_SIZE
+        self._compress = _bgzf_block if bgzf else _gzip_member
+        self._level = level
+        self._threads = max(1, threads)
+        self._executor = None
+        if self._threads > 1:
+            self._executor = ThreadPoolExecutor(self._threads)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        """Buffer data and compress every complete block."""
+        self._buffer += data
+        if len(self._buffer) >= self._block_size:
+            size = len(self._buffer) // self._block_size * self._block_size
+            view = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            for start in range(0, size, self._block_size):
+                self._submit(view[start : start + self._block_size])
+        return len(data)
+
+    def _submit(self, block: bytes) -> None:
+        """Compress a block, in the background when threads are available."""
+        if self._executor is None:
+            self._handle.write(self._compress(block, self._level))
+            return
+        future = self._executor.submit(self._compress, block, self._level)
+        self._pending.append(future)
+        # keep memory bounded and the output in order
+        while len(self._pending) > self._threads * 4:
+            self._handle.write(self._pending.popleft().result())
+
+    def flush(self) -> None:
+        """Compress the buffered data and push every block to the file.
+
+        Afterwards the file ends on a block boundary and is a complete gzip
+        stream (BGZF files get their EOF marker on close).
+        """
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._handle.write(self._pending.popleft().result())
+        self._handle.flush()
+
+    def fileno(self) -> int:
+        """File descriptor of the compressed file."""
+        return self._handle.fileno()
+
+    def tell(self) -> int:
+        """Compressed bytes written so far, flush() first to count the buffer."""
+        return self._handle.tell()
+
+    def close(self) -> None:
+        """Flush, terminate the stream and close the file."""
+        if self.closed:
+            return
+        self.flush()
+        if self._bgzf:
+            self._handle.write(BGZF_EOF)
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._handle.close()
+        self.closed = True
+
+    def __enter__(self) -> "BlockCompressedWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
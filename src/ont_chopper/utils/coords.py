@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tables of the segment and adapter coordinates of chopped reads.
+
+A table has a row per segment and adapter of every read with adapters:
+the k-th segment and the k-th adapter of a read share a row, with -1 (or
+"." in TSV) where the read has fewer of one than the other. Reads without
+adapters, which are kept whole, have no row and reads with adapters but no
+segment long enough only have adapter rows. The rows follow the input
+order. Tables are TSV with a header line, or binary: MAGIC followed, per
+row, by the read id length as an unsigned short, the read id and the four
+coordinates as signed 32-bit integers, all little-endian.
+"""
+import itertools
+import struct
+from typing import BinaryIO
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+COLUMNS = ("read_id", "segment_start", "segment_end", "adapter_start", "adapter_end")
+TSV_HEADER = ("#" + "\t".join(COLUMNS) + "\n").encode()
+MAGIC = b"ONTCOORD\x01"
+COORDS_FORMATS = ("tsv", "binary")
+
+_ROW = struct.Struct("<4i")
+_ID_LENGTH = struct.Struct("<H")
+
+Coordinates = List[Tuple[int, int]]
+Row = Tuple[bytes, Tuple[int, ...]]
+
+
+def coords_format(path: str) -> str:
+    """Table format of path: binary for a .bin file, TSV otherwise."""
+    for suffix in (".gz", ".bgz", ".bgzf"):
+        if path.endswith(suffix):
+            path = path[: -len(suffix)]
+    return "binary" if path.endswith(".bin") else "tsv"
+
+
+def coords_header(table_format: str) -> bytes:
+    """Bytes a table of table_format starts with."""
+    return MAGIC if table_format == "binary" else TSV_HEADER
+
+
+def read_id(title: bytes) -> bytes:
+    """Id of a read, the first word of its FASTQ title."""
+    return title.split(b" ", 1)[0]
+
+
+def format_coords(
+    title: bytes,
+    segments: Optional[Coordinates],
+    adapters: Coordinates,
+    table_format: str = "tsv",
+) -> bytes:
+    """Rows of a read with the given read_segments and read_adapters."""
+    if segments is None:
+        return b""
+    name = read_id(title)
+    rows = itertools.zip_longest(segments, adapters, fillvalue=(-1, -1))
+    if table_format == "binary":
+        prefix = _ID_LENGTH.pack(len(name)) + name
+        return b"".join(
+            prefix + _ROW.pack(*segment, *adapter) for segment, adapter in rows
+        )
+    return b"".join(
+        b"\t".join(
+            [name]
+            + [b"%d" % value if value >= 0 else b"." for value in segment + adapter]
+        )
+        + b"\n"
+        for segment, adapter in rows
+    )
+
+
+def _tsv_rows(first: bytes, handle: BinaryIO) -> Iterator[Row]:
+    head = (first + handle.readline()).splitlines(keepends=True)
+    for line in itertools.chain(head, handle):
+        if line.startswith(b"#") or not line.strip():
+            continue
+        name, *values = line.rstrip(b"\r\n").split(b"\t")
+        yield name, tuple(-1 if value == b"." else int(value) for value in values)
+
+
+def _binary_rows(handle: BinaryIO) -> Iterator[Row]:
+    while True:
+        length = handle.read(_ID_LENGTH.size)
+        if not length:
+            return
+        (size,) = _ID_LENGTH.unpack(length)
+        name = handle.read(size)
+        row = handle.read(_ROW.size)
+        if len(name) != size or len(row) != _ROW.size:
+            raise ValueError("truncated coordinates table")
+        yield name, _ROW.unpack(row)
+
+
+def read_coords(handle: BinaryIO) -> Iterator[Tuple[bytes, Coordinates, Coordinates]]:
+    """Yield the (read id, segments, adapters) of every read of a table.
+
+    The format is told from the first bytes; the rows of a read must be
+    consecutive.
+    """
+    first = handle.read(len(MAGIC))
+    rows = _binary_rows(handle) if first == MAGIC else _tsv_rows(first, handle)
+    for name, group in itertools.groupby(rows, key=lambda row: row[0]):
+        segments = []
+        adapters = []
+        for _, (segment_start, segment_end, adapter_start, adapter_end) in group:
+            if segment_start >= 0:
+                segments.append((segment_start, segment_end))
+            if adapter_start >= 0:
+                adapters.append((adapter_start, adapter_end))
+        yield name, segments, adapters
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Number of CPUs a process may really use, inside containers and batch jobs.
+
+multiprocessing.cpu_count() counts every CPU of the machine. Slurm and
+taskset restrict a job with its CPU affinity mask, while Docker and
+Kubernetes CPU limits are CFS quotas of its cgroup, cpu.max with cgroup v2
+and cpu.cfs_quota_us over cpu.cfs_period_us with cgroup v1.
+"""
+import multiprocessing
+import os
+from typing import Iterator
+from typing import Optional
+
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+PROC_CGROUP = "/proc/self/cgroup"
+
+
+def affinity_cpus() -> int:
+    """CPUs in the affinity mask of this process, all CPUs where unsupported."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return multiprocessing.cpu_count()
+
+
+def _ancestors(base: str, path: str) -> Iterator[str]:
+    """The cgroup directory of path under base, then its parents up to base."""
+    parts = [part for part in path.split("/") if part]
+    for depth in range(len(parts), -1, -1):
+        yield os.path.join(base, *parts[:depth])
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as handle:
+            return handle.read().strip()
+    except OSError:
+        return None
+
+
+def _v2_limit(directory: str) -> Optional[float]:
+    """CPUs allowed by the cpu.max of a cgroup v2 directory."""
+    value = _read(os.path.join(directory, "cpu.max"))
+    if not value:
+        return None
+    quota, _, period = value.partition(" ")
+    if quota == "max":
+        return None
+    return int(quota) / int(period or 100000)
+
+
+def _v1_limit(directory: str) -> Optional[float]:
+    """CPUs allowed by the CFS quota of a cgroup v1 cpu directory."""
+    quota = _read(os.path.join(directory, "cpu.cfs_quota_us"))
+    period = _read(os.path.join(directory, "cpu.cfs_period_us"))
+    if not quota or not period or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def cgroup_cpu_limit(
+    root: str = CGROUP_ROOT, proc_cgroup: str = PROC_CGROUP
+) -> Optional[float]:
+    """CPUs allowed by the cgroup quotas of this process, None if unlimited.
+
+    The cgroup of every hierarchy listed in proc_cgroup is looked up under
+    root, along with its parents, which also covers containers that only
+    see their own cgroup at root. The tightest quota wins.
+    """
+    content = _read(proc_cgroup)
+    if not content:
+        return None
+    limits = []
+    for line in content.splitlines():
+        _, controllers, path = line.split(":", 2)
+        if not controllers:
+            bases = [root, os.path.join(root, "unified")]
+            limit = _v2_limit
+        elif "cpu" in controllers.split(","):
+            bases = [os.path.join(root, name) for name in (controllers, "cpu")]
+            limit = _v1_limit
+        else:
+            continue
+        for base in bases:
+            if os.path.isdir(base):
+                limits.extend(
+                    value
+                    for value in map(limit, _ancestors(base, path))
+                    if value is not None
+                )
+    return min(limits) if limits else None
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: its affinity mask capped by cgroup quotas.
+
+    A fractional quota is rounded down, so a job is never oversubscribed,
+    but at least one CPU is returned.
+    """
+    cpus = affinity_cpus()
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, int(limit))
+    return max(1, cpus)
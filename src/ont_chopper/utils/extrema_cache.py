@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""On-disk cache of the raw valley/peak detection of quality strings."""
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+
+CACHE_ENTRIES = 1_000_000
+# stay below the SQLite limit on the number of query parameters
+QUERY_CHUNK = 500
+
+Extrema = Tuple[np.ndarray, np.ndarray]
+
+
+def quality_hash(quality: bytes) -> bytes:
+    """Digest identifying a quality string."""
+    return hashlib.blake2b(quality, digest_size=16).digest()
+
+
+class ExtremaCache:
+    """SQLite file mapping (quality hash, minperc, window, engine) to extrema.
+
+    The extrema are the raw valley and peak indices of find_extrema, before
+    the score cutoff is applied, so runs that only change the cutoff or the
+    length limits reuse them. Entries are evicted least recently used first
+    once there are more than max_entries: the bound is on the number of
+    entries, not on the bytes of the file, which grow with the number of
+    extrema of the reads. Triggers keep the number of entries in the
+    one-row extrema_count table, so no insert has to count them. Several
+    processes can share the file; each one opens its own connection.
+    """
+
+    def __init__(self, path: str, max_entries: int = CACHE_ENTRIES):
+        """Open or create the cache at path."""
+        self.path = path
+        self.max_entries = max_entries
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS extrema ("
+                "hash BLOB, minperc INTEGER, window INTEGER, engine TEXT, "
+                "valleys BLOB, peaks BLOB, used REAL, "
+                "PRIMARY KEY (hash, minperc, window, engine))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS extrema_used ON extrema (used)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS extrema_count ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER)"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS extrema_insert AFTER INSERT ON extrema "
+                "BEGIN UPDATE extrema_count SET entries = entries + 1; END"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS extrema_delete AFTER DELETE ON extrema "
+                "BEGIN UPDATE extrema_count SET entries = entries - 1; END"
+            )
+            # after the triggers, so entries added meanwhile are counted once
+            self._connection.execute(
+                "INSERT OR IGNORE INTO extrema_count SELECT 0, count(*) FROM extrema"
+            )
+
+    def get_many(
+        self, hashes: List[bytes], minperc: int, window: int, engine: str
+    ) -> Dict[bytes, Extrema]:
+        """Cached extrema of the quality hashes that are known, by hash.
+
+        The entries found are marked as recently used.
+        """
+        found = {}
+        for i in range(0, len(hashes), QUERY_CHUNK):
+            chunk = hashes[i : i + QUERY_CHUNK]
+            rows = self._connection.execute(
+                "SELECT hash, valleys, peaks FROM extrema "
+                "WHERE minperc = ? AND window = ? AND engine = ? "
+                f"AND hash IN ({', '.join('?' * len(chunk))})",
+                (minperc, window, engine, *chunk),
+            )
+            for digest, valleys, peaks in rows:
+                found[digest] = (
+                    np.frombuffer(valleys, dtype=np.int32).astype(np.intp),
+                    np.frombuffer(peaks, dtype=np.int32).astype(np.intp),
+                )
+        if found:
+            now = time.time()
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE extrema SET used = ? WHERE hash = ? AND minperc = ? "
+                    "AND window = ? AND engine = ?",
+                    ((now, digest, minperc, window, engine) for digest in found),
+                )
+        return found
+
+    def put_many(
+        self, extrema: Dict[bytes, Extrema], minperc: int, window: int, engine: str
+    ) -> None:
+        """Store extrema by quality hash and evict the oldest entries.
+
+        Known entries are updated in place rather than replaced, so only new
+        entries fire the insert trigger.
+        """
+        if not extrema:
+            return
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO extrema VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT DO UPDATE SET valleys = excluded.valleys, "
+                "peaks = excluded.peaks, used = excluded.used",
+                (
+                    (
+                        digest,
+                        minperc,
+                        window,
+                        engine,
+                        np.asarray(valleys, dtype=np.int32).tobytes(),
+                        np.asarray(peaks, dtype=np.int32).tobytes(),
+                        now,
+                    )
+                    for digest, (valleys, peaks) in extrema.items()
+                ),
+            )
+            entries = self._entries()
+            if entries > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM extrema WHERE rowid IN (SELECT rowid FROM extrema "
+                    "ORDER BY used LIMIT ?)",
+                    (entries - self.max_entries,),
+                )
+
+    def _entries(self) -> int:
+        return self._connection.execute(
+            "SELECT entries FROM extrema_count"
+        ).fetchone()[0]
+
+    def __len__(self) -> int:
+        """Number of cached entries."""
+        return self._entries()
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._connection.close()
+
+
+_open_caches: Dict[Tuple[int, str], ExtremaCache] = {}
+
+
+def open_cache(path: str, max_entries: int = CACHE_ENTRIES) -> ExtremaCache:
+    """ExtremaCache at path, opened once per process and then reused."""
+    key = (os.getpid(), path)
+    if key not in _open_caches:
+        _open_caches[key] = ExtremaCache(path, max_entries)
+    return _open_caches[key]
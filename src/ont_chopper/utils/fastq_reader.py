@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Lean FASTQ tokenizer working on raw bytes."""
+from typing import BinaryIO
+from typing import Iterator
+from typing import Tuple
+
+import numpy as np
+
+
+BUFFER_SIZE = 4 * 1024 * 1024
+
+FastqRecord = Tuple[bytes, bytes, bytes]
+
+
+def read_fastq(
+    handle: BinaryIO, buffer_size: int = BUFFER_SIZE
+) -> Iterator[FastqRecord]:
+    """Yield (title, seq, quality) of every record of a binary FASTQ handle.
+
+    The title is the header line without its leading "@". Records must use
+    the usual four line layout; the input is read in blocks of buffer_size
+    bytes and split into lines without building any per-record object.
+    """
+    for lines, stop, _ in _blocks(handle, buffer_size):
+        yield from _records(lines, stop)
+
+
+def read_fastq_offsets(
+    handle: BinaryIO, buffer_size: int = BUFFER_SIZE
+) -> Iterator[Tuple[FastqRecord, int]]:
+    """Like read_fastq, with the offset just past each record in the handle.
+
+    Offsets count from the position of the handle when called.
+    """
+    for lines, stop, offset in _blocks(handle, buffer_size):
+        i = 0
+        for record in _records(lines, stop):
+            offset += (
+                len(lines[i])
+                + len(lines[i + 1])
+                + len(lines[i + 2])
+                + len(lines[i + 3])
+                + 4
+            )
+            i += 4
+            yield record, offset
+
+
+def _blocks(handle, buffer_size) -> Iterator[Tuple[list, int, int]]:
+    """Yield the lines of each block, how many form complete records and
+    the offset of the first one."""
+    leftover = b""
+    offset = 0
+    while True:
+        chunk = handle.read(buffer_size)
+        if not chunk:
+            break
+        data = leftover + chunk
+        lines = data.split(b"\n")
+        # the last line may be incomplete, keep it and any partial record
+        complete = (len(lines) - 1) // 4 * 4
+        leftover = b"\n".join(lines[complete:])
+        yield lines, complete, offset
+        offset += len(data) - len(leftover)
+
+    lines = leftover.split(b"\n")
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if len(lines) % 4:
+        raise ValueError(f"truncated FASTQ record at end of input: {lines[0][:80]!r}")
+    yield lines, len(lines), offset
+
+
+def _records(lines, stop) -> Iterator[FastqRecord]:
+    """Tokenize lines[:stop] into records."""
+    for i in range(0, stop, 4):
+        title, seq, plus, quality = lines[i : i + 4]
+        if seq.endswith(b"\r"):
+            title, seq, plus, quality = (
+                title.rstrip(b"\r"),
+                seq.rstrip(b"\r"),
+                plus.rstrip(b"\r"),
+                quality.rstrip(b"\r"),
+            )
+        if title[:1] != b"@" or plus[:1] != b"+" or len(seq) != len(quality):
+            raise ValueError(f"malformed FASTQ record: {title[:80]!r}")
+        yield title[1:], seq, quality
+
+
+def phred_scores(quality: bytes) -> np.ndarray:
+    """Phred scores of a Sanger encoded quality string."""
+    return np.frombuffer(quality, dtype=np.uint8) - 33
+
+
+def format_fastq(title: bytes, seq: bytes, quality: bytes) -> bytes:
+    """Serialise a record back to FASTQ."""
+    return b"@%s\n%s\n+\n%s\n" % (title, seq, quality)
@@ -3,9 +3,205 @@
 # =============================
 import sys
 import argparse
+import json
+import mmap
 import os
-from Bio import SeqIO
 import shutil
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from ont_chopper.utils.compression import BGZF_EOF
+from ont_chopper.utils.compression import is_gzipped
+from ont_chopper.utils.compression import output_compression
+from ont_chopper.utils.fastq_reader import BUFFER_SIZE
+from ont_chopper.utils.fastq_reader import FastqRecord
+from ont_chopper.utils.fastq_reader import format_fastq
+from ont_chopper.utils.fastq_reader import read_fastq
+
+
+def _line_end(mapped, start: int) -> int:
+    """Offset of the newline ending the line at start, or the mapping size."""
+    end = mapped.find(b"\n", start)
+    return len(mapped) if end < 0 else end
+
+
+def record_start(mapped, offset: int) -> int:
+    """Offset of the first FASTQ record starting at or after offset.
+
+    A line is a record header when it starts with "@" and the line two below
+    starts with "+". A quality line starting with "@" never passes, as two
+    lines below it is the sequence of the next record.
+    """
+    size = len(mapped)
+    if offset <= 0:
+        return 0
+    line = _line_end(mapped, offset - 1) + 1
+    while line < size:
+        if mapped[line : line + 1] == b"@":
+            plus = _line_end(mapped, _line_end(mapped, line) + 1) + 1
+            if mapped[plus : plus + 1] == b"+":
+                return line
+        line = _line_end(mapped, line) + 1
+    return size
+
+
+def range_bounds(
+    in_fastq: str, parts: int, start: int = 0, end: Optional[int] = None
+) -> List[int]:
+    """parts + 1 record boundaries cutting bytes [start, end) of a plain FASTQ.
+
+    The cuts are spread evenly over the range, by default the whole file, and
+    moved forward to the next record boundary, so neighbouring cuts can meet
+    when records are longer than a part. Only the bytes around each cut are
+    looked at. start must be a record boundary.
+    """
+    if is_gzipped(in_fastq):
+        raise ValueError(f"byte ranges need an uncompressed FASTQ: {in_fastq}")
+    end = os.path.getsize(in_fastq) if end is None else end
+    if end <= start:
+        return [start] * (parts + 1)
+    with open(in_fastq, "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            cuts = [
+                min(end, record_start(mapped, start + (end - start) * i // parts))
+                for i in range(parts)
+            ]
+    return cuts + [end]
+
+
+def byte_ranges(
+    in_fastq: str, parts: int, start: int = 0, end: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    """Cut a plain FASTQ file into at most parts non-empty [start, end) ranges.
+
+    See range_bounds.
+    """
+    bounds = range_bounds(in_fastq, parts, start, end)
+    return [(left, right) for left, right in zip(bounds, bounds[1:]) if left < right]
+
+
+def count_records(in_fastq: str, start: int, end: int) -> int:
+    """Number of records in bytes [start, end) of a plain FASTQ, from its lines."""
+    if end <= start:
+        return 0
+    lines = 0
+    with open(in_fastq, "rb") as handle:
+        handle.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = handle.read(min(remaining, BUFFER_SIZE))
+            lines += data.count(b"\n")
+            remaining -= len(data)
+        handle.seek(end - 1)
+        if handle.read(1) != b"\n":
+            lines += 1
+    return lines // 4
+
+
+def shard_plan(in_fastq: str, shards: int) -> Dict[str, Any]:
+    """Manifest of shards byte ranges of in_fastq with their record counts.
+
+    There is always one entry per shard, a shard may be empty when records
+    are longer than the shard size.
+    """
+    bounds = range_bounds(in_fastq, shards)
+    ranges = list(zip(bounds, bounds[1:]))
+    return {
+        "input": os.path.abspath(in_fastq),
+        "input_bytes": os.path.getsize(in_fastq),
+        "shards": [
+            {
+                "shard": index,
+                "start": start,
+                "end": end,
+                "records": count_records(in_fastq, start, end),
+            }
+            for index, (start, end) in enumerate(ranges, 1)
+        ],
+    }
+
+
+def write_manifest(manifest: Dict[str, Any], path: str) -> str:
+    """Write a shard_plan manifest as JSON."""
+    with open(path, "w") as handle:
+        json.dump(manifest, handle, indent=2)
+        handle.write("\n")
+    return path
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    """Read a manifest written by write_manifest."""
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def shard_path(out_fastq: str, shard: int, shards: int) -> str:
+    """Output file of shard shard (1-based) out of shards."""
+    return f"{out_fastq}.shard{shard}of{shards}"
+
+
+class MappedRange:
+    """Read-only file-like view of bytes [start, end) of a memory map."""
+
+    def __init__(self, mapped, start: int, end: int):
+        """View mapped[start:end]."""
+        self._mapped = mapped
+        self._position = start
+        self._end = end
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to size bytes, the rest of the range if size is negative."""
+        stop = self._end if size < 0 else min(self._end, self._position + size)
+        data = self._mapped[self._position : stop]
+        self._position = stop
+        return data
+
+
+def read_fastq_range(
+    in_fastq: str, start: int, end: int, buffer_size: int = BUFFER_SIZE
+) -> Iterator[FastqRecord]:
+    """Yield the records of bytes [start, end) of in_fastq through mmap.
+
+    start and end must be record boundaries, see byte_ranges.
+    """
+    if start >= end:
+        return
+    offset = start - start % mmap.ALLOCATIONGRANULARITY
+    with open(in_fastq, "rb") as handle:
+        with mmap.mmap(
+            handle.fileno(), end - offset, access=mmap.ACCESS_READ, offset=offset
+        ) as mapped:
+            view = MappedRange(mapped, start - offset, end - offset)
+            yield from read_fastq(view, buffer_size)
+
+
+def concatenate_parts(
+    part_files: List[str], out_fastq: str, compression: str = "auto"
+) -> int:
+    """Concatenate part_files into out_fastq, removing the parts.
+
+    Parts are plain, gzip or BGZF like out_fastq; the BGZF end of file
+    marker of every part but the last is dropped. Returns the output size.
+    """
+    bgzf = output_compression(out_fastq, compression) == "bgzf"
+    with open(out_fastq, "wb") as out_handle:
+        if bgzf and not part_files:
+            out_handle.write(BGZF_EOF)
+        for i, part_file in enumerate(part_files):
+            size = os.path.getsize(part_file)
+            if bgzf and i < len(part_files) - 1:
+                size -= len(BGZF_EOF)
+            with open(part_file, "rb") as part_handle:
+                while size > 0:
+                    data = part_handle.read(min(size, BUFFER_SIZE))
+                    out_handle.write(data)
+                    size -= len(data)
+            os.remove(part_file)
+        return out_handle.tell()
 
 
 def fastq_splitter(
@@ -17,23 +213,23 @@ def fastq_splitter(
     """ """
     if os.path.exists(temp_dir):
         shutil.rmtree(temp_dir)
-    else:
-        os.mkdir(temp_dir)
+    os.mkdir(temp_dir)
 
     part_file = None
     part_num = 0
     record_index = 0
-    for record in SeqIO.parse(in_fastq, "fastq"):
-        if record_index % record_num == 0:
-            part_num += 1
-            if part_file:
-                part_file.close()
-            part_file_name = os.path.join(
-                temp_dir, f"{out_fastq_prefix}_{part_num}.fastq"
-            )
-            part_file = open(part_file_name, "w")
-        SeqIO.write(record, part_file, "fastq")
-        record_index += 1
+    with open(in_fastq, "rb") as in_handle:
+        for title, seq, quality in read_fastq(in_handle):
+            if record_index % record_num == 0:
+                part_num += 1
+                if part_file:
+                    part_file.close()
+                part_file_name = os.path.join(
+                    temp_dir, f"{out_fastq_prefix}_{part_num}.fastq"
+                )
+                part_file = open(part_file_name, "wb")
+            part_file.write(format_fastq(title, seq, quality))
+            record_index += 1
     if part_file:
         part_file.close()
 
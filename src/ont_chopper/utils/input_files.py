@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Expand the input arguments into FASTQ files."""
+import glob
+import os
+from typing import Iterable
+from typing import List
+
+
+FASTQ_SUFFIXES = (".fastq", ".fq", ".fastq.gz", ".fq.gz", ".fastq.bgz", ".fq.bgz")
+
+
+def is_fastq(path: str) -> bool:
+    """Whether path has a FASTQ file extension."""
+    return path.endswith(FASTQ_SUFFIXES)
+
+
+def directory_fastqs(directory: str) -> List[str]:
+    """FASTQ files under directory and its subdirectories, sorted."""
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if is_fastq(name)
+    )
+
+
+def expand_inputs(inputs: Iterable[str]) -> List[str]:
+    """FASTQ files named by inputs, in order and without duplicates.
+
+    Every input is a file, a directory searched for FASTQ files or a glob
+    pattern, where ** matches subdirectories as well.
+    """
+    inputs = list(inputs)
+    paths = []
+    for name in inputs:
+        if os.path.isdir(name):
+            paths.extend(directory_fastqs(name))
+        elif glob.has_magic(name):
+            matches = sorted(glob.glob(name, recursive=True))
+            if not matches:
+                raise FileNotFoundError(f"no input matches {name}")
+            paths.extend(path for path in matches if os.path.isfile(path))
+        elif os.path.isfile(name):
+            paths.append(name)
+        else:
+            raise FileNotFoundError(f"no such input: {name}")
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        raise FileNotFoundError(f"no FASTQ input in {', '.join(inputs)}")
+    return paths
+
+
+def per_input_outputs(inputs: List[str], out_dir: str) -> List[str]:
+    """Output path of every input under out_dir.
+
+    The inputs keep their name and their directory layout below their deepest
+    common directory, so barcode subdirectories do not clash. An output that
+    resolves to one of the inputs raises ValueError rather than truncate it.
+    """
+    directories = [os.path.dirname(os.path.abspath(path)) for path in inputs]
+    common = os.path.commonpath(directories)
+    outputs = [
+        os.path.join(out_dir, os.path.relpath(os.path.abspath(path), common))
+        for path in inputs
+    ]
+    resolved = {os.path.realpath(path) for path in inputs}
+    for path in outputs:
+        if os.path.realpath(path) in resolved:
+            raise ValueError(f"output {path} would overwrite an input")
+    for directory in {os.path.dirname(path) for path in outputs}:
+        os.makedirs(directory, exist_ok=True)
+    return outputs
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Run metrics gathered from the main process, the workers and the writer."""
+import json
+import os
+import time
+from collections import Counter
+from collections import defaultdict
+from typing import Any
+from typing import BinaryIO
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+STAGES = (
+    "read",
+    "parse",
+    "backpressure_wait",
+    "starved",
+    "queue_wait",
+    "prefilter",
+    "valley_finding",
+    "extension",
+    "serialisation",
+    "write",
+)
+
+
+def batch_stats() -> Dict[str, Any]:
+    """Fresh per-batch statistics filled in by a worker."""
+    return {
+        "pid": os.getpid(),
+        "started": time.time(),
+        "busy_seconds": 0.0,
+        "reads": 0,
+        "reads_with_adapters": 0,
+        "reads_prefiltered": 0,
+        "prefilter": 0.0,
+        "valley_finding": 0.0,
+        "extension": 0.0,
+        "serialisation": 0.0,
+        "valleys": Counter(),
+    }
+
+
+def merge_batch_stats(total: Dict[str, Any], stats: Dict[str, Any]) -> None:
+    """Add the batch_stats stats of a later batch of the same worker to total."""
+    for key, value in stats.items():
+        if key in ("pid", "started"):
+            continue
+        total[key] = total[key] + value if key in total else value
+
+
+class TimedReader:
+    """Binary handle wrapper accounting the time and bytes spent in read()."""
+
+    def __init__(self, handle: BinaryIO, metrics: "Metrics"):
+        """Wrap handle, adding its read time and bytes to metrics."""
+        self._handle = handle
+        self._metrics = metrics
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from the wrapped handle."""
+        tic = time.perf_counter()
+        data = self._handle.read(size)
+        self._metrics.stages["read"] += time.perf_counter() - tic
+        self._metrics.input_bytes += len(data)
+        return data
+
+
+class Metrics:
+    """Aggregated timings and counters of a chopping run.
+
+    Stage times are summed over every batch, so the worker stages
+    (valley_finding, extension, serialisation) add up across processes
+    while read, parse and backpressure_wait are spent by the main process.
+    starved counts the worker seconds left idle because the next batch had
+    not been read yet. queue_wait is the time batches sat in the pool queue
+    before a worker picked them up. The busy time of every worker, their
+    imbalance and the distribution of bases per batch show how evenly the
+    work was shared.
+    Prefiltered reads skipped valley detection, see can_have_adapter, and
+    count as reads without valleys. autotune holds the AutoTuner summary of
+    runs that adapt their batch size and in-flight depth.
+    """
+
+    def __init__(self):
+        """Start the run clock."""
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.reads = 0
+        self.batches = 0
+        self.reads_with_adapters = 0
+        self.reads_prefiltered = 0
+        self.input_bytes = 0
+        self.valleys = Counter()
+        self.cache = Counter()
+        self.worker_busy = defaultdict(float)
+        self.batch_bases = []
+        self.chunks = []
+        self.writer: Optional[Dict[str, Any]] = None
+        self.autotune: Optional[Dict[str, Any]] = None
+        self.wall_seconds: Optional[float] = None
+
+    def add_batch(self, stats: Dict[str, Any], submitted: float) -> None:
+        """Merge the statistics a worker returned for a batch submitted at submitted."""
+        self.batches += 1
+        self.reads += stats["reads"]
+        self.reads_with_adapters += stats["reads_with_adapters"]
+        self.reads_prefiltered += stats.get("reads_prefiltered", 0)
+        self.input_bytes += stats.get("input_bytes", 0)
+        self.stages["queue_wait"] += max(0.0, stats["started"] - submitted)
+        for stage in STAGES:
+            if stage in stats:
+                self.stages[stage] += stats[stage]
+        self.valleys.update(stats["valleys"])
+        for key in ("cache_hits", "cache_misses"):
+            if key in stats:
+                self.cache[key] += stats[key]
+        self.worker_busy[stats["pid"]] += stats["busy_seconds"]
+        if "bases" in stats:
+            self.batch_bases.append(stats["bases"])
+
+    def add_chunk(self, latency: float, processing: float) -> None:
+        """Record an input file done latency seconds after it showed up.
+
+        processing is the part of it spent from submission to output.
+        """
+        self.chunks.append((latency, processing))
+
+    def finish(self, writer_stats: Optional[Dict[str, Any]] = None) -> None:
+        """Stop the run clock and record the writer statistics."""
+        self.wall_seconds = time.perf_counter() - self.started
+        self.writer = writer_stats
+        if writer_stats:
+            self.stages["write"] += writer_stats["write_seconds"]
+
+    def to_dict(self, workers: int) -> Dict[str, Any]:
+        """Metrics as a JSON serialisable dict for a run on workers workers."""
+        wall = self.wall_seconds or time.perf_counter() - self.started
+        busy = sum(self.worker_busy.values())
+        output_bytes = self.writer["bytes_written"] if self.writer else 0
+        return {
+            "wall_seconds": wall,
+            "reads": self.reads,
+            "batches": self.batches,
+            "reads_with_adapters": self.reads_with_adapters,
+            "reads_prefiltered": self.reads_prefiltered,
+            "prefiltered_share": self.reads_prefiltered / self.reads
+            if self.reads
+            else 0.0,
+            "input_bytes": self.input_bytes,
+            "output_bytes": output_bytes,
+            "reads_per_second": self.reads / wall if wall else 0.0,
+            "input_bytes_per_second": self.input_bytes / wall if wall else 0.0,
+            "output_bytes_per_second": output_bytes / wall if wall else 0.0,
+            "stages": {stage: self.stages[stage] for stage in STAGES},
+            "valley_count_distribution": {
+                str(count): reads for count, reads in sorted(self.valleys.items())
+            },
+            "workers": {
+                "count": workers,
+                "busy_seconds": {
+                    str(pid): seconds for pid, seconds in self.worker_busy.items()
+                },
+                "utilisation": busy / (wall * workers) if wall and workers else 0.0,
+                "starved_share": self.stages["starved"] / (wall * workers)
+                if wall and workers
+                else 0.0,
+                "imbalance": _imbalance(self.worker_busy.values(), workers),
+            },
+            **(
+                {"batch_bases": _distribution(self.batch_bases)}
+                if self.batch_bases
+                else {}
+            ),
+            "writer": self.writer,
+            **({"chunks": self._chunk_summary()} if self.chunks else {}),
+            **({"cache": _cache_summary(self.cache)} if self.cache else {}),
+            **({"autotune": self.autotune} if self.autotune else {}),
+        }
+
+    def _chunk_summary(self) -> Dict[str, Any]:
+        """Latency distribution of the chunks."""
+        latencies, processing = zip(*self.chunks)
+        return {
+            "count": len(self.chunks),
+            "latency_seconds": _distribution(latencies),
+            "processing_seconds": _distribution(processing),
+        }
+
+    def write(self, path: str, workers: int) -> None:
+        """Write the metrics as JSON to path."""
+        with open(path, "w") as handle:
+            json.dump(self.to_dict(workers), handle, indent=2)
+            handle.write("\n")
+
+
+def _distribution(values) -> Dict[str, float]:
+    """Mean, median, 95th percentile and maximum of values."""
+    values = sorted(values)
+    return {
+        "mean": sum(values) / len(values),
+        "p50": values[(len(values) - 1) // 2],
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+def _imbalance(busy_seconds, workers: int) -> float:
+    """Busy time of the busiest worker over the mean busy time of workers.
+
+    1 is a perfect balance; workers that never got a batch count as idle.
+    """
+    busy_seconds = list(busy_seconds)
+    total = sum(busy_seconds)
+    if not total or not workers:
+        return 0.0
+    return max(busy_seconds) / (total / max(workers, len(busy_seconds)))
+
+
+def _cache_summary(cache) -> Dict[str, Any]:
+    """Extrema cache hits, misses and hit rate."""
+    hits, misses = cache["cache_hits"], cache["cache_misses"]
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def merge_metrics(
+    shard_metrics: List[Dict[str, Any]], writer_stats: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Combine the to_dict metrics of shards that ran side by side.
+
+    The shards are assumed to run concurrently, so the wall time is the
+    longest shard and rates are computed over it. Worker ids are prefixed
+    with the shard number. writer_stats describes the merge step.
+    """
+    wall = max((metrics["wall_seconds"] for metrics in shard_metrics), default=0.0)
+    totals = {
+        key: sum(metrics.get(key, 0) for metrics in shard_metrics)
+        for key in (
+            "reads",
+            "batches",
+            "reads_with_adapters",
+            "reads_prefiltered",
+            "input_bytes",
+        )
+    }
+    output_bytes = (
+        writer_stats["bytes_written"]
+        if writer_stats
+        else sum(metrics["output_bytes"] for metrics in shard_metrics)
+    )
+    stages = defaultdict(float)
+    valleys = Counter()
+    cache = Counter()
+    busy = {}
+    capacity = 0.0
+    for shard, metrics in enumerate(shard_metrics, 1):
+        for stage, seconds in metrics["stages"].items():
+            stages[stage] += seconds
+        distribution = metrics["valley_count_distribution"]
+        valleys.update({int(count): reads for count, reads in distribution.items()})
+        if "cache" in metrics:
+            cache["cache_hits"] += metrics["cache"]["hits"]
+            cache["cache_misses"] += metrics["cache"]["misses"]
+        for pid, seconds in metrics["workers"]["busy_seconds"].items():
+            busy[f"{shard}:{pid}"] = seconds
+        capacity += metrics["wall_seconds"] * metrics["workers"]["count"]
+    if writer_stats:
+        stages["write"] += writer_stats["write_seconds"]
+    return {
+        "wall_seconds": wall,
+        **totals,
+        "prefiltered_share": totals["reads_prefiltered"] / totals["reads"]
+        if totals["reads"]
+        else 0.0,
+        "output_bytes": output_bytes,
+        "reads_per_second": totals["reads"] / wall if wall else 0.0,
+        "input_bytes_per_second": totals["input_bytes"] / wall if wall else 0.0,
+        "output_bytes_per_second": output_bytes / wall if wall else 0.0,
+        "stages": {stage: stages[stage] for stage in STAGES},
+        "valley_count_distribution": {
+            str(count): reads for count, reads in sorted(valleys.items())
+        },
+        "workers": {
+            "count": sum(metrics["workers"]["count"] for metrics in shard_metrics),
+            "busy_seconds": busy,
+            "utilisation": sum(busy.values()) / capacity if capacity else 0.0,
+            "starved_share": stages["starved"] / capacity if capacity else 0.0,
+            "imbalance": _imbalance(
+                busy.values(),
+                sum(metrics["workers"]["count"] for metrics in shard_metrics),
+            ),
+        },
+        "writer": writer_stats,
+        "shards": len(shard_metrics),
+        **({"cache": _cache_summary(cache)} if cache else {}),
+    }
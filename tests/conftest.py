@@ -0,0 +1,27 @@
+"""Shared fixtures for the test suite."""
+import random
+
+import pytest
+
+
+def synthetic_fastq(path, reads: int = 300, seed: int = 0) -> str:
+    """Write nanopore-like reads, some carrying low quality adapter stretches."""
+    rng = random.Random(seed)
+    with open(path, "w") as handle:
+        for i in range(reads):
+            length = rng.choice([rng.randint(50, 300), rng.randint(300, 1500)])
+            score = [max(1, min(50, int(rng.gauss(18, 5)))) for _ in range(length)]
+            for _ in range(rng.choice([0, 1, 2])):
+                start = rng.randrange(length)
+                for j in range(start, min(length, start + rng.randint(20, 90))):
+                    score[j] = rng.randint(1, 8)
+            seq = "".join(rng.choice("ACGU") for _ in range(length))
+            quality = "".join(chr(q + 33) for q in score)
+            handle.write(f"@read{i} runid=test ch={i % 512}\n{seq}\n+\n{quality}\n")
+    return str(path)
+
+
+@pytest.fixture
+def fastq_file(tmp_path) -> str:
+    """A small synthetic FASTQ file."""
+    return synthetic_fastq(tmp_path / "reads.fastq")
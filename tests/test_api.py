@@ -0,0 +1,62 @@
+"""Test cases for the api module."""
+import numpy as np
+import pytest
+
+from ont_chopper.algorithm.fastq_handler import fastq_io
+from ont_chopper.api import ChopParams
+from ont_chopper.api import chop_batch
+from ont_chopper.api import chop_stream
+from ont_chopper.utils.fastq_reader import read_fastq
+
+
+def _reads(path: str) -> list:
+    with open(path, "rb") as handle:
+        return list(read_fastq(handle))
+
+
+def test_chop_batch_matches_fastq_io(fastq_file: str, tmp_path) -> None:
+    """The coordinates give back the records fastq_io writes."""
+    params = ChopParams(score_cutoff=15, minimum_seq_length=100)
+    out = str(tmp_path / "out.fastq")
+    fastq_io(fastq_file, out, 1, 100, 30, 15, ordered=True)
+    titles, seqs, quals = zip(*_reads(fastq_file))
+    expected = []
+    for read, seq in zip(chop_batch(titles, seqs, quals, params), seqs):
+        if read.adapters:
+            expected.extend(
+                b"%d:%d|@%s" % (start, end, read.header)
+                for start, end in read.segments
+            )
+        else:
+            assert read.segments == [(0, len(seq))]
+            expected.append(read.header)
+    assert [title for title, _, _ in _reads(out)] == expected
+
+
+def test_quality_representations_agree(fastq_file: str) -> None:
+    """Bytes, str and phred score arrays give the same coordinates."""
+    titles, seqs, quals = zip(*_reads(fastq_file))
+    from_bytes = chop_batch(titles, seqs, quals)
+    from_str = chop_batch(titles, seqs, [quality.decode() for quality in quals])
+    from_scores = chop_batch(
+        titles,
+        [np.frombuffer(seq, dtype=np.uint8) for seq in seqs],
+        [np.frombuffer(quality, dtype=np.uint8).astype(int) - 33 for quality in quals],
+    )
+    assert from_bytes == from_str == from_scores
+    assert any(read.adapters for read in from_bytes)
+
+
+def test_chop_stream_is_lazy(fastq_file: str) -> None:
+    """chop_stream consumes its input one read at a time."""
+    reads = iter(_reads(fastq_file))
+    stream = chop_stream(reads)
+    first = next(stream)
+    assert first.header == b"read0 runid=test ch=0"
+    assert len(list(reads)) == 299
+
+
+def test_chop_batch_checks_lengths() -> None:
+    """headers, seqs and quals must match up."""
+    with pytest.raises(ValueError):
+        chop_batch([b"a"], [b"ACGU"], [])
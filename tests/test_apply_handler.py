@@ -0,0 +1,48 @@
+"""Test cases for the apply_handler module."""
+import pytest
+
+from ont_chopper.algorithm.apply_handler import apply_coords
+from ont_chopper.algorithm.fastq_handler import fastq_io
+
+from .conftest import synthetic_fastq
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+@pytest.mark.parametrize("table_name", ["coords.tsv", "coords.bin.gz"])
+def test_apply_matches_fastq_output(fastq_file: str, tmp_path, table_name) -> None:
+    """Applying a --coords-only table gives the FASTQ of an ordered run."""
+    table = str(tmp_path / table_name)
+    ordered = str(tmp_path / "ordered.fastq")
+    applied = str(tmp_path / "applied.fastq")
+    fastq_io(fastq_file, table, 1, batch_size=30, coords_only=True)
+    fastq_io(fastq_file, ordered, 1, batch_size=30, ordered=True)
+    counts = apply_coords(fastq_file, table, applied)
+    assert _read(applied) == _read(ordered)
+    assert counts["reads"] == 300
+    assert 0 < counts["reads_chopped"] < 300
+
+
+def test_apply_several_inputs(tmp_path) -> None:
+    """A table of several inputs is applied to them in order."""
+    inputs = [
+        synthetic_fastq(tmp_path / f"reads{seed}.fastq", 60, seed) for seed in range(3)
+    ]
+    table = str(tmp_path / "coords.tsv")
+    ordered = str(tmp_path / "ordered.fastq")
+    applied = str(tmp_path / "applied.fastq")
+    fastq_io(inputs, table, 1, batch_size=25, coords_only=True, file_task_size=0)
+    fastq_io(inputs, ordered, 1, batch_size=25, ordered=True, file_task_size=0)
+    apply_coords(inputs, table, applied)
+    assert _read(applied) == _read(ordered)
+
+
+def test_apply_rejects_foreign_table(fastq_file: str, tmp_path) -> None:
+    """Rows of reads missing from the input are an error."""
+    table = tmp_path / "coords.tsv"
+    table.write_text("#header\nnot_a_read\t0\t10\t10\t20\n")
+    with pytest.raises(ValueError, match="not_a_read"):
+        apply_coords(fastq_file, str(table), str(tmp_path / "out.fastq"))
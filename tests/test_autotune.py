@@ -0,0 +1,79 @@
+"""Test cases for the autotune module."""
+import threading
+import time
+
+from ont_chopper.utils.autotune import MIN_BATCH_SIZE
+from ont_chopper.utils.autotune import AutoTuner
+from ont_chopper.utils.autotune import InflightWindow
+
+
+def _batch(reads: int, seconds: float, waited: float) -> tuple:
+    """batch_stats of a batch submitted at 0 and the submission time."""
+    return {"reads": reads, "busy_seconds": seconds, "started": waited}, 0.0
+
+
+def test_batch_size_follows_the_read_time() -> None:
+    """Batches grow towards target_seconds of work, by at most 2x a round."""
+    tuner = AutoTuner(2, 100, 16, target_seconds=1.0)
+    for _ in range(2):
+        tuner.record(*_batch(100, 0.1, 2.0))
+    assert tuner.batch_size == 200
+    for _ in range(6):
+        tuner.record(*_batch(100, 0.1, 2.0))
+    assert tuner.batch_size == 1000
+    assert tuner.rounds == 4
+
+
+def test_batch_size_shrinks_for_slow_reads() -> None:
+    """Batches of slow reads shrink, down to MIN_BATCH_SIZE."""
+    tuner = AutoTuner(1, 100, 8, target_seconds=1.0)
+    for _ in range(10):
+        tuner.record(*_batch(100, 50.0, 100.0))
+    assert tuner.batch_size == MIN_BATCH_SIZE
+
+
+def test_inflight_follows_the_queue_occupancy() -> None:
+    """An empty queue deepens the window, a long queue shrinks it."""
+    tuner = AutoTuner(2, 100, 16)
+    tuner.record(*_batch(100, 1.0, 20.0))
+    assert tuner.record(*_batch(100, 1.0, 20.0))
+    assert tuner.inflight == 14
+    for _ in range(20):
+        tuner.record(*_batch(100, 1.0, 20.0))
+    assert tuner.inflight == 4
+    tuner.record(*_batch(100, 1.0, 0.0))
+    tuner.record(*_batch(100, 1.0, 0.0))
+    assert tuner.inflight == 8
+    summary = tuner.summary()
+    assert summary["inflight"] == {"final": 8, "min": 4, "max": 16}
+
+
+def test_empty_batches_are_ignored() -> None:
+    """Batches without reads do not count towards a round."""
+    tuner = AutoTuner(1, 100, 8)
+    assert not tuner.record(*_batch(0, 0.0, 0.0))
+    assert tuner.rounds == 0
+
+
+def test_inflight_window_resize() -> None:
+    """A shrunk window only admits new batches once enough are released."""
+    window = InflightWindow(2)
+    window.acquire()
+    window.acquire()
+    window.resize(1)
+    acquired = threading.Event()
+
+    def _acquire():
+        window.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=_acquire)
+    thread.start()
+    window.release()
+    time.sleep(0.05)
+    assert not acquired.is_set()
+    window.release()
+    thread.join(1)
+    assert acquired.is_set()
+    window.release()
+    window.drain()
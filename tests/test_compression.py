@@ -0,0 +1,56 @@
+"""Test cases for the compression module."""
+import gzip
+import os
+
+import pytest
+
+from ont_chopper.utils.compression import BGZF_EOF
+from ont_chopper.utils.compression import open_input
+from ont_chopper.utils.compression import open_output
+from ont_chopper.utils.compression import output_compression
+
+
+DATA = b"".join(b"@read%d\nACGU\n+\n!!!!\n" % i for i in range(50000))
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+@pytest.mark.parametrize("name", ["out.fastq.gz", "out.fastq.bgz"])
+def test_round_trip(tmp_path, name: str, threads: int) -> None:
+    """Compressed output is read back identically."""
+    path = str(tmp_path / name)
+    with open_output(path, threads=threads) as handle:
+        handle.write(DATA[:1000])
+        handle.write(DATA[1000:])
+    with open_input(path) as handle:
+        assert handle.read() == DATA
+    with gzip.open(path) as handle:
+        assert handle.read() == DATA
+
+
+def test_bgzf_eof_marker(tmp_path) -> None:
+    """BGZF output ends with the empty EOF block."""
+    path = str(tmp_path / "out.fastq.bgz")
+    with open_output(path, threads=2) as handle:
+        handle.write(DATA)
+    with open(path, "rb") as handle:
+        assert handle.read().endswith(BGZF_EOF)
+
+
+def test_plain_input_and_output(tmp_path) -> None:
+    """Uncompressed files pass through untouched."""
+    path = str(tmp_path / "out.fastq")
+    with open_output(path) as handle:
+        handle.write(DATA)
+    assert os.path.getsize(path) == len(DATA)
+    with open_input(path) as handle:
+        assert handle.read() == DATA
+
+
+def test_output_compression() -> None:
+    """auto follows the extension and explicit choices win."""
+    assert output_compression("a.fastq") == "none"
+    assert output_compression("a.fastq.gz") == "gzip"
+    assert output_compression("a.fastq.bgz") == "bgzf"
+    assert output_compression("a.fastq", "bgzf") == "bgzf"
+    with pytest.raises(ValueError):
+        output_compression("a.fastq", "zstd")
@@ -0,0 +1,44 @@
+"""Test cases for the coords module."""
+import io
+
+import pytest
+
+from ont_chopper.utils.coords import coords_format
+from ont_chopper.utils.coords import coords_header
+from ont_chopper.utils.coords import format_coords
+from ont_chopper.utils.coords import read_coords
+
+
+@pytest.mark.parametrize("table_format", ["tsv", "binary"])
+def test_roundtrip(table_format: str) -> None:
+    """Segments and adapters of every read are read back as written."""
+    reads = [
+        (b"read1 runid=x", [(0, 400), (450, 999)], [(400, 450)]),
+        (b"read2", None, []),
+        (b"read3", [], [(0, 100), (200, 300)]),
+        (b"read4", [(0, 400), (450, 700), (750, 999)], [(400, 450), (700, 750)]),
+    ]
+    table = coords_header(table_format) + b"".join(
+        format_coords(title, segments, adapters, table_format)
+        for title, segments, adapters in reads
+    )
+    assert list(read_coords(io.BytesIO(table))) == [
+        (title.split()[0], segments, adapters)
+        for title, segments, adapters in reads
+        if segments is not None
+    ]
+
+
+def test_tsv_rows() -> None:
+    """The k-th segment and adapter share a row, "." fills the gaps."""
+    assert format_coords(b"r", [(0, 10)], [(10, 20), (30, 40)]) == (
+        b"r\t0\t10\t10\t20\nr\t.\t.\t30\t40\n"
+    )
+
+
+def test_coords_format() -> None:
+    """.bin tables are binary, whatever their compression, others TSV."""
+    assert coords_format("out.bin") == "binary"
+    assert coords_format("out.bin.gz") == "binary"
+    assert coords_format("out.tsv.gz") == "tsv"
+    assert coords_format("out.txt") == "tsv"
@@ -0,0 +1,55 @@
+"""Test cases for the cpus module."""
+import pytest
+
+from ont_chopper.utils import cpus
+from ont_chopper.utils.cpus import available_cpus
+from ont_chopper.utils.cpus import cgroup_cpu_limit
+
+
+def _write(path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_cgroup_v2_quota(tmp_path) -> None:
+    """cpu.max of the cgroup or of a parent limits the CPUs."""
+    _write(tmp_path / "proc", "0::/kubepods/pod1/c1\n")
+    _write(tmp_path / "fs" / "kubepods" / "pod1" / "c1" / "cpu.max", "max 100000\n")
+    _write(tmp_path / "fs" / "kubepods" / "pod1" / "cpu.max", "250000 100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "fs"), str(tmp_path / "proc")) == 2.5
+
+
+def test_cgroup_v2_namespace_root(tmp_path) -> None:
+    """A container seeing its own cgroup at the root reads the root cpu.max."""
+    _write(tmp_path / "proc", "0::/\n")
+    _write(tmp_path / "fs" / "cpu.max", "50000 100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "fs"), str(tmp_path / "proc")) == 0.5
+
+
+def test_cgroup_v1_quota(tmp_path) -> None:
+    """The CFS quota of the cgroup v1 cpu controller limits the CPUs."""
+    _write(tmp_path / "proc", "5:memory:/job\n3:cpu,cpuacct:/job\n")
+    job = tmp_path / "fs" / "cpu,cpuacct" / "job"
+    _write(job / "cpu.cfs_quota_us", "400000\n")
+    _write(job / "cpu.cfs_period_us", "100000\n")
+    _write(tmp_path / "fs" / "cpu,cpuacct" / "cpu.cfs_quota_us", "-1\n")
+    _write(tmp_path / "fs" / "cpu,cpuacct" / "cpu.cfs_period_us", "100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "fs"), str(tmp_path / "proc")) == 4
+
+
+def test_no_quota(tmp_path) -> None:
+    """Without quota, or without cgroups at all, there is no limit."""
+    _write(tmp_path / "proc", "0::/\n")
+    _write(tmp_path / "fs" / "cpu.max", "max 100000\n")
+    assert cgroup_cpu_limit(str(tmp_path / "fs"), str(tmp_path / "proc")) is None
+    assert cgroup_cpu_limit(str(tmp_path / "fs"), str(tmp_path / "missing")) is None
+
+
+@pytest.mark.parametrize(
+    "affinity, limit, expected", [(8, None, 8), (8, 2.5, 2), (2, 6.0, 2), (8, 0.5, 1)]
+)
+def test_available_cpus(monkeypatch, affinity: int, limit, expected: int) -> None:
+    """The affinity mask is capped by the quota, rounded down, and at least 1."""
+    monkeypatch.setattr(cpus, "affinity_cpus", lambda: affinity)
+    monkeypatch.setattr(cpus, "cgroup_cpu_limit", lambda: limit)
+    assert available_cpus() == expected
@@ -0,0 +1,84 @@
+"""Test cases for the extrema_cache module."""
+import json
+
+import numpy as np
+
+from ont_chopper.algorithm.fastq_handler import fastq_io
+from ont_chopper.utils.extrema_cache import ExtremaCache
+from ont_chopper.utils.extrema_cache import quality_hash
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+def test_roundtrip(tmp_path) -> None:
+    """Stored extrema come back for the same key only."""
+    cache = ExtremaCache(str(tmp_path / "cache.sqlite"))
+    digest = quality_hash(b"+++++")
+    cache.put_many({digest: (np.array([3, 9]), np.array([5]))}, 10, 50, "native")
+    valleys, peaks = cache.get_many([digest], 10, 50, "native")[digest]
+    assert valleys.tolist() == [3, 9]
+    assert peaks.tolist() == [5]
+    assert cache.get_many([digest], 10, 40, "native") == {}
+    assert cache.get_many([quality_hash(b"!!!!!")], 10, 50, "native") == {}
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path) -> None:
+    """Beyond max_entries, the entries not looked up for longest go first."""
+    cache = ExtremaCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    first, second, third = (quality_hash(bytes([n])) for n in range(3))
+    empty = (np.array([], dtype=int), np.array([], dtype=int))
+    cache.put_many({first: empty}, 10, 50, "native")
+    cache.put_many({second: empty}, 10, 50, "native")
+    cache.get_many([first], 10, 50, "native")
+    cache.put_many({third: empty}, 10, 50, "native")
+    assert len(cache) == 2
+    assert set(cache.get_many([first, second, third], 10, 50, "native")) == {
+        first,
+        third,
+    }
+    cache.close()
+
+
+def test_entries_are_counted_without_scanning(tmp_path) -> None:
+    """The running count follows inserts, updates, evictions and reopening."""
+    path = str(tmp_path / "cache.sqlite")
+    cache = ExtremaCache(path, max_entries=3)
+    empty = (np.array([], dtype=int), np.array([], dtype=int))
+    digests = [quality_hash(bytes([n])) for n in range(5)]
+    cache.put_many(dict.fromkeys(digests[:2], empty), 10, 50, "native")
+    cache.put_many(dict.fromkeys(digests[:2], empty), 10, 50, "native")
+    assert len(cache) == 2
+    cache.put_many(dict.fromkeys(digests[2:], empty), 10, 50, "native")
+    assert len(cache) == 3
+    cache.close()
+    cache = ExtremaCache(path, max_entries=3)
+    (stored,) = cache._connection.execute("SELECT count(*) FROM extrema").fetchone()
+    assert len(cache) == stored == 3
+    cache.close()
+
+
+def test_cached_run_matches_uncached(fastq_file: str, tmp_path) -> None:
+    """A rerun with another cutoff reuses the cache and gives the same output."""
+    cache_file = str(tmp_path / "cache.sqlite")
+    metrics_file = tmp_path / "metrics.json"
+    for score in (20, 15):
+        plain = str(tmp_path / f"plain{score}.fastq")
+        cached = str(tmp_path / f"cached{score}.fastq")
+        fastq_io(fastq_file, plain, 1, score_cutoff=score, ordered=True)
+        fastq_io(
+            fastq_file,
+            cached,
+            1,
+            score_cutoff=score,
+            ordered=True,
+            cache_file=cache_file,
+            metrics_file=str(metrics_file),
+        )
+        assert _read(plain) == _read(cached)
+    cache = json.loads(metrics_file.read_text())["cache"]
+    assert cache["misses"] == 0
+    assert cache["hits"] > 0
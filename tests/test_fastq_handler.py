@@ -0,0 +1,415 @@
+"""Test cases for the fastq_handler module."""
+import functools
+import gzip
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from ont_chopper.algorithm import fastq_handler
+from ont_chopper.algorithm.fastq_handler import adapter_finder
+from ont_chopper.algorithm.fastq_handler import fastq_io
+from ont_chopper.algorithm.fastq_handler import file_chopper
+from ont_chopper.algorithm.fastq_handler import read_chopper
+from ont_chopper.algorithm.fastq_handler import sharded_fastq_io
+from ont_chopper.algorithm.fastq_writer import read_checkpoint
+from ont_chopper.utils.compression import open_input
+from ont_chopper.utils.fastq_reader import read_fastq
+
+from .conftest import synthetic_fastq
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+def _sorted_records(data: bytes) -> list:
+    lines = data.split(b"\n")
+    return sorted(b"\n".join(lines[i : i + 4]) for i in range(0, len(lines) - 1, 4))
+
+
+def test_batched_adapter_finder_matches_read_chopper(fastq_file: str) -> None:
+    """Chopping a batch gives the concatenated output of its reads chopped alone."""
+    with open(fastq_file, "rb") as handle:
+        batch = list(read_fastq(handle))
+    params = (20, 30, 150, 10, 50)
+    output, stats = adapter_finder(batch, *params)
+    expected = b"".join(
+        read_chopper(b"@" + title, seq, quality, *params)
+        for title, seq, quality in batch
+    )
+    assert output == expected
+    assert b"|@read" in output
+    assert stats["reads"] == len(batch)
+
+
+def test_chopped_output(fastq_file: str, tmp_path) -> None:
+    """Reads with long low quality stretches are split into segments."""
+    out = str(tmp_path / "out.fastq")
+    fastq_io(fastq_file, out, 1)
+    data = _read(out)
+    headers = data.split(b"\n")[0::4]
+    assert any(header.startswith(b"@read") for header in headers)
+    assert any(b"|@read" in header for header in headers)
+
+
+@pytest.mark.parametrize("threads", [2, 3])
+def test_ordered_output_is_deterministic(
+    fastq_file: str, tmp_path, monkeypatch, threads: int
+) -> None:
+    """--ordered output is byte-identical whatever the thread number."""
+    monkeypatch.setattr(fastq_handler, "available_cpus", lambda: 4)
+    single = str(tmp_path / "single.fastq")
+    multi = str(tmp_path / "multi.fastq")
+    fastq_io(fastq_file, single, 1, batch_size=7, ordered=True)
+    fastq_io(fastq_file, multi, threads, batch_size=7, max_inflight=2, ordered=True)
+    assert _read(single) == _read(multi)
+
+
+def test_unordered_output_has_the_same_reads(fastq_file: str, tmp_path) -> None:
+    """Unordered output holds the same records as ordered output."""
+    ordered = str(tmp_path / "ordered.fastq")
+    unordered = str(tmp_path / "unordered.fastq")
+    fastq_io(fastq_file, ordered, 1, batch_size=5, ordered=True)
+    fastq_io(fastq_file, unordered, 1, batch_size=5)
+    assert _sorted_records(_read(ordered)) == _sorted_records(_read(unordered))
+
+
+def test_metrics_file(fastq_file: str, tmp_path) -> None:
+    """The metrics JSON accounts for every read and every pipeline stage."""
+    out = str(tmp_path / "out.fastq")
+    metrics_file = tmp_path / "metrics.json"
+    fastq_io(fastq_file, out, 1, batch_size=50, metrics_file=str(metrics_file))
+    metrics = json.loads(metrics_file.read_text())
+    assert metrics["reads"] == 300
+    assert metrics["batches"] == 6
+    assert sum(metrics["valley_count_distribution"].values()) == 300
+    assert metrics["reads_with_adapters"] == 300 - metrics[
+        "valley_count_distribution"
+    ].get("0", 0)
+    assert set(metrics["stages"]) >= {
+        "read",
+        "parse",
+        "starved",
+        "valley_finding",
+        "write",
+    }
+    assert 0 <= metrics["workers"]["starved_share"] <= 1
+    assert 0 < metrics["reads_prefiltered"] < 300
+    assert metrics["prefiltered_share"] == metrics["reads_prefiltered"] / 300
+    assert metrics["output_bytes"] == os.path.getsize(out)
+    assert 0 < metrics["workers"]["utilisation"] <= 1
+
+
+@pytest.mark.parametrize("out_name", ["out.fastq", "out.fastq.gz"])
+def test_sharded_output_matches_ordered(
+    fastq_file: str, tmp_path, monkeypatch, out_name: str
+) -> None:
+    """Byte range processing gives the ordered streaming output."""
+    monkeypatch.setattr(fastq_handler, "available_cpus", lambda: 4)
+    ordered = str(tmp_path / "ordered.fastq")
+    sharded = str(tmp_path / out_name)
+    fastq_io(fastq_file, ordered, 1, ordered=True)
+    sharded_fastq_io(fastq_file, sharded, 3, batch_size=9)
+    with open_input(sharded) as handle:
+        assert handle.read() == _read(ordered)
+    assert not list(tmp_path.glob("*.part*"))
+
+
+class _CountingPool:
+    """multiprocessing.Pool keeping the peak of its outstanding tasks."""
+
+    peak = 0
+    pool = multiprocessing.Pool
+
+    def __init__(self, processes):
+        self._pool = _CountingPool.pool(processes)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+
+    def _finished(self, callback, result):
+        with self._lock:
+            self._outstanding -= 1
+        callback(result)
+
+    def apply_async(self, func, args, callback, error_callback):
+        with self._lock:
+            self._outstanding += 1
+            _CountingPool.peak = max(_CountingPool.peak, self._outstanding)
+        return self._pool.apply_async(
+            func,
+            args,
+            callback=functools.partial(self._finished, callback),
+            error_callback=functools.partial(self._finished, error_callback),
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_submissions_stay_within_max_inflight(
+    fastq_file: str, tmp_path, monkeypatch, ordered: bool
+) -> None:
+    """No more than max_inflight batches are outstanding at any time."""
+    monkeypatch.setattr(fastq_handler, "available_cpus", lambda: 4)
+    monkeypatch.setattr(fastq_handler.multiprocessing, "Pool", _CountingPool)
+    monkeypatch.setattr(_CountingPool, "peak", 0)
+    out = str(tmp_path / "out.fastq")
+    fastq_io(fastq_file, out, 4, batch_size=5, max_inflight=3, ordered=ordered)
+    assert _CountingPool.peak == 3
+
+
+@pytest.mark.parametrize("file_task_size", [0, 1 << 30])
+def test_several_inputs(tmp_path, monkeypatch, file_task_size: int) -> None:
+    """Several inputs share a pool, merged or with one output each."""
+    monkeypatch.setattr(fastq_handler, "available_cpus", lambda: 4)
+    inputs = []
+    for i in range(3):
+        path = synthetic_fastq(tmp_path / f"in{i}.fastq", reads=40, seed=i)
+        if i == 1:
+            with open(path, "rb") as handle, gzip.open(path + ".gz", "wb") as out:
+                out.write(handle.read())
+            path += ".gz"
+        inputs.append(path)
+    expected = []
+    for i, path in enumerate(inputs):
+        single = str(tmp_path / f"single{i}.fastq")
+        fastq_io(path, single, 1, ordered=True)
+        expected.append(_read(single))
+
+    merged = str(tmp_path / "merged.fastq")
+    fastq_io(
+        inputs, merged, 3, batch_size=7, ordered=True, file_task_size=file_task_size
+    )
+    assert _read(merged) == b"".join(expected)
+
+    out_dir = str(tmp_path / "out")
+    fastq_io(inputs, out_dir, 3, batch_size=7, per_input=True)
+    for path, data in zip(inputs, expected):
+        with open_input(os.path.join(out_dir, os.path.basename(path))) as handle:
+            assert handle.read() == data
+
+
+def _slow_reading_file_chopper(*args, **kwargs):
+    """file_chopper reporting a worker read time of 100 seconds."""
+    output, stats = file_chopper(*args, **kwargs)
+    stats["read"] += 100.0
+    return output, stats
+
+
+def test_parse_excludes_worker_reads(tmp_path, monkeypatch) -> None:
+    """Only the main process reads come off the main process parse time."""
+    small = synthetic_fastq(tmp_path / "small.fastq", reads=10, seed=0)
+    large = synthetic_fastq(tmp_path / "large.fastq", reads=200, seed=1)
+    monkeypatch.setattr(fastq_handler, "file_chopper", _slow_reading_file_chopper)
+    metrics_file = tmp_path / "metrics.json"
+    fastq_io(
+        [small, large],
+        str(tmp_path / "out.fastq"),
+        1,
+        batch_size=20,
+        file_task_size=os.path.getsize(small),
+        metrics_file=str(metrics_file),
+    )
+    stages = json.loads(metrics_file.read_text())["stages"]
+    assert stages["read"] > 100
+    assert 0 <= stages["parse"] < 100
+
+
+def _failing_adapter_finder(batch, *args):
+    """adapter_finder crashing on the batch holding read150."""
+    if any(title.startswith(b"read150 ") for title, _, _ in batch):
+        raise RuntimeError("preempted")
+    return adapter_finder(batch, *args)
+
+
+@pytest.mark.parametrize("out_name", ["out.fastq", "out.fastq.gz", "out.fastq.bgz"])
+def test_resume_from_checkpoint(
+    fastq_file: str, tmp_path, monkeypatch, out_name: str
+) -> None:
+    """A crashed run resumed from its checkpoint gives the full output."""
+    expected = str(tmp_path / "expected.fastq")
+    fastq_io(fastq_file, expected, 1, ordered=True)
+
+    out = str(tmp_path / out_name)
+    options = {"batch_size": 20, "write_buffer_size": 1, "checkpoint_interval": 1e-9}
+    monkeypatch.setattr(fastq_handler, "adapter_finder", _failing_adapter_finder)
+    with pytest.raises(RuntimeError, match="preempted"):
+        fastq_io(fastq_file, out, 2, **options)
+    monkeypatch.undo()
+    checkpoint = read_checkpoint(out + ".checkpoint")
+    assert 0 < checkpoint["input_offset"] < os.path.getsize(fastq_file)
+    with open(out, "ab") as handle:
+        handle.write(b"half written batch")
+
+    fastq_io(fastq_file, out, 2, resume=True, **options)
+    with open_input(out) as handle:
+        assert handle.read() == _read(expected)
+    assert not os.path.exists(out + ".checkpoint")
+
+
+def test_resume_refuses_a_short_output(fastq_file: str, tmp_path, monkeypatch) -> None:
+    """An output shorter than its checkpoint is not padded and resumed."""
+    out = str(tmp_path / "out.fastq")
+    options = {"batch_size": 20, "write_buffer_size": 1, "checkpoint_interval": 1e-9}
+    monkeypatch.setattr(fastq_handler, "adapter_finder", _failing_adapter_finder)
+    with pytest.raises(RuntimeError, match="preempted"):
+        fastq_io(fastq_file, out, 2, **options)
+    monkeypatch.undo()
+    size = read_checkpoint(out + ".checkpoint")["output_size"]
+    os.truncate(out, size - 1)
+    with pytest.raises(ValueError, match="shorter than"):
+        fastq_io(fastq_file, out, 2, resume=True, **options)
+    assert os.path.getsize(out) == size - 1
+    os.remove(out)
+    with pytest.raises(ValueError, match="missing"):
+        fastq_io(fastq_file, out, 2, resume=True, **options)
+
+
+def test_balanced_batches() -> None:
+    """Batches get about equal bases and the longest reads come first."""
+    lengths = [100, 2000, 200, 300, 1500, 100, 900, 50, 1800, 1000]
+    reads = [(b"r%d" % i, b"A" * n, b"+" * n) for i, n in enumerate(lengths)]
+    batches = fastq_handler.balanced_batches(reads, 3)
+    assert sorted(read for batch in batches for read in batch) == sorted(reads)
+    totals = [sum(len(seq) for _, seq, _ in batch) for batch in batches]
+    assert totals == sorted(totals, reverse=True)
+    assert totals[0] - totals[-1] <= 300
+    assert max(len(batch[0][1]) for batch in batches) == 2000
+
+
+def test_length_balanced_regroups_within_one_input() -> None:
+    """Batches are regrouped REGROUP_WINDOW at a time, never across inputs."""
+    window = fastq_handler.REGROUP_WINDOW
+    tasks = [
+        (index, [(b"%d-%d" % (index, n), b"A" * (n + 1), b"+" * (n + 1))], n)
+        for index, batches in enumerate([window + 1, 2])
+        for n in range(batches)
+    ]
+    taken = []
+
+    def source():
+        for task in tasks:
+            taken.append(task)
+            yield task
+
+    regrouped = fastq_handler.length_balanced(source())
+    first = [next(regrouped) for _ in range(window)]
+    assert len(taken) == window
+    assert [index for index, _, _ in first] == [0] * window
+    rest = list(regrouped)
+    assert [(index, len(batch)) for index, batch, _ in rest] == [(0, 1), (1, 1), (1, 1)]
+    for index, batch, offset in first + rest:
+        assert offset is None
+        assert all(title.startswith(b"%d-" % index) for title, _, _ in batch)
+
+
+def test_length_schedule_keeps_every_read(fastq_file: str, tmp_path) -> None:
+    """The length schedule writes the reads of the input schedule."""
+    by_length = str(tmp_path / "length.fastq")
+    by_input = str(tmp_path / "input.fastq")
+    metrics_file = tmp_path / "metrics.json"
+    fastq_io(
+        fastq_file,
+        by_length,
+        1,
+        batch_size=20,
+        max_inflight=4,
+        metrics_file=str(metrics_file),
+    )
+    fastq_io(fastq_file, by_input, 1, batch_size=20, schedule="input")
+    assert _sorted_records(_read(by_length)) == _sorted_records(_read(by_input))
+    metrics = json.loads(metrics_file.read_text())
+    assert metrics["batches"] == 15
+    assert metrics["workers"]["imbalance"] >= 1
+    assert metrics["batch_bases"]["max"] < 1.5 * metrics["batch_bases"]["p50"]
+
+
+@pytest.mark.parametrize("depth", [0, 1, 4])
+def test_read_ahead_keeps_the_order(depth: int) -> None:
+    """Read-ahead yields every item of the tasks in order."""
+    assert list(fastq_handler.read_ahead(iter(range(50)), depth)) == list(range(50))
+
+
+def test_read_ahead_raises_task_errors() -> None:
+    """An error while reading the input is raised to the consumer."""
+
+    def tasks():
+        yield 1
+        raise OSError("disk gone")
+
+    items = fastq_handler.read_ahead(tasks(), 4)
+    assert next(items) == 1
+    with pytest.raises(OSError, match="disk gone"):
+        next(items)
+
+
+def test_read_ahead_stops_when_closed() -> None:
+    """Closing the consumer stops the read-ahead thread."""
+    items = fastq_handler.read_ahead(itertools.count(), 2)
+    assert next(items) == 0
+    items.close()
+    assert not any(
+        thread.name == "ont_chopper-read-ahead" for thread in threading.enumerate()
+    )
+
+
+def test_prefetch_does_not_change_the_output(fastq_file: str, tmp_path) -> None:
+    """Reading the input ahead or in line writes the same reads."""
+    ahead = str(tmp_path / "ahead.fastq")
+    in_line = str(tmp_path / "in_line.fastq")
+    fastq_io(fastq_file, ahead, 2, batch_size=20, ordered=True, prefetch=2)
+    fastq_io(fastq_file, in_line, 2, batch_size=20, ordered=True, prefetch=0)
+    assert _read(ahead) == _read(in_line)
+
+
+def test_autotune_keeps_the_output(fastq_file: str, tmp_path, monkeypatch) -> None:
+    """Adapting the batch size and window does not change ordered output."""
+    monkeypatch.setattr(fastq_handler, "available_cpus", lambda: 4)
+    tuned = str(tmp_path / "tuned.fastq")
+    fixed = str(tmp_path / "fixed.fastq")
+    metrics_file = tmp_path / "metrics.json"
+    fastq_io(
+        fastq_file,
+        tuned,
+        2,
+        batch_size=10,
+        ordered=True,
+        autotune=True,
+        metrics_file=str(metrics_file),
+    )
+    fastq_io(fastq_file, fixed, 1, ordered=True)
+    assert _read(tuned) == _read(fixed)
+    autotune = json.loads(metrics_file.read_text())["autotune"]
+    assert autotune["rounds"] > 0
+    assert autotune["batch_size"]["max"] > 10
+
+
+@pytest.mark.parametrize("prefetch", [0, 4])
+@pytest.mark.parametrize(
+    "content",
+    [b"@r1\nACGT\n+\nIIII\n@r2\nACGT\n+\n", b"@r1\nACGT\n+\nIIII\nr2\nACGT\n+\nIIII\n"],
+)
+def test_malformed_input_raises(tmp_path, prefetch: int, content: bytes) -> None:
+    """A truncated or malformed FASTQ raises instead of hanging the run."""
+    in_fastq = tmp_path / "bad.fastq"
+    in_fastq.write_bytes(content)
+    with pytest.raises(ValueError):
+        fastq_io(str(in_fastq), str(tmp_path / "out.fastq"), 1, prefetch=prefetch)
+    assert not [
+        child for child in multiprocessing.active_children() if child.is_alive()
+    ]
+
+
+def test_extrema_block_keeps_the_output(fastq_file: str, tmp_path) -> None:
+    """Small valley detection blocks give the output of the default ones."""
+    small = str(tmp_path / "small.fastq")
+    default = str(tmp_path / "default.fastq")
+    fastq_io(fastq_file, small, 1, ordered=True, extrema_block=64)
+    fastq_io(fastq_file, default, 1, ordered=True)
+    assert _read(small) == _read(default)
@@ -0,0 +1,65 @@
+"""Test cases for the fastq_reader module."""
+import io
+
+import pytest
+
+from ont_chopper.utils.fastq_reader import format_fastq
+from ont_chopper.utils.fastq_reader import phred_scores
+from ont_chopper.utils.fastq_reader import read_fastq
+from ont_chopper.utils.fastq_reader import read_fastq_offsets
+
+
+RECORDS = [
+    (b"read1 runid=abc", b"ACGU", b"!+5?"),
+    (b"read2", b"A", b"@"),
+    (b"read3 ch=7", b"GGGGGGGGGG", b"@@@@@@@@@@"),
+]
+FASTQ = b"".join(format_fastq(*record) for record in RECORDS)
+
+
+@pytest.mark.parametrize("buffer_size", [1, 3, 7, 64, 1 << 20])
+def test_read_fastq_across_buffers(buffer_size: int) -> None:
+    """Records are recovered whatever the block boundaries are."""
+    assert list(read_fastq(io.BytesIO(FASTQ), buffer_size)) == RECORDS
+
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"])
+@pytest.mark.parametrize("buffer_size", [1, 7, 1 << 20])
+def test_read_fastq_offsets(newline: bytes, buffer_size: int) -> None:
+    """Offsets point just past each record."""
+    data = FASTQ.replace(b"\n+\n", b"\n+repeated title\n").replace(b"\n", newline)
+    offsets = [
+        offset
+        for _, offset in read_fastq_offsets(io.BytesIO(data), buffer_size)
+    ]
+    assert offsets[-1] == len(data)
+    for offset, record in zip(offsets, RECORDS[1:]):
+        assert data[offset:].startswith(b"@" + record[0])
+
+
+def test_read_fastq_without_final_newline() -> None:
+    """A missing trailing newline is tolerated."""
+    assert list(read_fastq(io.BytesIO(FASTQ[:-1]))) == RECORDS
+
+
+def test_read_fastq_crlf() -> None:
+    """Windows line endings are stripped."""
+    crlf = FASTQ.replace(b"\n", b"\r\n")
+    assert list(read_fastq(io.BytesIO(crlf))) == RECORDS
+
+
+def test_read_fastq_malformed() -> None:
+    """Mismatched sequence and quality lengths are rejected."""
+    with pytest.raises(ValueError):
+        list(read_fastq(io.BytesIO(b"@r\nACGT\n+\n!!!\n")))
+
+
+def test_read_fastq_truncated() -> None:
+    """A record cut short at the end of the input is rejected."""
+    with pytest.raises(ValueError):
+        list(read_fastq(io.BytesIO(FASTQ + b"@r\nACGT\n")))
+
+
+def test_phred_scores() -> None:
+    """Quality characters are decoded with the Sanger offset."""
+    assert phred_scores(b"!+5?").tolist() == [0, 10, 20, 30]
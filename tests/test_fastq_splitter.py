@@ -0,0 +1,66 @@
+"""Test cases for the fastq_splitter module."""
+import gzip
+
+import pytest
+
+from ont_chopper.utils.compression import BGZF_EOF
+from ont_chopper.utils.compression import open_output
+from ont_chopper.utils.fastq_splitter import byte_ranges
+from ont_chopper.utils.fastq_splitter import concatenate_parts
+from ont_chopper.utils.fastq_splitter import read_fastq_range
+from ont_chopper.utils.fastq_splitter import record_start
+
+
+# quality lines starting with "@" look like headers
+TRICKY = b"".join(
+    b"@r%d\nACGT\n+\n@@%s\n" % (i, b"I@" if i % 2 else b"@I") for i in range(50)
+)
+
+
+@pytest.mark.parametrize("offset", range(0, 40))
+def test_record_start(offset: int) -> None:
+    """Every offset resyncs to the next header, never to a quality line."""
+    start = record_start(TRICKY, offset)
+    assert TRICKY[start : start + 2] == b"@r"
+    assert start >= offset
+    assert b"@r" not in TRICKY[offset + 1 : start]
+
+
+@pytest.mark.parametrize("parts", [1, 2, 3, 7, 100])
+def test_byte_ranges_cover_every_record(tmp_path, parts: int) -> None:
+    """Ranges are contiguous and together hold every record exactly once."""
+    path = tmp_path / "reads.fastq"
+    path.write_bytes(TRICKY)
+    ranges = byte_ranges(str(path), parts)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(TRICKY)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    titles = [
+        title
+        for start, end in ranges
+        for title, _, _ in read_fastq_range(str(path), start, end, buffer_size=7)
+    ]
+    assert titles == [b"r%d" % i for i in range(50)]
+
+
+def test_byte_ranges_reject_gzip(tmp_path) -> None:
+    """Compressed input cannot be cut into byte ranges."""
+    path = tmp_path / "reads.fastq.gz"
+    path.write_bytes(gzip.compress(TRICKY))
+    with pytest.raises(ValueError):
+        byte_ranges(str(path), 2)
+
+
+def test_concatenate_bgzf_parts(tmp_path) -> None:
+    """Concatenated BGZF parts keep a single end of file marker."""
+    parts = []
+    for i in range(3):
+        part = str(tmp_path / f"out.bgz.part{i}")
+        with open_output(part, "bgzf") as handle:
+            handle.write(b"part%d\n" % i)
+        parts.append(part)
+    out = tmp_path / "out.bgz"
+    concatenate_parts(parts, str(out))
+    data = out.read_bytes()
+    assert gzip.decompress(data) == b"part0\npart1\npart2\n"
+    assert data.count(BGZF_EOF) == 1 and data.endswith(BGZF_EOF)
+    assert not list(tmp_path.glob("*.part*"))
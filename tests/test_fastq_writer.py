@@ -0,0 +1,51 @@
+"""Test cases for the fastq_writer module."""
+import multiprocessing
+
+import pytest
+
+from ont_chopper.algorithm.fastq_writer import writer
+
+
+def _run_writer(path: str, batches, **kwargs) -> dict:
+    """Feed numbered batches to a writer process and return its statistics."""
+    connection, writer_connection = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=writer, args=(writer_connection, path), kwargs=kwargs
+    )
+    process.start()
+    writer_connection.close()
+    for message in batches:
+        connection.send(message)
+    connection.send(None)
+    stats = connection.recv()
+    process.join()
+    assert process.exitcode == 0
+    return stats
+
+
+BATCHES = [(2, b"c"), (0, b"a"), (3, b"d"), (1, b"b")]
+
+
+def test_writer_ordered(tmp_path) -> None:
+    """Ordered output follows the batch sequence numbers."""
+    path = str(tmp_path / "out.fastq")
+    stats = _run_writer(path, BATCHES, ordered=True)
+    assert open(path, "rb").read() == b"abcd"
+    assert stats["bytes_written"] == 4
+    assert stats["batches_written"] == 4
+
+
+def test_writer_arrival_order(tmp_path) -> None:
+    """Unordered output is written as batches arrive."""
+    path = str(tmp_path / "out.fastq")
+    _run_writer(path, BATCHES)
+    assert open(path, "rb").read() == b"cadb"
+
+
+@pytest.mark.parametrize("buffer_size,flushes", [(1, 3), (1 << 20, 1)])
+def test_writer_flushes_on_size(tmp_path, buffer_size: int, flushes: int) -> None:
+    """Small buffers flush more often without changing the content."""
+    path = str(tmp_path / "out.fastq")
+    stats = _run_writer(path, BATCHES, ordered=True, buffer_size=buffer_size)
+    assert open(path, "rb").read() == b"abcd"
+    assert stats["flushes"] == flushes
@@ -0,0 +1,60 @@
+"""Test cases for the input_files module."""
+import os
+
+import pytest
+
+from ont_chopper.utils.input_files import expand_inputs
+from ont_chopper.utils.input_files import per_input_outputs
+
+
+@pytest.fixture
+def run_dir(tmp_path) -> str:
+    """A MinKNOW like fastq_pass directory with barcode subdirectories."""
+    for barcode in ("barcode01", "barcode02"):
+        (tmp_path / barcode).mkdir()
+        for chunk in range(2):
+            (tmp_path / barcode / f"run_{chunk}.fastq.gz").write_bytes(b"")
+    (tmp_path / "barcode01" / "report.txt").write_text("")
+    return str(tmp_path)
+
+
+def test_expand_directory(run_dir: str) -> None:
+    """Directories are searched recursively for FASTQ files."""
+    paths = expand_inputs([run_dir])
+    assert [os.path.relpath(path, run_dir) for path in paths] == [
+        "barcode01/run_0.fastq.gz",
+        "barcode01/run_1.fastq.gz",
+        "barcode02/run_0.fastq.gz",
+        "barcode02/run_1.fastq.gz",
+    ]
+
+
+def test_expand_glob_and_files(run_dir: str) -> None:
+    """Globs and files keep their order and duplicates are dropped."""
+    first = os.path.join(run_dir, "barcode02", "run_1.fastq.gz")
+    paths = expand_inputs([first, os.path.join(run_dir, "**", "run_1.fastq.gz")])
+    assert paths == [first, os.path.join(run_dir, "barcode01", "run_1.fastq.gz")]
+
+
+@pytest.mark.parametrize("name", ["missing.fastq", "missing_*.fastq"])
+def test_expand_missing(tmp_path, name: str) -> None:
+    """Inputs matching nothing are an error."""
+    with pytest.raises(FileNotFoundError):
+        expand_inputs([str(tmp_path / name)])
+
+
+def test_per_input_outputs(run_dir: str, tmp_path) -> None:
+    """Outputs keep the layout below the common input directory."""
+    outputs = per_input_outputs(expand_inputs([run_dir]), str(tmp_path / "out"))
+    assert os.path.relpath(outputs[2], tmp_path) == "out/barcode02/run_0.fastq.gz"
+    assert os.path.isdir(tmp_path / "out" / "barcode01")
+
+
+def test_per_input_outputs_never_overwrite_inputs(run_dir: str, tmp_path) -> None:
+    """An output directory resolving to the inputs' own is refused."""
+    inputs = expand_inputs([run_dir])
+    with pytest.raises(ValueError, match="would overwrite an input"):
+        per_input_outputs(inputs, run_dir)
+    os.symlink(run_dir, tmp_path / "link")
+    with pytest.raises(ValueError, match="would overwrite an input"):
+        per_input_outputs(inputs, str(tmp_path / "link"))
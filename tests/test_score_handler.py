@@ -0,0 +1,142 @@
+"""Test cases for the score_handler module."""
+import random
+
+import pytest
+
+from ont_chopper.algorithm import score_handler
+from ont_chopper.algorithm.score_handler import caerus_extrema
+from ont_chopper.algorithm.score_handler import can_have_adapter
+from ont_chopper.algorithm.score_handler import valley_extension
+from ont_chopper.algorithm.score_handler import valley_finder
+
+
+def _quality(length: int, adapters: int, seed: int) -> list:
+    """Nanopore-like phred scores with a few low quality adapter stretches."""
+    rng = random.Random(seed)
+    score = [max(0, min(60, int(rng.gauss(18, 6)))) for _ in range(length)]
+    for _ in range(adapters):
+        start = rng.randrange(length)
+        for i in range(start, min(length, start + rng.randint(10, 80))):
+            score[i] = rng.randint(1, 9)
+    return score
+
+
+def test_short_read_has_no_valley() -> None:
+    """Reads shorter than two windows are left alone."""
+    assert valley_finder(_quality(99, 1, 0), window=50) == []
+
+
+def test_native_finds_adapter_stretch() -> None:
+    """A long low quality stretch in a clean read is reported as an adapter."""
+    score = [30] * 300
+    score[120:180] = [3] * 60
+    assert valley_finder(score, score_cutoff=20, minperc=10, window=50) == [
+        (119, 180)
+    ]
+
+
+def test_unknown_engine() -> None:
+    """An unknown engine name is rejected."""
+    with pytest.raises(ValueError):
+        valley_finder(_quality(200, 1, 0), engine="nope")
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_native_matches_findpeaks(seed: int) -> None:
+    """The native engine reproduces findpeaks' caerus valleys and peaks."""
+    pytest.importorskip("findpeaks")
+    from ont_chopper.algorithm.score_handler import findpeaks_extrema
+
+    score = _quality(150 + 60 * seed, seed % 3, seed)
+    for minperc, window in [(10, 50), (3, 20)]:
+        native = caerus_extrema(score, minperc, window)
+        reference = findpeaks_extrema(score, minperc, window)
+        assert set(native[0]) == set(reference[0])
+        assert set(native[1]) == set(reference[1])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_blocks_match_whole_read(seed: int) -> None:
+    """Computing the changes in blocks gives the results of a single pass."""
+    score = _quality(3000 + 1000 * seed, 5 + seed, seed)
+    for minperc, window in [(10, 50), (3, 20)]:
+        whole = caerus_extrema(score, minperc, window, block=len(score))
+        for block in (7, 100, 1000):
+            valleys, peaks = caerus_extrema(score, minperc, window, block=block)
+            assert valleys.tolist() == whole[0].tolist()
+            assert peaks.tolist() == whole[1].tolist()
+
+
+def test_blocks_bound_the_rows(monkeypatch) -> None:
+    """No more than block bases of changes are computed at once on any read."""
+    rows = []
+    hot = score_handler._hot
+
+    def _spy(x, spans, lo, hi, minperc):
+        rows.append(hi - lo)
+        return hot(x, spans, lo, hi, minperc)
+
+    monkeypatch.setattr(score_handler, "_hot", _spy)
+    # alternating scores make a single start region spanning the read
+    score = [5, 40] * 3000
+    valleys, peaks = caerus_extrema(score, block=500)
+    assert max(rows) == 500
+    assert len(valleys) == len(peaks) == 1
+
+
+def _walk_extension(tgt_index, score, peaks, score_cutoff):
+    """Reference base-by-base valley extension."""
+    lower = max((p for p in peaks if p < tgt_index), default=0)
+    upper = min((p for p in peaks if p > tgt_index), default=len(score) - 1)
+    tgt_end = tgt_index
+    for i in range(tgt_index, upper + 1):
+        if score[i] > score_cutoff:
+            break
+        tgt_end += 1
+    tgt_start = tgt_index
+    for i in range(tgt_index, lower - 1, -1):
+        if score[i] > score_cutoff:
+            break
+        tgt_start -= 1
+    return tgt_start, tgt_end
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_valley_extension_matches_walk(seed: int) -> None:
+    """Run based extension gives the same zones as walking base by base."""
+    rng = random.Random(seed)
+    score = _quality(rng.randint(5, 400), 3, seed)
+    score_cutoff = rng.choice([5, 10, 20])
+    targets = sorted(rng.sample(range(len(score)), min(len(score), 8)))
+    peaks = sorted(
+        i for i in rng.sample(range(len(score)), min(len(score), 6))
+        if score[i] > score_cutoff
+    )
+    tgt_start, tgt_end = valley_extension(targets, score, peaks, score_cutoff)
+    assert list(zip(tgt_start.tolist(), tgt_end.tolist())) == [
+        _walk_extension(t, score, peaks, score_cutoff) for t in targets
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_prefilter_never_skips_an_adapter(seed: int) -> None:
+    """Reads failing can_have_adapter have no adapter long enough to keep."""
+    score = _quality(600, seed % 3, seed)
+    extrema = caerus_extrema(score)
+    for score_cutoff in (8, 15, 20):
+        for minimum_adapter_length in (5, 20, 40):
+            if can_have_adapter(score, score_cutoff, minimum_adapter_length):
+                continue
+            adapters = valley_finder(score, score_cutoff, extrema=extrema)
+            assert all(
+                end - start <= minimum_adapter_length for start, end in adapters
+            )
+
+
+def test_can_have_adapter() -> None:
+    """A run of minimum_adapter_length low bases is enough to look further."""
+    score = [30] * 100
+    score[40:60] = [5] * 20
+    assert can_have_adapter(score, 20, 20)
+    assert not can_have_adapter(score, 20, 21)
+    assert not can_have_adapter(score, 4, 1)
@@ -0,0 +1,59 @@
+"""Test cases for the shard_handler module."""
+import json
+import subprocess  # noqa: S404
+import sys
+
+import pytest
+
+from ont_chopper.algorithm.fastq_handler import fastq_io
+from ont_chopper.algorithm.shard_handler import merge_shards
+from ont_chopper.algorithm.shard_handler import plan_shards
+from ont_chopper.utils.compression import open_input
+from ont_chopper.utils.fastq_splitter import read_manifest
+
+
+def _chopper(*args: str) -> None:
+    subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "ont_chopper", *args], check=True, capture_output=True
+    )
+
+
+def test_shards_in_separate_processes(fastq_file: str, tmp_path) -> None:
+    """Plan, shards run side by side and merge give the ordered output."""
+    manifest = str(tmp_path / "shards.json")
+    out = str(tmp_path / "out.fastq.gz")
+    metrics = tmp_path / "metrics.json"
+    _chopper("-i", fastq_file, "--plan", "3", "--manifest", manifest)
+    planned = read_manifest(manifest)["shards"]
+    assert sum(shard["records"] for shard in planned) == 300
+
+    shards = [
+        subprocess.Popen(  # noqa: S603
+            [sys.executable, "-m", "ont_chopper", "--shard", f"{k}/3"]
+            + ["--manifest", manifest, "-o", out],
+            stdout=subprocess.DEVNULL,
+        )
+        for k in (1, 2, 3)
+    ]
+    assert [shard.wait() for shard in shards] == [0, 0, 0]
+    _chopper("--merge", "--manifest", manifest, "-o", out, "--metrics", str(metrics))
+
+    ordered = str(tmp_path / "ordered.fastq")
+    fastq_io(fastq_file, ordered, 1, ordered=True)
+    with open_input(out) as merged, open(ordered, "rb") as expected:
+        assert merged.read() == expected.read()
+    assert json.loads(metrics.read_text())["reads"] == 300
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "metrics.json",
+        "ordered.fastq",
+        "out.fastq.gz",
+        "reads.fastq",
+        "shards.json",
+    ]
+
+
+def test_merge_needs_every_shard(fastq_file: str, tmp_path) -> None:
+    """Merging before every shard is done fails."""
+    manifest = plan_shards(fastq_file, 2, str(tmp_path / "shards.json"))
+    with pytest.raises(FileNotFoundError):
+        merge_shards(manifest, str(tmp_path / "out.fastq"))
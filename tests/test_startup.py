@@ -0,0 +1,50 @@
+"""Startup time of the command line, see CONTRIBUTING.md."""
+import subprocess
+import sys
+
+
+# budget for the imports of `ont_chopper --help`, in milliseconds
+IMPORT_BUDGET_MS = 250
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "scipy",
+    "matplotlib",
+    "findpeaks",
+    "Bio",
+    "loguru",
+)
+
+
+def _imports(*args: str) -> list:
+    """(module, cumulative import time in microseconds, top level) of a run."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "ont_chopper", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented below the module importing them
+        imports.append((name.strip(), int(cumulative), not name[1:].startswith(" ")))
+    return imports
+
+
+def test_help_skips_heavy_imports() -> None:
+    """--help loads neither numpy nor the optional engines."""
+    names = {name for name, _, _ in _imports("--help")}
+    assert "ont_chopper.cli.arg" in names
+    assert not {name.split(".")[0] for name in names} & set(HEAVY_MODULES)
+
+
+def test_help_import_budget() -> None:
+    """The imports of --help stay within IMPORT_BUDGET_MS."""
+    total = min(
+        sum(cumulative for _, cumulative, top_level in _imports("--help") if top_level)
+        for _ in range(3)
+    )
+    assert total / 1000 < IMPORT_BUDGET_MS
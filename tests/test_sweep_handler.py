@@ -0,0 +1,67 @@
+"""Test cases for the sweep_handler module."""
+import json
+
+from ont_chopper.algorithm.fastq_handler import fastq_io
+from ont_chopper.algorithm.sweep_handler import length_bin
+from ont_chopper.algorithm.sweep_handler import parameter_grid
+from ont_chopper.algorithm.sweep_handler import sweep
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+def test_parameter_grid() -> None:
+    """The grid holds every combination, the score cutoff varying slowest."""
+    grid = parameter_grid([15, 20], [10], [40, 50], [30], [150])
+    assert len(grid) == 4
+    assert grid[0].name == "score15_minperc10_window40_adapter30_seq150"
+    assert grid[-1].score_cutoff == 20 and grid[-1].window == 50
+
+
+def test_length_bin() -> None:
+    """Lengths fall into the bin of the largest edge not above them."""
+    assert length_bin(0) == 0
+    assert length_bin(99) == 0
+    assert length_bin(100) == 100
+    assert length_bin(10**6) == 100000
+
+
+def test_sweep_matches_single_runs(fastq_file: str, tmp_path) -> None:
+    """Every combination gives the output of a run with its parameters alone."""
+    grid = parameter_grid([15, 20], [10], [40, 50], [30], [100, 150])
+    out_dir = tmp_path / "sweep"
+    report_file = tmp_path / "sweep.json"
+    report = sweep(
+        fastq_file,
+        grid,
+        1,
+        batch_size=40,
+        out_dir=str(out_dir),
+        report_file=str(report_file),
+    )
+    assert json.loads(report_file.read_text()) == json.loads(json.dumps(report))
+    assert report["run"]["reads"] == 300
+    for params, combination in zip(grid, report["combinations"]):
+        single = str(tmp_path / "single.fastq")
+        fastq_io(
+            fastq_file,
+            single,
+            1,
+            params.minimum_seq_length,
+            params.minimum_adapter_length,
+            params.score_cutoff,
+            params.minperc,
+            params.window,
+            ordered=True,
+        )
+        data = _read(single)
+        assert _read(str(out_dir / f"{params.name}.fastq")) == data
+        assert combination["reads"] == 300
+        assert combination["segments"] + 300 - combination["reads_chopped"] == (
+            data.count(b"\n") // 4
+        )
+        assert sum(combination["segment_length_histogram"].values()) == (
+            data.count(b"\n") // 4
+        )
@@ -0,0 +1,99 @@
+"""Test cases for the watch_handler module."""
+import gzip
+import json
+import os
+import shutil
+import threading
+
+from ont_chopper.algorithm import watch_handler
+from ont_chopper.algorithm.fastq_handler import fastq_io
+from ont_chopper.algorithm.watch_handler import STATE_FILE
+from ont_chopper.algorithm.watch_handler import watch
+
+from .conftest import synthetic_fastq
+
+
+def _watch(in_dir, out_dir, metrics_file) -> dict:
+    watch(
+        str(in_dir),
+        str(out_dir),
+        2,
+        poll_interval=0.05,
+        idle_timeout=1.0,
+        metrics_file=str(metrics_file),
+    )
+    return json.loads(metrics_file.read_text())
+
+
+def test_watch_and_resume(tmp_path) -> None:
+    """Files are chopped as they appear and a restart skips them."""
+    source = tmp_path / "source"
+    source.mkdir()
+    run = tmp_path / "run"
+    (run / "barcode01").mkdir(parents=True)
+    out = tmp_path / "out"
+    for i in range(3):
+        synthetic_fastq(source / f"chunk_{i}.fastq", reads=20, seed=i)
+    shutil.copy(source / "chunk_0.fastq", run / "barcode01")
+
+    def _later():
+        for i in (1, 2):
+            shutil.copy(source / f"chunk_{i}.fastq", run)
+
+    threading.Timer(0.3, _later).start()
+    metrics = _watch(run, out, tmp_path / "metrics.json")
+    assert metrics["chunks"]["count"] == 3
+    assert metrics["reads"] == 60
+    assert metrics["chunks"]["latency_seconds"]["max"] > 0
+
+    for name in ("barcode01/chunk_0.fastq", "chunk_1.fastq", "chunk_2.fastq"):
+        expected = str(tmp_path / "expected.fastq")
+        fastq_io(str(source / os.path.basename(name)), expected, 1, ordered=True)
+        with open(out / name, "rb") as got, open(expected, "rb") as want:
+            assert got.read() == want.read()
+    assert len((out / STATE_FILE).read_text().splitlines()) == 3
+
+    synthetic_fastq(run / "chunk_3.fastq", reads=20, seed=3)
+    metrics = _watch(run, out, tmp_path / "metrics.json")
+    assert metrics["chunks"]["count"] == 1
+    assert metrics["reads"] == 20
+
+
+def test_watch_skips_removed_files(tmp_path, monkeypatch) -> None:
+    """A file removed between polls is dropped and the run still goes idle."""
+    run = tmp_path / "run"
+    run.mkdir()
+    synthetic_fastq(run / "kept.fastq", reads=20, seed=0)
+    synthetic_fastq(run / "gone.fastq", reads=20, seed=1)
+    listing = watch_handler.directory_fastqs
+    polls = []
+
+    def _listing(in_dir):
+        paths = listing(in_dir)
+        polls.append(len(paths))
+        if len(polls) == 2:
+            # removed after the listing, before its stat
+            os.remove(run / "gone.fastq")
+        return paths
+
+    monkeypatch.setattr(watch_handler, "directory_fastqs", _listing)
+    metrics = _watch(run, tmp_path / "out", tmp_path / "metrics.json")
+    assert polls[:3] == [2, 2, 1]
+    assert metrics["chunks"]["count"] == 1
+    assert sorted(os.listdir(tmp_path / "out")) == sorted([STATE_FILE, "kept.fastq"])
+
+
+def test_watch_compresses_gz_chunks(tmp_path) -> None:
+    """A .fastq.gz chunk is chopped into a gzip compressed .fastq.gz."""
+    run = tmp_path / "run"
+    run.mkdir()
+    chunk = tmp_path / "chunk.fastq"
+    synthetic_fastq(chunk, reads=20, seed=0)
+    with open(chunk, "rb") as plain, gzip.open(run / "chunk.fastq.gz", "wb") as gz:
+        gz.write(plain.read())
+    out = tmp_path / "out"
+    _watch(run, out, tmp_path / "metrics.json")
+    expected = str(tmp_path / "expected.fastq")
+    fastq_io(str(chunk), expected, 1, ordered=True)
+    with gzip.open(out / "chunk.fastq.gz", "rb") as got, open(expected, "rb") as want:
+        assert got.read() == want.read()